@@ -0,0 +1,125 @@
+
+"""Benchmark log ingestion and search
+
+Generates synthetic log lines from a set of containers (a mix of request,
+debug, warning and error templates), ingests them into a LogIndex and then
+measures query latency for typical searches. The default of 2 million
+lines takes a few minutes; use --lines for a quicker run.
+
+    python benchmarks/bench_log_search.py --lines 2000000 --containers 100
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_search import LogIndex, MAX_SEGMENTS, SEGMENT_LINES  # noqa: E402
+
+TEMPLATES = (
+    'GET /api/items/{n} 200 {ms}ms user={user}',
+    'POST /api/orders 201 {ms}ms user={user} order={n}',
+    'DEBUG cache lookup key=item:{n} hit={hit}',
+    'WARN slow query on table orders took {ms}ms',
+    'ERROR failed to connect to db-{shard}: connection refused',
+    'worker {shard} processed batch {n} in {ms}ms',
+)
+
+
+def synthetic_lines(count, containers, start):
+    rng = random.Random(42)
+    for i in range(count):
+        template = TEMPLATES[rng.randrange(len(TEMPLATES))]
+        message = template.format(n=rng.randrange(100000), ms=rng.randrange(1, 2000),
+                                  user=f"u{rng.randrange(5000)}", hit=rng.random() < 0.8,
+                                  shard=rng.randrange(8))
+        container = i % containers
+        yield f"{container:064x}", f"app-{container}", start + i * 0.001, message
+
+
+def time_window(start, end, span):
+    """A search for a common token within a random `span`-second window"""
+    window_start = random.uniform(start, max(start, end - span))
+    return {'q': 'processed', 'start': window_start, 'end': window_start + span}
+
+
+def run(lines, containers, queries, root):
+    index = LogIndex(root, segment_lines=SEGMENT_LINES, max_segments=max(MAX_SEGMENTS, lines // SEGMENT_LINES + 1))
+    start = time.time() - lines * 0.001
+
+    ingest_started = time.perf_counter()
+    for container_id, name, ts, message in synthetic_lines(lines, containers, start):
+        index.ingest(container_id, name, message, ts=ts)
+    ingest_seconds = time.perf_counter() - ingest_started
+
+    end = start + lines * 0.001
+    cases = {
+        'rare_token': lambda: {'q': f"order={random.randrange(100000)}"},
+        'common_token': lambda: {'q': 'api'},
+        'two_tokens': lambda: {'q': f"db-{random.randrange(8)} refused"},
+        'level_error': lambda: {'level': 'ERROR'},
+        'container': lambda: {'q': 'slow', 'container': f"app-{random.randrange(containers)}"},
+        'time_range': lambda: time_window(start, end, 60),
+    }
+
+    results = {}
+    for label, make_args in cases.items():
+        latencies = []
+        returned = 0
+        for _ in range(queries):
+            args = make_args()
+            began = time.perf_counter()
+            found = index.search(limit=100, **args)
+            latencies.append((time.perf_counter() - began) * 1000)
+            returned = found['count']
+        latencies.sort()
+        results[label] = {
+            'results': returned,
+            'p50_ms': round(statistics.median(latencies), 3),
+            'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3),
+        }
+
+    stats = index.stats()
+    return {
+        'lines': lines,
+        'containers': containers,
+        'ingest_seconds': round(ingest_seconds, 3),
+        'ingest_lines_per_sec': round(lines / ingest_seconds),
+        'segments': stats['segments'],
+        'tokens': stats['tokens'],
+        'message_bytes': stats['bytes'],
+        'query': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=2000000)
+    parser.add_argument('--containers', type=int, default=100)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--dir', help='Persist sealed segments here (default: a temporary directory)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    root = args.dir or tempfile.mkdtemp(prefix='log-search-bench-')
+    try:
+        result = run(args.lines, args.containers, args.queries, root)
+    finally:
+        if not args.dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
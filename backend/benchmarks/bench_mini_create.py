@@ -0,0 +1,193 @@
+
+"""Benchmark Mini Docker container creation from an image
+
+Builds a synthetic two-layer image as a `docker save` archive, imports it
+into an image store, then creates N containers from it with each rootfs
+strategy and reports per-create latency and the disk the containers add:
+
+- extract: unpack the image's layers for every container (no image store)
+- hardlink: hard-link farm of the image's flattened root
+- overlay: overlayfs mount over the flattened root (needs CAP_SYS_ADMIN)
+
+    python benchmarks/bench_mini_create.py --containers 100 --files 2000
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tarfile
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mini_images import ImageStore, merge_tree  # noqa: E402
+
+
+def layer_tar(files, whiteouts=()):
+    """An uncompressed layer tar of {path: bytes} plus whiteout markers"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w') as tar:
+        directories = sorted({os.path.dirname(path) for path in files} - {''})
+        for directory in directories:
+            info = tarfile.TarInfo(directory)
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            tar.addfile(info)
+        for path, content in sorted(files.items()):
+            info = tarfile.TarInfo(path)
+            info.size = len(content)
+            info.mode = 0o755 if path.startswith('bin/') else 0o644
+            tar.addfile(info, io.BytesIO(content))
+        for path in whiteouts:
+            info = tarfile.TarInfo(os.path.join(os.path.dirname(path), '.wh.' + os.path.basename(path)))
+            tar.addfile(info, io.BytesIO(b''))
+    return buffer.getvalue()
+
+
+def build_archive(path, files, file_size):
+    """Write a `docker save`-style archive of a two-layer image"""
+    base = {f"usr/lib/pkg{i % 50}/file{i}.so": os.urandom(file_size) for i in range(files)}
+    base['bin/init.sh'] = b'#!/bin/sh\nsleep 3600\n'
+    removed = sorted(base)[:10]
+    top = {f"etc/app/conf{i}": b'x' * 256 for i in range(20)}
+    layers = [layer_tar(base), layer_tar(top, removed)]
+    diff_ids = ['sha256:' + hashlib.sha256(layer).hexdigest() for layer in layers]
+    config = {
+        'config': {'Cmd': ['/bin/init.sh']},
+        'rootfs': {'type': 'layers', 'diff_ids': diff_ids},
+    }
+    config_bytes = json.dumps(config).encode()
+    config_name = hashlib.sha256(config_bytes).hexdigest() + '.json'
+    members = {config_name: config_bytes}
+    layer_paths = []
+    for i, layer in enumerate(layers):
+        layer_paths.append(f"layer{i}/layer.tar")
+        members[layer_paths[-1]] = layer
+    members['manifest.json'] = json.dumps(
+        [{'Config': config_name, 'RepoTags': ['bench:latest'], 'Layers': layer_paths}]).encode()
+    with tarfile.open(path, 'w') as tar:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    return layers
+
+
+def extract_layers(layers, rootfs):
+    """What create costs without an image store: unpack every layer"""
+    os.makedirs(rootfs)
+    staging = rootfs + '.layers'
+    for i, layer in enumerate(layers):
+        layer_dir = os.path.join(staging, str(i))
+        with tarfile.open(fileobj=io.BytesIO(layer)) as tar:
+            tar.extractall(layer_dir, filter='tar')
+        merge_tree(layer_dir, rootfs, link=False, fresh=i == 0)
+    shutil.rmtree(staging)
+
+
+def disk_usage(path, exclude_inodes):
+    """Bytes allocated under path for inodes not in exclude_inodes, not crossing mounts"""
+    seen = set()
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames[:] = [name for name in dirnames if not os.path.ismount(os.path.join(dirpath, name))]
+        for name in dirnames + filenames:
+            info = os.lstat(os.path.join(dirpath, name))
+            key = (info.st_dev, info.st_ino)
+            if key in seen or key in exclude_inodes:
+                continue
+            seen.add(key)
+            total += info.st_blocks * 512
+    return total
+
+
+def inodes(path):
+    result = set()
+    for dirpath, dirnames, filenames in os.walk(path):
+        for name in dirnames + filenames:
+            info = os.lstat(os.path.join(dirpath, name))
+            result.add((info.st_dev, info.st_ino))
+    return result
+
+
+def run_mode(mode, store, layers, containers, root):
+    containers_dir = os.path.join(root, f"containers-{mode}")
+    os.makedirs(containers_dir)
+    if mode != 'extract':
+        store._overlay = None if mode == 'overlay' else False
+    latencies = []
+    used_mode = mode
+    created = []
+    try:
+        for i in range(containers):
+            container_dir = os.path.join(containers_dir, str(i))
+            started = time.perf_counter()
+            if mode == 'extract':
+                extract_layers(layers, os.path.join(container_dir, 'rootfs'))
+            else:
+                used_mode = store.prepare_rootfs('bench', container_dir)['mode']
+            latencies.append((time.perf_counter() - started) * 1000)
+            created.append(container_dir)
+        extra = disk_usage(containers_dir, inodes(store.root))
+    finally:
+        for container_dir in created:
+            store.release_rootfs(container_dir)
+        shutil.rmtree(containers_dir, ignore_errors=True)
+    latencies.sort()
+    return {
+        'mode': mode,
+        'used': used_mode,
+        'containers': containers,
+        'create_p50_ms': round(statistics.median(latencies), 3),
+        'create_p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        'create_max_ms': round(latencies[-1], 3),
+        'total_s': round(sum(latencies) / 1000, 3),
+        'extra_disk_bytes': extra,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--containers', type=int, default=100)
+    parser.add_argument('--files', type=int, default=2000, help='Files in the image base layer')
+    parser.add_argument('--file-size', type=int, default=16384)
+    parser.add_argument('--modes', default='extract,hardlink,overlay')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='mini-create-bench-')
+    try:
+        archive = os.path.join(root, 'image.tar')
+        layers = build_archive(archive, args.files, args.file_size)
+        store = ImageStore(os.path.join(root, 'images'))
+        started = time.perf_counter()
+        store.import_image(archive)
+        import_ms = round((time.perf_counter() - started) * 1000, 3)
+        started = time.perf_counter()
+        store.import_image(archive)
+        reimport_ms = round((time.perf_counter() - started) * 1000, 3)
+        results = [{
+            'image_bytes': os.path.getsize(archive),
+            'import_ms': import_ms,
+            'reimport_ms': reimport_ms,
+        }]
+        print(json.dumps(results[-1]), flush=True)
+        for mode in args.modes.split(','):
+            results.append(run_mode(mode, store, layers, args.containers, root))
+            print(json.dumps(results[-1]), flush=True)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+
+"""Benchmark Mini Docker start latency with and without the warm pool
+
+Starts short-lived containers that print one line and exit, cold (fork/exec
+of the runtime, which then creates the namespaces) and from a pool of
+parked sandboxes, in bursts of back-to-back starts. For each start it
+reports the time for the start call to return (handoff) and until the
+workload's first output (running). Needs root, like the runtime itself.
+
+    python benchmarks/bench_mini_start.py --starts 200 --pool-size 8 --burst 4
+"""
+
+import argparse
+import json
+import os
+import selectors
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from mini_pool import WarmPool  # noqa: E402
+
+RUNTIME = os.path.join(BACKEND, "mini_docker", "mini_docker")
+COMMAND = ['/bin/sh', '-c', 'echo up']
+
+
+def build_rootfs(path):
+    """A minimal rootfs: the host's /bin/sh and the libraries it links"""
+    shell = os.path.realpath('/bin/sh')
+    for directory in ('bin', 'proc', 'sys'):
+        os.makedirs(os.path.join(path, directory))
+    shutil.copy2(shell, os.path.join(path, 'bin', 'sh'))
+    output = subprocess.run(['ldd', shell], capture_output=True, text=True).stdout
+    for library in (word for line in output.splitlines() for word in line.split() if word.startswith('/')):
+        target = os.path.join(path, library.lstrip('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(library, target)
+
+
+def wait_running(launched):
+    """Time (ms) from each start until its workload's line arrives, watching all at once"""
+    selector = selectors.DefaultSelector()
+    output = {}
+    for started, process in launched:
+        selector.register(process.stdout, selectors.EVENT_READ, (started, process))
+        output[process.pid] = b''
+    latencies = []
+    while selector.get_map():
+        for key, _ in selector.select():
+            started, process = key.data
+            chunk = os.read(key.fileobj.fileno(), 65536)
+            output[process.pid] += chunk
+            if b'up\n' in output[process.pid]:
+                latencies.append((time.perf_counter() - started) * 1000)
+                selector.unregister(key.fileobj)
+            elif not chunk:
+                selector.unregister(key.fileobj)  # exited without running
+    selector.close()
+    return latencies
+
+
+def percentiles(values):
+    values = sorted(values)
+    return {
+        'p50_ms': round(statistics.median(values), 3),
+        'p95_ms': round(values[max(0, int(len(values) * 0.95) - 1)], 3),
+        'max_ms': round(values[-1], 3),
+    }
+
+
+def run(mode, rootfs, starts, burst, interval, pool_size):
+    pool = None
+    if mode == 'warm':
+        pool = WarmPool(RUNTIME, pool_size).start()
+        deadline = time.time() + 30
+        while pool.stats()['idle'] < pool_size and time.time() < deadline:
+            time.sleep(0.01)
+    handoff = []
+    running = []
+    failures = 0
+    try:
+        done = 0
+        while done < starts:
+            launched = []
+            for _ in range(min(burst, starts - done)):
+                started = time.perf_counter()
+                process = pool.take() if pool else None
+                if process is not None:
+                    process = pool.activate(process, rootfs, COMMAND)
+                if process is None:
+                    process = subprocess.Popen([RUNTIME, rootfs] + COMMAND,
+                                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                handoff.append((time.perf_counter() - started) * 1000)
+                launched.append((started, process))
+            arrived = wait_running(launched)
+            running.extend(arrived)
+            failures += len(launched) - len(arrived)
+            for _, process in launched:
+                process.wait()
+                process.stdout.close()
+                process.stderr.close()
+            done += len(launched)
+            time.sleep(interval)
+        result = {
+            'mode': mode,
+            'starts': starts,
+            'burst': burst,
+            'failures': failures,
+            'handoff': percentiles(handoff),
+            'running': percentiles(running) if running else None,
+        }
+        if pool:
+            result['pool'] = pool.stats()
+        return result
+    finally:
+        if pool:
+            pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--starts', type=int, default=200)
+    parser.add_argument('--burst', type=int, default=4, help='Starts issued back to back before waiting')
+    parser.add_argument('--interval', type=float, default=0.05, help='Seconds between bursts')
+    parser.add_argument('--pool-size', type=int, default=8)
+    parser.add_argument('--modes', default='cold,warm')
+    parser.add_argument('--rootfs', help='Root filesystem to run in (default: a minimal one built from the host /bin/sh)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    if not os.path.exists(RUNTIME):
+        subprocess.run(["make", "-C", os.path.dirname(RUNTIME)], check=True)
+    root = None
+    rootfs = args.rootfs
+    if not rootfs:
+        root = tempfile.mkdtemp(prefix='mini-start-bench-')
+        rootfs = os.path.join(root, 'rootfs')
+        build_rootfs(rootfs)
+
+    results = []
+    try:
+        for mode in args.modes.split(','):
+            results.append(run(mode, rootfs, args.starts, args.burst, args.interval, args.pool_size))
+            print(json.dumps(results[-1]), flush=True)
+    finally:
+        if root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+
+"""Benchmark Mini Docker metadata startup and writes
+
+Creates N containers in the old one-metadata.json-per-directory layout and
+measures loading them that way, migrating them into the SQLite store, and
+loading them from the store. Then measures a burst of status updates
+(batched into one transaction) and indexed lookups.
+
+    python benchmarks/bench_mini_store.py --containers 100,1000,5000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mini_store import MetadataStore  # noqa: E402
+
+IMAGES = ('alpine', 'busybox', 'nginx', 'redis')
+STATUSES = ('running', 'exited', 'created')
+
+
+def make_metadata(i):
+    container_id = uuid.uuid4().hex[:12]
+    return {
+        'id': container_id,
+        'name': f"mini-{i}",
+        'image': IMAGES[i % len(IMAGES)],
+        'status': STATUSES[i % len(STATUSES)],
+        'created': time.time() * 1000 + i,
+        'cpu': 0,
+        'memory': 0,
+        'cpu_limit': None,
+        'memory_limit': None,
+        'pid': None,
+        'ports': [],
+        'labels': {'group': str(i % 10)},
+    }
+
+
+def load_directories(root):
+    """What startup did before the store: parse every metadata.json"""
+    containers = {}
+    for container_id in os.listdir(root):
+        metadata_path = os.path.join(root, container_id, "metadata.json")
+        if os.path.exists(metadata_path):
+            with open(metadata_path, 'r') as f:
+                containers[container_id] = json.load(f)
+    return containers
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, round((time.perf_counter() - started) * 1000, 3)
+
+
+def run(containers, updates, lookups, root):
+    metadata = [make_metadata(i) for i in range(containers)]
+    for item in metadata:
+        os.makedirs(os.path.join(root, item['id']))
+        with open(os.path.join(root, item['id'], "metadata.json"), 'w') as f:
+            json.dump(item, f)
+
+    loaded, json_load_ms = timed(load_directories, root)
+    assert len(loaded) == containers
+
+    store = MetadataStore(os.path.join(root, "containers.db"))
+    migrated, migrate_ms = timed(store.migrate_directories, root)
+    store.close()
+
+    # A fresh process: open the database and read everything
+    started = time.perf_counter()
+    store = MetadataStore(os.path.join(root, "containers.db"))
+    loaded = store.load()
+    store_load_ms = round((time.perf_counter() - started) * 1000, 3)
+    assert len(loaded) == containers
+
+    # A burst of status changes, as when many containers stop at once
+    started = time.perf_counter()
+    for item in metadata[:updates]:
+        item['status'] = 'exited'
+        store.put(item['id'], item)
+    queue_ms = round((time.perf_counter() - started) * 1000, 3)
+    written, flush_ms = timed(store.flush)
+
+    latencies = []
+    for i in range(lookups):
+        began = time.perf_counter()
+        store.find(name=f"mini-{i % containers}")
+        latencies.append((time.perf_counter() - began) * 1000)
+    _, status_lookup_ms = timed(store.find, None, 'running')
+    store.close()
+
+    return {
+        'containers': containers,
+        'json_load_ms': json_load_ms,
+        'migrate_ms': migrate_ms,
+        'migrated': migrated,
+        'store_load_ms': store_load_ms,
+        'updates': updates,
+        'update_queue_ms': queue_ms,
+        'update_flush_ms': flush_ms,
+        'rows_flushed': written,
+        'find_by_name_p50_ms': round(statistics.median(latencies), 3),
+        'find_by_status_ms': status_lookup_ms,
+        'db_bytes': sum(os.path.getsize(os.path.join(root, name)) for name in os.listdir(root)
+                        if name.startswith("containers.db")),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--containers', default='100,1000,5000', help='Comma-separated container counts')
+    parser.add_argument('--updates', type=int, default=500, help='Status updates in the write burst')
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    for containers in (int(n) for n in args.containers.split(',')):
+        root = tempfile.mkdtemp(prefix='mini-store-bench-')
+        try:
+            results.append(run(containers, min(args.updates, containers), args.lookups, root))
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+        print(json.dumps(results[-1]), flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
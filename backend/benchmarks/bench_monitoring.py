@@ -0,0 +1,352 @@
+
+"""Benchmark the monitoring loop and container listing against fake hosts
+
+Runs the server's per-tick work (SystemMonitor.get_stats, list_containers
+with _format_container, HistoryRecorder and the delta-encoded emit to every
+subscribed room) against a fake Docker client simulating N containers with
+configurable stats latency, a fake /proc/stat and a fake cgroup v2 tree.
+No Docker daemon is needed. Each scenario reports per-tick latency
+percentiles (total and per phase), CPU time and bytes emitted; results are
+written as JSON so runs can be compared between versions.
+
+    python benchmarks/bench_monitoring.py --containers 10,100,1000 --modes poll,cgroup
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from container_utils import ContainerManager  # noqa: E402
+from history import HistoryRecorder, MetricStore  # noqa: E402
+from monitor import ProcSampler, SystemMonitor  # noqa: E402
+from push_protocol import DeltaEncoder, PushStats, _payload_size  # noqa: E402
+from subscriptions import MAX_RATE, SubscriptionRegistry, stream_name, ticks_per_emit  # noqa: E402
+from tsdb import TimeSeriesStore  # noqa: E402
+
+CPUS = 8
+IMAGES = ('nginx:1.25', 'redis:7', 'postgres:16', 'python:3.12-slim', 'node:20-alpine')
+
+
+class FakeImage:
+    def __init__(self, tag):
+        self.id = 'sha256:' + hashlib.sha256(tag.encode()).hexdigest()
+        self.tags = [tag]
+
+
+class FakeContainer:
+    """A container whose stats() takes `stats_latency` seconds, like the daemon's one-shot stats"""
+
+    def __init__(self, index, image, running, stats_latency):
+        self.id = hashlib.sha256(f"container-{index}".encode()).hexdigest()
+        self.name = f"bench-{index}"
+        self.image = image
+        self.status = 'running' if running else 'exited'
+        self.labels = {'bench': 'true', 'group': str(index % 10)}
+        self.stats_latency = stats_latency
+        self.cpu_usage = 0
+        self.system_usage = 0
+        ports = {'80/tcp': [{'HostIp': '', 'HostPort': str(10000 + index)}]} if index % 3 == 0 else None
+        self.attrs = {
+            'Id': self.id,
+            'Name': '/' + self.name,
+            'Created': '2024-01-01T00:00:00.000000Z',
+            'Image': image.id,
+            'Config': {'Image': image.tags[0], 'Labels': self.labels},
+            'HostConfig': {'PortBindings': ports},
+            'State': {'Status': self.status},
+        }
+
+    def stats(self, stream=False, decode=None):
+        time.sleep(self.stats_latency)
+        previous = {'cpu_usage': {'total_usage': self.cpu_usage}, 'system_cpu_usage': self.system_usage}
+        self.cpu_usage += random.randint(0, 10 ** 8)
+        self.system_usage += 10 ** 9 * CPUS
+        return {
+            'cpu_stats': {'cpu_usage': {'total_usage': self.cpu_usage}, 'system_cpu_usage': self.system_usage,
+                          'online_cpus': CPUS},
+            'precpu_stats': previous,
+            'memory_stats': {'usage': random.randint(16, 512) * 1024 * 1024},
+        }
+
+
+class FakeCollection:
+    def __init__(self, items):
+        self._items = {item.id: item for item in items}
+
+    def list(self, all=False, filters=None):
+        return [item for item in self._items.values() if all or getattr(item, 'status', 'running') == 'running']
+
+    def get(self, item_id):
+        return self._items[item_id]
+
+
+class FakeDockerClient:
+    """Just enough of docker.DockerClient for ContainerManager's listing path"""
+
+    def __init__(self, containers, running_fraction, stats_latency):
+        images = [FakeImage(tag) for tag in IMAGES]
+        running = int(containers * running_fraction)
+        self.containers = FakeCollection(
+            FakeContainer(i, images[i % len(images)], i < running, stats_latency) for i in range(containers)
+        )
+        self.images = FakeCollection(images)
+        self._closed = threading.Event()
+
+    def events(self, decode=True, filters=None):
+        # A quiet event stream that ends when the client is closed
+        self._closed.wait()
+        return iter(())
+
+    def close(self):
+        self._closed.set()
+
+
+def write_proc_stat(path, tick):
+    """A /proc/stat whose counters advance each tick, with some cores busier than others"""
+    lines = []
+    cores = []
+    for core in range(CPUS):
+        busy = tick * (10 + core * 5)
+        cores.append((busy, tick * 100 - busy))
+    for label, (busy, idle) in [('cpu', tuple(map(sum, zip(*cores))))] + [(f'cpu{i}', c) for i, c in enumerate(cores)]:
+        lines.append(f"{label} {busy} 0 0 {idle} 0 0 0 0 0 0")
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\nintr 0\nctxt 0\n')
+
+
+class FakeCgroupfs:
+    """A cgroup v2 tree with a docker-<id>.scope per running container"""
+
+    def __init__(self, root, containers):
+        self.root = root
+        self.scopes = {}
+        with open(os.path.join(root, 'cgroup.controllers'), 'w') as f:
+            f.write('cpu io memory pids\n')
+        for container in containers:
+            if container.status != 'running':
+                continue
+            scope = os.path.join(root, 'system.slice', f'docker-{container.id}.scope')
+            os.makedirs(scope)
+            self.scopes[container.id] = scope
+            self._write(scope, 'pids.current', f"{random.randint(1, 50)}\n")
+            self._write(scope, 'io.stat', "8:0 rbytes=4096 wbytes=8192 rios=1 wios=2 dbytes=0 dios=0\n")
+        self.usage = {container_id: 0 for container_id in self.scopes}
+        self.advance()
+
+    @staticmethod
+    def _write(scope, name, text):
+        with open(os.path.join(scope, name), 'w') as f:
+            f.write(text)
+
+    def advance(self):
+        for container_id, scope in self.scopes.items():
+            self.usage[container_id] += random.randint(0, 100000)
+            usec = self.usage[container_id]
+            self._write(scope, 'cpu.stat', f"usage_usec {usec}\nuser_usec {usec // 2}\nsystem_usec {usec // 2}\n")
+            self._write(scope, 'memory.current', f"{random.randint(16, 512) * 1024 * 1024}\n")
+
+
+def subscribe_clients(registry, clients, container_ids):
+    """Spread clients over the topics and rates a dashboard uses"""
+    for i in range(clients):
+        sid = f"client-{i}"
+        registry.subscribe(sid, 'system_stats', 1.0)
+        registry.subscribe(sid, 'docker_containers', 5.0 if i % 4 == 0 else 1.0)
+        if container_ids and i % 2 == 0:
+            registry.subscribe(sid, 'docker_containers', 5.0, container_ids[i % len(container_ids)])
+
+
+def percentiles(values):
+    ordered = sorted(values)
+    if not ordered:
+        return {'p50': 0, 'p90': 0, 'p99': 0, 'max': 0}
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]  # noqa: E731
+    return {
+        'p50': round(statistics.median(ordered), 3),
+        'p90': round(pick(0.9), 3),
+        'p99': round(pick(0.99), 3),
+        'max': round(ordered[-1], 3),
+    }
+
+
+def run(containers, mode, ticks, stats_latency, clients, running_fraction, pace, root):
+    random.seed(containers)
+    client = FakeDockerClient(containers, running_fraction, stats_latency)
+    all_containers = client.containers.list(all=True)
+
+    proc_stat = os.path.join(root, 'proc_stat')
+    write_proc_stat(proc_stat, 0)
+    cgroupfs = None
+    if mode == 'cgroup':
+        cgroup_root = os.path.join(root, 'cgroup')
+        os.makedirs(cgroup_root)
+        cgroupfs = FakeCgroupfs(cgroup_root, all_containers)
+    else:
+        cgroup_root = os.path.join(root, 'no-cgroup')
+
+    manager = ContainerManager(stats_mode=mode, cgroup_root=cgroup_root, client=client)
+    system_monitor = SystemMonitor()
+    system_monitor.sampler = ProcSampler(proc_stat=proc_stat)
+    metrics_store = TimeSeriesStore(os.path.join(root, 'metrics'))
+    recorder = HistoryRecorder(MetricStore(), metrics_store)
+
+    registry = SubscriptionRegistry()
+    running_ids = [c.id for c in all_containers if c.status == 'running']
+    subscribe_clients(registry, clients, running_ids)
+    subscribers = registry.counts()
+    encoders = {}
+    push_stats = PushStats()
+
+    tick_interval = 1.0 / MAX_RATE
+    history_every = ticks_per_emit(1.0)
+    phases = {name: [] for name in ('system_stats', 'list_containers', 'history', 'emit')}
+    tick_ms = []
+    cpu_ms = []
+    emitted_bytes = 0
+    emits = 0
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    for tick in range(ticks):
+        write_proc_stat(proc_stat, tick + 1)
+        if cgroupfs:
+            cgroupfs.advance()
+
+        started = time.perf_counter()
+        tick_cpu = time.process_time()
+        rooms = registry.active_rooms()
+        due = {room: info for room, info in rooms.items() if tick % ticks_per_emit(info[2]) == 0}
+        topics = {topic for topic, _, _ in due.values()}
+        if tick % history_every == 0:
+            topics.add('system_stats')
+
+        payloads = {}
+        if 'system_stats' in topics:
+            phase = time.perf_counter()
+            payloads['system_stats'] = system_monitor.get_stats()
+            phases['system_stats'].append((time.perf_counter() - phase) * 1000)
+        if 'docker_containers' in topics:
+            phase = time.perf_counter()
+            payloads['docker_containers'] = manager.list_containers_with_stats()
+            phases['list_containers'].append((time.perf_counter() - phase) * 1000)
+
+        # The server's history writes
+        if tick % history_every == 0:
+            phase = time.perf_counter()
+            recorder.record_host(payloads['system_stats'])
+            if 'docker_containers' in payloads:
+                recorder.record_containers(payloads['docker_containers'], 'docker_containers')
+            phases['history'].append((time.perf_counter() - phase) * 1000)
+
+        # Encode each due room once and serialize it as Socket.IO would;
+        # a room's message goes out once per subscriber
+        phase = time.perf_counter()
+        for room, (topic, container, rate) in due.items():
+            payload = payloads[topic]
+            if container:
+                payload = next((c for c in payload if c.get('id') == container), None)
+            encoder = encoders.get(room)
+            if encoder is None:
+                encoder = encoders[room] = DeltaEncoder(stream_name(topic, container))
+            patch = encoder.encode(payload)
+            if patch is None:
+                push_stats.record_skipped(f"{room}.patch", payload)
+                continue
+            size = push_stats.record(f"{room}.patch", patch, payload)
+            emitted_bytes += size * subscribers[room]
+            emits += subscribers[room]
+        phases['emit'].append((time.perf_counter() - phase) * 1000)
+
+        elapsed = time.perf_counter() - started
+        tick_ms.append(elapsed * 1000)
+        cpu_ms.append((time.process_time() - tick_cpu) * 1000)
+        if pace:
+            time.sleep(max(0, tick_interval - elapsed))
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+
+    # _format_container on its own, with samples already collected
+    samples = manager._collect_samples(all_containers)
+    format_started = time.perf_counter()
+    for container in all_containers:
+        manager._format_container(container, samples.get(container.id, {}))
+    format_us = (time.perf_counter() - format_started) / len(all_containers) * 1e6
+
+    listing = payloads.get('docker_containers') or manager.list_containers()
+    summary = push_stats.summary()
+    metrics_store.close()
+    manager.stats_collector.shutdown()
+    if manager.cgroup_reader:
+        manager.cgroup_reader.close()
+    manager.pool.close()
+    return {
+        'containers': containers,
+        'running': len(running_ids),
+        'mode': mode,
+        'ticks': ticks,
+        'clients': clients,
+        'rooms': len(subscribers),
+        'stats_latency_ms': stats_latency * 1000,
+        'tick_ms': percentiles(tick_ms),
+        'phase_ms': {name: percentiles(values) for name, values in phases.items()},
+        'tick_cpu_ms': percentiles(cpu_ms),
+        'cpu_percent': round(cpu / wall * 100, 1) if wall > 0 else 0,
+        'format_container_us': round(format_us, 2),
+        'stale_containers': sum(1 for c in listing if c.get('statsStale')),
+        'listing_bytes': _payload_size(listing),
+        'emits': emits,
+        'bytes_emitted': emitted_bytes,
+        'bytes_per_tick': round(emitted_bytes / ticks) if ticks else 0,
+        'full_payload_bytes': summary['fullBytes'],
+        'saved_percent': summary['savedPercent'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--containers', default='10,100,1000', help='Comma-separated container counts')
+    parser.add_argument('--modes', default='poll,cgroup', help='Comma-separated DOCKER_STATS_MODE values (poll, cgroup)')
+    parser.add_argument('--ticks', type=int, default=25, help='Monitoring ticks per scenario')
+    parser.add_argument('--stats-latency', type=float, default=0.02, help='Seconds each fake stats() call takes')
+    parser.add_argument('--clients', type=int, default=20, help='Simulated WebSocket clients')
+    parser.add_argument('--running', type=float, default=0.8, help='Fraction of containers that are running')
+    parser.add_argument('--no-pace', action='store_true', help='Run ticks back to back instead of at the loop rate')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    scenarios = []
+    for mode in args.modes.split(','):
+        for containers in (int(n) for n in args.containers.split(',')):
+            root = tempfile.mkdtemp(prefix='monitoring-bench-')
+            try:
+                result = run(containers, mode.strip(), args.ticks, args.stats_latency, args.clients,
+                             args.running, not args.no_pace, root)
+            finally:
+                shutil.rmtree(root, ignore_errors=True)
+            print(json.dumps(result), flush=True)
+            scenarios.append(result)
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'started': time.time(),
+        'scenarios': scenarios,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+
+"""Benchmark the on-disk metrics store
+
+Simulates the monitoring loop writing one row per second for a host series
+and N container series (batched per flush interval), then measures range
+query latency. The default is a week of 1s data for 500 containers, which
+writes roughly 7 GB; use --seconds/--containers for a quicker run.
+
+    python benchmarks/bench_tsdb.py --containers 500 --seconds 604800
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tsdb import TimeSeriesStore, FLUSH_INTERVAL  # noqa: E402
+
+
+def run(containers, seconds, flush_interval, queries, root):
+    store = TimeSeriesStore(root, flush_interval=flush_interval, retention=seconds * 2)
+    names = ['host'] + [f"container/{i:064x}" for i in range(containers)]
+    start = time.time() - seconds
+    cpu = array('d', (random.random() * 100 for _ in range(flush_interval)))
+    memory = array('d', (random.random() * 1024 for _ in range(flush_interval)))
+
+    rows = 0
+    write_started = time.perf_counter()
+    for batch_start in range(0, seconds, flush_interval):
+        count = min(flush_interval, seconds - batch_start)
+        timestamps = array('d', (start + batch_start + i for i in range(count)))
+        for name in names:
+            store.append_many(name, timestamps, {'cpu': cpu[:count], 'memory': memory[:count]})
+        rows += count * len(names)
+        store.flush()
+    write_seconds = time.perf_counter() - write_started
+
+    compact_started = time.perf_counter()
+    compacted = store.compact(now=start + seconds + store.segment_seconds)
+    compact_seconds = time.perf_counter() - compact_started
+
+    results = {}
+    for label, span in (('1h', 3600), ('1d', 86400), ('1w', 7 * 86400)):
+        span = min(span, seconds)
+        latencies = []
+        returned = 0
+        for _ in range(queries):
+            name = random.choice(names)
+            q_start = start + random.uniform(0, seconds - span)
+            began = time.perf_counter()
+            data = store.query(name, q_start, q_start + span)
+            latencies.append((time.perf_counter() - began) * 1000)
+            returned = len(data['t'])
+        latencies.sort()
+        results[label] = {
+            'rows': returned,
+            'p50_ms': round(statistics.median(latencies), 3),
+            'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3),
+        }
+
+    stats = store.stats()
+    store.close()
+    return {
+        'containers': containers,
+        'seconds': seconds,
+        'series': len(names),
+        'rows': rows,
+        'write_seconds': round(write_seconds, 3),
+        'write_rows_per_sec': round(rows / write_seconds),
+        'compacted_segments': compacted,
+        'compact_seconds': round(compact_seconds, 3),
+        'disk_bytes': stats['bytes'],
+        'query': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--containers', type=int, default=500)
+    parser.add_argument('--seconds', type=int, default=7 * 24 * 3600)
+    parser.add_argument('--flush-interval', type=int, default=FLUSH_INTERVAL)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--dir', help='Directory to write to (default: a temporary directory)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    root = args.dir or tempfile.mkdtemp(prefix='tsdb-bench-')
+    try:
+        result = run(args.containers, args.seconds, args.flush_interval, args.queries, root)
+    finally:
+        if not args.dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+BULK_ACTIONS = ('start', 'stop', 'restart', 'delete')
+BULK_WORKERS = 8
+MAX_BULK_WORKERS = 32
+
+
+def parse_label_selector(selector):
+    """Parse "key=value,key" (or a dict) into [(key, value or None)]"""
+    if not selector:
+        return []
+    if isinstance(selector, dict):
+        return [(key, None if value is None else str(value)) for key, value in selector.items()]
+    terms = []
+    for term in selector.split(','):
+        term = term.strip()
+        if term:
+            key, sep, value = term.partition('=')
+            terms.append((key.strip(), value.strip() if sep else None))
+    return terms
+
+
+def labels_match(labels, selector):
+    """True if a label dict satisfies every (key, value) term"""
+    labels = labels or {}
+    return all(key in labels and (value is None or labels[key] == value) for key, value in selector)
+
+
+def _outcome(result):
+    """Normalize a manager's return value to (success, error)"""
+    if isinstance(result, dict):
+        success = result.get('success', 'error' not in result)
+        return bool(success), None if success else (result.get('error') or result.get('message') or 'Failed')
+    return bool(result), None if result else 'Failed'
+
+
+class BulkOperation:
+    """Apply one action to many containers on a bounded worker pool
+
+    Each item's outcome and timing is recorded, and a progress event is
+    queued as it finishes; progress() hands the queued events to whoever
+    is reporting them.
+    """
+
+    def __init__(self, action, ids, fn, workers=BULK_WORKERS):
+        self.id = uuid.uuid4().hex[:12]
+        self.action = action
+        self.ids = list(dict.fromkeys(ids))
+        self.workers = max(1, min(workers, MAX_BULK_WORKERS, len(self.ids) or 1))
+        self._fn = fn
+        self._results = {}
+        self._events = deque()
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        self.started_at = time.time()
+        if not self.ids:
+            self._finish()
+            return self
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"bulk-{self.action}")
+        for container_id in self.ids:
+            executor.submit(self._run_one, container_id)
+        executor.shutdown(wait=False)
+        return self
+
+    def _run_one(self, container_id):
+        started = time.perf_counter()
+        try:
+            success, error = _outcome(self._fn(container_id))
+        except Exception as e:
+            success, error = False, str(e)
+        item = {
+            'id': container_id,
+            'success': success,
+            'durationMs': round((time.perf_counter() - started) * 1000, 3),
+        }
+        if error:
+            item['error'] = error
+        with self._lock:
+            self._results[container_id] = item
+            done = len(self._results)
+            self._events.append(dict(item, operation=self.id, action=self.action,
+                                     done=done, total=len(self.ids)))
+        if done == len(self.ids):
+            self._finish()
+
+    def _finish(self):
+        self.finished_at = time.time()
+        self._finished.set()
+
+    def finished(self):
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    def progress(self):
+        """Progress events queued since the last call"""
+        events = []
+        while self._events:
+            events.append(self._events.popleft())
+        return events
+
+    def result(self):
+        with self._lock:
+            items = [self._results[cid] for cid in self.ids if cid in self._results]
+        succeeded = sum(1 for item in items if item['success'])
+        end = self.finished_at or time.time()
+        return {
+            'operation': self.id,
+            'action': self.action,
+            'total': len(self.ids),
+            'succeeded': succeeded,
+            'failed': len(items) - succeeded,
+            'pending': len(self.ids) - len(items),
+            'workers': self.workers,
+            'durationMs': round((end - self.started_at) * 1000, 3) if self.started_at else 0,
+            'results': items,
+        }
@@ -0,0 +1,261 @@
+"""Out-of-process metrics collector
+
+Run by server.py with COLLECTOR_MODE=process. The collector samples the
+requested topics in its own process and publishes snapshots over a Unix
+socket, so slow psutil or Docker calls never stall the web server's event
+loop. Messages in both directions are length-prefixed JSON frames.
+"""
+
+import argparse
+import json
+import os
+import platform
+import select
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+from subscriptions import MAX_RATE, ticks_per_emit
+
+FRAME_HEADER = struct.Struct('<I')
+RESTART_DELAY = 2.0
+
+
+class TickStats:
+    """Duration, overrun and missed-tick accounting for a periodic loop"""
+
+    def __init__(self, interval, window=300):
+        self.interval = interval
+        self.durations = deque(maxlen=window)
+        self.ticks = 0
+        self.overruns = 0
+        self.missed = 0
+
+    def record(self, duration):
+        """Record one tick; returns the number of tick slots it overran"""
+        self.ticks += 1
+        self.durations.append(duration)
+        if duration <= self.interval:
+            return 0
+        self.overruns += 1
+        missed = int(duration // self.interval)
+        self.missed += missed
+        return missed
+
+    def summary(self):
+        durations = sorted(self.durations)
+        return {
+            'intervalMs': round(self.interval * 1000, 3),
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'missedTicks': self.missed,
+            'lastMs': round(self.durations[-1] * 1000, 3) if self.durations else 0,
+            'avgMs': round(sum(durations) / len(durations) * 1000, 3) if durations else 0,
+            'p99Ms': round(durations[min(len(durations) - 1, int(len(durations) * 0.99))] * 1000, 3) if durations else 0,
+            'maxMs': round(durations[-1] * 1000, 3) if durations else 0,
+        }
+
+
+def send_frame(sock, message):
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(FRAME_HEADER.pack(len(data)) + data)
+
+
+def recv_frame(sock):
+    """Read one frame, or return None when the peer has closed the socket"""
+    header = _recv_exactly(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    data = _recv_exactly(sock, FRAME_HEADER.unpack(header)[0])
+    return None if data is None else json.loads(data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+class CollectorProcess:
+    """Run collector.py as a child process and keep its latest snapshots
+
+    set_topics() tells the collector which topics to sample and how often;
+    a reader thread stores every published payload, and latest() returns
+    the newest one for a topic. A collector that dies is restarted.
+    """
+
+    def __init__(self, args=()):
+        self.args = list(args)
+        self._lock = threading.Lock()
+        self._sock = None
+        self._process = None
+        self._topics = {}
+        self._latest = {}  # topic -> (sequence, received at, payload)
+        self._closed = False
+        self.collector_stats = {}
+        self.snapshots = 0
+        self.restarts = 0
+        self.started_at = None
+
+    def start(self):
+        self._spawn()
+        threading.Thread(target=self._read, name='collector-reader', daemon=True).start()
+        return self
+
+    def _spawn(self):
+        parent, child = socket.socketpair()
+        self._process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--fd', str(child.fileno())] + self.args,
+            pass_fds=(child.fileno(),), cwd=os.path.dirname(os.path.abspath(__file__)),
+            # Mini Docker containers belong to the server: only read them
+            env=dict(os.environ, MINI_DOCKER_OBSERVER='1')
+        )
+        child.close()
+        with self._lock:
+            self._sock = parent
+            topics = dict(self._topics)
+        self.started_at = time.time()
+        if topics:
+            send_frame(parent, {'topics': topics})
+
+    def set_topics(self, topics):
+        """Set {topic: rate in Hz} to collect; a no-op when unchanged"""
+        with self._lock:
+            if topics == self._topics:
+                return
+            self._topics = dict(topics)
+            sock = self._sock
+        try:
+            send_frame(sock, {'topics': topics})
+        except OSError:
+            pass  # the reader restarts the collector and resends the topics
+
+    def _read(self):
+        while not self._closed:
+            try:
+                message = recv_frame(self._sock)
+            except (OSError, ValueError):
+                message = None
+            if message is None:
+                if self._closed:
+                    return
+                print("Collector process exited, restarting")
+                self._process.wait()
+                time.sleep(RESTART_DELAY)
+                self.restarts += 1
+                self._spawn()
+                continue
+            now = time.time()
+            with self._lock:
+                for topic, payload in message.get('payloads', {}).items():
+                    previous = self._latest.get(topic)
+                    self._latest[topic] = ((previous[0] + 1) if previous else 1, now, payload)
+                self.collector_stats = message.get('stats', self.collector_stats)
+                self.snapshots += 1
+
+    def latest(self, topic):
+        """(sequence, received at, payload) for a topic, or None"""
+        with self._lock:
+            return self._latest.get(topic)
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            return {
+                'pid': self._process.pid if self._process else None,
+                'restarts': self.restarts,
+                'snapshots': self.snapshots,
+                'topics': dict(self._topics),
+                'snapshotAgeMs': {topic: round((now - at) * 1000, 1) for topic, (_, at, _) in self._latest.items()},
+                'tick': dict(self.collector_stats),
+            }
+
+    def close(self):
+        self._closed = True
+        if self._sock is not None:
+            self._sock.close()
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+
+
+def _build_collectors():
+    """Topic -> function returning its current payload"""
+    from monitor import SystemMonitor
+    from container_utils import ContainerManager
+
+    system_monitor = SystemMonitor()
+    container_manager = ContainerManager(stats_mode=os.environ.get('DOCKER_STATS_MODE', 'poll'),
+                                         cgroup_root=os.environ.get('CGROUP_ROOT', '/sys/fs/cgroup'))
+    collectors = {
+        'system_stats': system_monitor.get_stats,
+        'docker_containers': container_manager.list_containers_with_stats,
+    }
+    if platform.system() != "Windows":
+        try:
+            from mini_docker_utils import mini_docker_manager
+        except ImportError:
+            mini_docker_manager = None
+        if mini_docker_manager:
+            def collect_mini():
+                # The server owns the containers; pick up its changes first
+                mini_docker_manager.refresh_from_disk()
+                return mini_docker_manager.list_containers()
+            collectors['mini_containers'] = collect_mini
+    return collectors
+
+
+def run(sock):
+    """Collect requested topics each tick and publish them until the server goes away"""
+    collectors = _build_collectors()
+    interval = 1.0 / MAX_RATE
+    stats = TickStats(interval)
+    topics = {}
+    tick = 0
+    next_tick = time.monotonic()
+    while True:
+        # Apply topic changes sent by the server
+        while select.select([sock], [], [], 0)[0]:
+            message = recv_frame(sock)
+            if message is None:
+                return
+            topics = message.get('topics', topics)
+
+        started = time.monotonic()
+        payloads = {}
+        for topic, rate in topics.items():
+            if topic in collectors and tick % ticks_per_emit(rate) == 0:
+                try:
+                    payloads[topic] = collectors[topic]()
+                except Exception as e:
+                    print(f"Collector failed to sample {topic}: {e}")
+        missed = stats.record(time.monotonic() - started)
+        if payloads:
+            try:
+                send_frame(sock, {'tick': tick, 'at': time.time(), 'payloads': payloads, 'stats': stats.summary()})
+            except OSError:
+                return
+
+        # Skip the tick slots an overrun consumed instead of bursting to catch up
+        tick += 1 + missed
+        next_tick += interval * (1 + missed)
+        time.sleep(max(0, next_tick - time.monotonic()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Out-of-process metrics collector')
+    parser.add_argument('--fd', type=int, required=True, help='Connected socket inherited from the server')
+    args = parser.parse_args()
+    run(socket.socket(fileno=args.fd))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,35 +1,682 @@
 
 import docker
 import json
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 
+from bulk import BULK_WORKERS, BulkOperation, labels_match, parse_label_selector
+from docker_pool import DOCKER_POOL_SIZE, DockerPool, DockerTimeout
+from log_search import classify
+from metrics import Histogram
+
+# Default bounds for the concurrent stats collector
+STATS_WORKERS = 16
+STATS_TIMEOUT = 2.5  # seconds to wait for a tick before returning partial results
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+# Seconds a volume listing is reused, and how often sizes are re-fetched
+# with df(), which walks every volume on disk
+VOLUME_CACHE_TTL = 10
+VOLUME_SIZE_TTL = 300
+
+CONTAINER_FORMAT_SECONDS = Histogram('containeros_container_format_duration_seconds',
+                                     'Time to format one container for the frontend')
+CONTAINER_STATS_SECONDS = Histogram('containeros_container_stats_duration_seconds',
+                                    'Time to collect stats for all containers in one listing', labels=('mode',))
+
+
+def _cpu_percent(cpu_stats, precpu_stats):
+    """Calculate CPU percentage between two docker cpu_stats samples"""
+    try:
+        cpu_delta = cpu_stats['cpu_usage']['total_usage'] - precpu_stats['cpu_usage']['total_usage']
+        system_delta = cpu_stats['system_cpu_usage'] - precpu_stats['system_cpu_usage']
+    except (KeyError, TypeError):
+        return 0.0
+    if system_delta > 0 and cpu_delta > 0:
+        return (cpu_delta / system_delta) * 100.0
+    return 0.0
+
+
+def _memory_mb(memory_stats):
+    """Convert docker memory_stats usage to MB"""
+    return memory_stats.get('usage', 0) / (1024 * 1024)
+
+
+def _format_size(size):
+    """Human-readable byte count, e.g. 1.2 GB"""
+    for unit in ('B', 'kB', 'MB', 'GB', 'TB'):
+        if size < 1000 or unit == 'TB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1000.0
+
+
+def _parse_log_timestamp(timestamp):
+    """Convert an RFC 3339 docker log timestamp to epoch seconds, or None"""
+    try:
+        base, _, fraction = timestamp.rstrip('Z').partition('.')
+        epoch = datetime.fromisoformat(base + '+00:00').timestamp()
+        if fraction:
+            epoch += float('0.' + fraction)
+        return epoch
+    except ValueError:
+        return None
+
+
+def format_log_line(name, log, image=None):
+    """Format one timestamped log line for the frontend"""
+    # Try to extract timestamp from the beginning of the log
+    try:
+        timestamp, message = log.split(' ', 1)
+        return {
+            'timestamp': timestamp,
+            'epoch': _parse_log_timestamp(timestamp),
+            'type': classify(message, image),
+            'message': f"[{name}] {message}"
+        }
+    except ValueError:
+        # If timestamp parsing fails, use the whole line as message
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'type': classify(log, image),
+            'message': f"[{name}] {log}"
+        }
+
+
+class StatsCollector:
+    """Fan out one-shot container.stats() calls across a bounded worker pool
+
+    Each call to stats(stream=False) blocks in the daemon for 1-2s while it
+    waits for a second sample, so containers are sampled concurrently and the
+    tick returns after `timeout` seconds with whatever has arrived. Slow
+    containers keep their last known sample (flagged as stale) and are not
+    resubmitted until their previous request has finished.
+    """
+    
+    def __init__(self, max_workers=STATS_WORKERS, timeout=STATS_TIMEOUT):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='docker-stats')
+        self._pending = {}   # container id -> in-flight future
+        self._latest = {}    # container id -> last completed sample
+        self._lock = threading.Lock()
+    
+    def fetch_one(self, container):
+        """Fetch and reduce stats for a single container
+        
+        Blocking; collect() runs it on the worker pool.
+        """
+        started = time.monotonic()
+        stats = container.stats(stream=False)
+        return {
+            'cpu': _cpu_percent(stats.get('cpu_stats', {}), stats.get('precpu_stats', {})),
+            'memory': _memory_mb(stats.get('memory_stats', {})),
+            'latency_ms': round((time.monotonic() - started) * 1000, 1),
+            'sampled_at': time.time(),
+        }
+    
+    def _on_done(self, container_id, future):
+        with self._lock:
+            self._pending.pop(container_id, None)
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                previous = self._latest.get(container_id, {})
+                self._latest[container_id] = dict(previous, error=str(error))
+            else:
+                self._latest[container_id] = future.result()
+    
+    def collect(self, containers):
+        """Collect stats for the given containers, returning {id: sample}"""
+        futures = []
+        with self._lock:
+            for container in containers:
+                if container.status != 'running' or container.id in self._pending:
+                    continue
+                future = self._executor.submit(self.fetch_one, container)
+                self._pending[container.id] = future
+                futures.append((container.id, future))
+        for container_id, future in futures:
+            future.add_done_callback(lambda f, cid=container_id: self._on_done(cid, f))
+        
+        if futures:
+            wait([f for _, f in futures], timeout=self.timeout)
+        
+        results = {}
+        with self._lock:
+            live_ids = set()
+            for container in containers:
+                live_ids.add(container.id)
+                sample = self._latest.get(container.id)
+                if container.status != 'running' or sample is None:
+                    continue
+                sample = dict(sample)
+                sample['stale'] = container.id in self._pending
+                results[container.id] = sample
+            # Forget containers that no longer exist
+            for container_id in list(self._latest):
+                if container_id not in live_ids:
+                    del self._latest[container_id]
+        return results
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+class StatsStreamer:
+    """Hold one persistent stats(stream=True) subscription per running container
+
+    Each stream runs in its own daemon thread and writes into a shared
+    latest-sample table, so readers get the current numbers with a dict
+    lookup. CPU is computed from consecutive samples held here rather than
+    from the daemon's precpu snapshot.
+    """
+    
+    STALE_AFTER = 3.0  # seconds without a sample before it is flagged stale
+    
+    def __init__(self):
+        self._streams = {}   # container id -> threading.Event used to stop the stream
+        self._latest = {}    # container id -> last computed sample
+        self._lock = threading.Lock()
+    
+    def attach(self, container):
+        """Start streaming stats for a container (no-op if already attached)"""
+        with self._lock:
+            if container.id in self._streams:
+                return
+            stop = threading.Event()
+            self._streams[container.id] = stop
+        threading.Thread(
+            target=self._run, args=(container, stop),
+            name=f"docker-stats-{container.id[:12]}", daemon=True
+        ).start()
+    
+    def detach(self, container_id):
+        """Stop streaming stats for a container and drop its sample"""
+        with self._lock:
+            stop = self._streams.pop(container_id, None)
+            self._latest.pop(container_id, None)
+        if stop:
+            stop.set()
+    
+    def sync(self, containers):
+        """Attach streams for running containers and detach everything else"""
+        running = {c.id: c for c in containers if c.status == 'running'}
+        with self._lock:
+            attached = set(self._streams)
+        for container_id in attached - set(running):
+            self.detach(container_id)
+        for container_id in set(running) - attached:
+            self.attach(running[container_id])
+    
+    def latest(self, container_id):
+        """Return the latest sample for a container, or None"""
+        sample = self._latest.get(container_id)
+        if sample is None:
+            return None
+        sample = dict(sample)
+        sample['stale'] = time.time() - sample['sampled_at'] > self.STALE_AFTER
+        return sample
+    
+    def _run(self, container, stop):
+        previous = None
+        try:
+            for stats in container.stats(stream=True, decode=True):
+                if stop.is_set():
+                    break
+                cpu_stats = stats.get('cpu_stats', {})
+                sample = {
+                    'cpu': _cpu_percent(cpu_stats, previous) if previous else 0.0,
+                    'memory': _memory_mb(stats.get('memory_stats', {})),
+                    'sampled_at': time.time(),
+                }
+                previous = cpu_stats
+                with self._lock:
+                    if self._streams.get(container.id) is stop:
+                        self._latest[container.id] = sample
+        except Exception as e:
+            print(f"Stats stream for {container.name} ended: {e}")
+        finally:
+            # The daemon closes the stream when the container stops
+            with self._lock:
+                if self._streams.get(container.id) is stop:
+                    del self._streams[container.id]
+                    self._latest.pop(container.id, None)
+    
+    def close(self):
+        with self._lock:
+            container_ids = list(self._streams)
+        for container_id in container_ids:
+            self.detach(container_id)
+
+
+class CgroupStatsReader:
+    """Read container stats straight from cgroupfs, bypassing the Docker daemon
+
+    Supports the unified (v2) hierarchy and the v1 cpuacct/memory/pids/blkio
+    controllers, under both the systemd (docker-<id>.scope) and cgroupfs
+    (docker/<id>) drivers. File descriptors are opened once per container
+    and re-read with pread, so a pass over every container costs a handful
+    of syscalls each. CPU% is computed from usage deltas between passes
+    using the same formula as the Docker API path.
+    """
+    
+    V2_FILES = {
+        'cpu': 'cpu.stat',
+        'memory': 'memory.current',
+        'pids': 'pids.current',
+        'io': 'io.stat',
+    }
+    V1_FILES = {
+        'cpu': ('cpuacct', 'cpuacct.usage'),
+        'memory': ('memory', 'memory.usage_in_bytes'),
+        'pids': ('pids', 'pids.current'),
+        'io': ('blkio', 'blkio.throttle.io_service_bytes'),
+    }
+    
+    def __init__(self, root=CGROUP_ROOT, cpu_count=None):
+        self.root = root
+        self.version = 2 if os.path.exists(os.path.join(root, 'cgroup.controllers')) else 1
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self._files = {}     # container id -> {stat: fd}
+        self._previous = {}  # container id -> (monotonic ns, cpu usage ns)
+        self._lock = threading.Lock()
+    
+    def _relative_paths(self, container_id):
+        return (
+            os.path.join('system.slice', f'docker-{container_id}.scope'),
+            os.path.join('docker', container_id),
+        )
+    
+    def _open(self, container_id):
+        """Open the stat files for a container, or return None if not found"""
+        for relative in self._relative_paths(container_id):
+            if self.version == 2:
+                base = os.path.join(self.root, relative)
+                paths = {stat: os.path.join(base, name) for stat, name in self.V2_FILES.items()}
+            else:
+                paths = {
+                    stat: os.path.join(self.root, controller, relative, name)
+                    for stat, (controller, name) in self.V1_FILES.items()
+                }
+            if not os.path.exists(paths['cpu']):
+                continue
+            fds = {}
+            for stat, path in paths.items():
+                try:
+                    fds[stat] = os.open(path, os.O_RDONLY)
+                except OSError:
+                    pass  # e.g. pids or io controller not enabled
+            if 'cpu' in fds and 'memory' in fds:
+                return fds
+            self._close_fds(fds)
+        return None
+    
+    @staticmethod
+    def _close_fds(fds):
+        for fd in fds.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+    
+    def _read(self, fd):
+        return os.pread(fd, 65536, 0).decode('ascii', 'replace')
+    
+    def _parse_cpu(self, text):
+        """CPU usage in nanoseconds"""
+        if self.version == 2:
+            for line in text.splitlines():
+                key, _, value = line.partition(' ')
+                if key == 'usage_usec':
+                    return int(value) * 1000
+            return 0
+        return int(text.strip() or 0)
+    
+    def _parse_io(self, text):
+        read = write = 0
+        for line in text.splitlines():
+            if self.version == 2:
+                # "8:0 rbytes=1 wbytes=2 rios=3 wios=4 ..."
+                for field in line.split()[1:]:
+                    key, _, value = field.partition('=')
+                    if key == 'rbytes':
+                        read += int(value)
+                    elif key == 'wbytes':
+                        write += int(value)
+            else:
+                # "8:0 Read 1234"
+                parts = line.split()
+                if len(parts) == 3 and parts[1] == 'Read':
+                    read += int(parts[2])
+                elif len(parts) == 3 and parts[1] == 'Write':
+                    write += int(parts[2])
+        return {'read': read, 'write': write}
+    
+    def _read_container(self, container_id, fds, now_ns):
+        cpu_ns = self._parse_cpu(self._read(fds['cpu']))
+        sample = {
+            'memory': int(self._read(fds['memory']).strip() or 0) / (1024 * 1024),
+            'pids': int(self._read(fds['pids']).strip() or 0) if 'pids' in fds else None,
+            'blkio': self._parse_io(self._read(fds['io'])) if 'io' in fds else None,
+            'cpu': 0.0,
+        }
+        previous = self._previous.get(container_id)
+        if previous:
+            wall_ns = now_ns - previous[0]
+            if wall_ns > 0:
+                sample['cpu'] = max(0.0, (cpu_ns - previous[1]) / (wall_ns * self.cpu_count) * 100.0)
+        self._previous[container_id] = (now_ns, cpu_ns)
+        return sample
+    
+    def collect(self, container_ids):
+        """Read stats for all given containers in one pass
+        
+        Returns {id: sample} for containers whose cgroup could be read;
+        callers fall back to the Docker API for the rest.
+        """
+        started = time.monotonic()
+        results = {}
+        with self._lock:
+            wanted = set(container_ids)
+            for container_id in list(self._files):
+                if container_id not in wanted:
+                    self._forget(container_id)
+            
+            for container_id in container_ids:
+                fds = self._files.get(container_id)
+                if fds is None:
+                    fds = self._open(container_id)
+                    if fds is None:
+                        continue
+                    self._files[container_id] = fds
+                try:
+                    sample = self._read_container(container_id, fds, time.monotonic_ns())
+                except (OSError, ValueError):
+                    # The cgroup went away (container stopped) or is unreadable
+                    self._forget(container_id)
+                    continue
+                sample['sampled_at'] = time.time()
+                results[container_id] = sample
+        
+        elapsed_ms = round((time.monotonic() - started) * 1000, 3)
+        for sample in results.values():
+            sample['latency_ms'] = elapsed_ms
+        return results
+    
+    def _forget(self, container_id):
+        self._close_fds(self._files.pop(container_id, {}))
+        self._previous.pop(container_id, None)
+    
+    def close(self):
+        with self._lock:
+            for container_id in list(self._files):
+                self._forget(container_id)
+
+
+class ContainerInventory:
+    """In-memory container inventory kept current by the Docker events stream
+
+    The inventory is populated with one full listing at startup and then
+    patched from client.events(), so listing containers needs no daemon
+    calls in steady state. Image IDs are resolved to tags from a cached
+    table that is updated from image events.
+    """
+    
+    CONTAINER_ACTIONS = {'create', 'start', 'restart', 'stop', 'die', 'kill', 'pause',
+                         'unpause', 'rename', 'update', 'oom'}
+    IMAGE_ACTIONS = {'tag', 'untag', 'pull', 'load', 'import', 'delete'}
+    RECONNECT_DELAY = 2.0
+    
+    def __init__(self, client):
+        self.client = client
+        self._containers = {}   # container id -> docker Container (attrs cached)
+        self._image_names = {}  # image id -> first tag
+        self._lock = threading.Lock()
+        self._connected = False
+        self._disconnected_at = None
+        self.last_resync = None
+        self._listed_since = None  # when the latest full listing began
+        self.last_event = None
+        self.events_seen = 0
+        self.resync_count = 0
+    
+    def start(self):
+        """Populate the inventory and start following the events stream"""
+        self.resync()
+        threading.Thread(target=self._watch_events, name='docker-events', daemon=True).start()
+    
+    def resync(self):
+        """Rebuild the inventory from a full listing"""
+        started = time.time()
+        containers = {c.id: c for c in self.client.containers.list(all=True)}
+        image_names = {}
+        for image in self.client.images.list():
+            if image.tags:
+                image_names[image.id] = image.tags[0]
+        with self._lock:
+            self._containers = containers
+            self._image_names = image_names
+            self.last_resync = time.time()
+            self._listed_since = started
+            self.resync_count += 1
+    
+    def refresh(self, container_id):
+        """Re-inspect a single container, dropping it if it no longer exists"""
+        try:
+            container = self.client.containers.get(container_id)
+        except docker.errors.NotFound:
+            with self._lock:
+                self._containers.pop(container_id, None)
+            return None
+        with self._lock:
+            self._containers[container.id] = container
+        return container
+    
+    def _refresh_image(self, image_id):
+        try:
+            image = self.client.images.get(image_id)
+        except docker.errors.ImageNotFound:
+            with self._lock:
+                self._image_names.pop(image_id, None)
+            return
+        with self._lock:
+            if image.tags:
+                self._image_names[image.id] = image.tags[0]
+            else:
+                self._image_names.pop(image.id, None)
+    
+    def _handle_event(self, event):
+        event_type = event.get('Type')
+        action = event.get('Action', '')
+        actor_id = event.get('Actor', {}).get('ID') or event.get('id')
+        if not actor_id:
+            return
+        
+        if event_type == 'container':
+            if action == 'destroy':
+                with self._lock:
+                    self._containers.pop(actor_id, None)
+            elif action in self.CONTAINER_ACTIONS:
+                self.refresh(actor_id)
+        elif event_type == 'image' and action in self.IMAGE_ACTIONS:
+            self._refresh_image(actor_id)
+    
+    def _watch_events(self):
+        while True:
+            try:
+                options = {}
+                if self._disconnected_at is None and self._listed_since is not None:
+                    # Replay events from while the startup listing was taken
+                    options['since'] = int(self._listed_since)
+                events = self.client.events(decode=True, filters={'type': ['container', 'image']}, **options)
+                # Anything that happened while disconnected was missed
+                if self._disconnected_at is not None:
+                    self.resync()
+                self._connected = True
+                for event in events:
+                    self.events_seen += 1
+                    self.last_event = time.time()
+                    try:
+                        self._handle_event(event)
+                    except Exception as e:
+                        print(f"Error handling Docker event: {e}")
+            except Exception as e:
+                print(f"Docker events stream interrupted: {e}")
+            self._connected = False
+            self._disconnected_at = time.time()
+            time.sleep(self.RECONNECT_DELAY)
+    
+    def containers(self):
+        """Return a snapshot list of the cached containers"""
+        with self._lock:
+            return list(self._containers.values())
+    
+    def image_name(self, container):
+        """Resolve a container's image to a tag without a daemon round-trip"""
+        image_id = container.attrs.get('Image', '')
+        name = self._image_names.get(image_id)
+        if name:
+            return name
+        return container.attrs.get('Config', {}).get('Image') or image_id
+    
+    def metrics(self):
+        """Inventory freshness metrics"""
+        now = time.time()
+        if self._connected:
+            staleness = 0.0
+        else:
+            since = self._disconnected_at or self.last_resync or now
+            staleness = now - since
+        with self._lock:
+            count = len(self._containers)
+        return {
+            'containers': count,
+            'eventStreamConnected': self._connected,
+            'stalenessSeconds': round(staleness, 3),
+            'lastResync': self.last_resync,
+            'lastEvent': self.last_event,
+            'eventsSeen': self.events_seen,
+            'resyncCount': self.resync_count,
+        }
+
+
 class ContainerManager:
     """Manage Docker containers via docker-py"""
     
-    def __init__(self):
+    def __init__(self, stats_workers=STATS_WORKERS, stats_timeout=STATS_TIMEOUT, stats_mode='poll',
+                 use_inventory=True, cgroup_root=CGROUP_ROOT, pool_size=DOCKER_POOL_SIZE,
+                 volume_scanner=None, client=None):
+        # Daemon calls from request handlers go through the pool so they are
+        # bounded by per-operation timeouts and never block the event loop.
+        # `client` replaces docker.from_env(), e.g. with the benchmarks' fake
         try:
-            self.client = docker.from_env()
+            self.pool = DockerPool(pool_size=pool_size, client=client)
+            self.client = self.pool.client
         except docker.errors.DockerException:
             print("Error connecting to Docker. Make sure Docker is running.")
+            self.pool = None
             self.client = None
+        self._last_listing = []
+        self._volume_cache = None            # (fetched at, volumes)
+        self._volume_size_cache = (0.0, {})  # (fetched at, volume name -> bytes)
+        self._volume_size_refreshing = False
+        # Optional VolumeScanner; df() is then only used for volumes it cannot read
+        self.volume_scanner = volume_scanner
+        self.stats_collector = StatsCollector(max_workers=stats_workers, timeout=stats_timeout)
+        # 'poll' re-requests one-shot stats every tick, 'stream' keeps a
+        # persistent stats stream open per running container, 'cgroup' reads
+        # cgroupfs directly and polls the API only for unreadable containers
+        self.stats_mode = stats_mode
+        self.stats_streamer = StatsStreamer() if stats_mode == 'stream' else None
+        self.cgroup_reader = CgroupStatsReader(cgroup_root) if stats_mode == 'cgroup' else None
         
-    def _format_container(self, container):
-        """Format container data for frontend"""
+        self.inventory = None
+        if self.client and use_inventory:
+            try:
+                self.inventory = ContainerInventory(self.client)
+                self.inventory.start()
+            except docker.errors.DockerException as e:
+                print(f"Container inventory unavailable, listing directly: {e}")
+                self.inventory = None
+    
+    def _all_containers(self):
+        """All containers, from the inventory cache when available"""
+        if self.inventory:
+            return self.inventory.containers()
+        return self.client.containers.list(all=True)
+    
+    def running_container_ids(self):
+        """IDs of running containers"""
+        if not self.client:
+            return []
+        try:
+            return [c.id for c in self._all_containers() if c.status == 'running']
+        except Exception as e:
+            print(f"Error listing running containers: {e}")
+            return []
+    
+    def _image_name(self, container):
+        if self.inventory:
+            return self.inventory.image_name(container)
+        return container.image.tags[0] if container.image.tags else container.image.id
+    
+    def _safe_image_name(self, container):
+        try:
+            return self._image_name(container)
+        except Exception:
+            return "unknown"
+    
+    def _refresh_inventory(self, container_id):
+        """Update the cache right away instead of waiting for the event
+        
+        Best effort: the action already succeeded, and the events stream
+        brings the cache up to date if this fails.
+        """
+        if not self.inventory:
+            return
+        try:
+            self.pool.call('inspect', self.inventory.refresh, container_id)
+        except Exception as e:
+            print(f"Error refreshing container {container_id} in the inventory: {e}")
+    
+    def resync_inventory(self):
+        """Force a full re-listing of the container inventory"""
+        if not self.inventory:
+            return {"success": False, "error": "Container inventory not enabled"}
+        try:
+            self.pool.coalesce('resync', lambda: self.pool.call('list', self.inventory.resync))
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        return {"success": True, "inventory": self.inventory.metrics()}
+    
+    def pool_stats(self):
+        """Return Docker call pool metrics"""
+        if not self.pool:
+            return {"enabled": False}
+        return dict(self.pool.stats(), enabled=True)
+    
+    def inventory_metrics(self):
+        """Return inventory cache metrics"""
+        if not self.inventory:
+            return {"enabled": False}
+        return dict(self.inventory.metrics(), enabled=True)
+        
+    def _format_container(self, container, sample=None):
+        """Format container data for frontend
+        
+        `sample` is a pre-collected stats sample from the StatsCollector. When
+        omitted, stats are fetched synchronously for this container.
+        """
         try:
             status = container.status
-            stats = container.stats(stream=False)
-            
-            # Calculate CPU percentage
-            cpu_delta = stats['cpu_stats']['cpu_usage']['total_usage'] - stats['precpu_stats']['cpu_usage']['total_usage']
-            system_delta = stats['cpu_stats']['system_cpu_usage'] - stats['precpu_stats']['system_cpu_usage']
-            cpu_percent = 0.0
-            if system_delta > 0 and cpu_delta > 0:
-                cpu_percent = (cpu_delta / system_delta) * 100.0
-                
-            # Calculate memory usage
-            memory_usage = stats['memory_stats'].get('usage', 0)
-            memory_limit = stats['memory_stats'].get('limit', 1)
-            memory_mb = memory_usage / (1024 * 1024)  # Convert to MB
+            if sample is None:
+                sample = self.stats_collector.fetch_one(container) if status == 'running' else {}
+            cpu_percent = sample.get('cpu', 0.0)
+            memory_mb = sample.get('memory', 0.0)
             
             # Get port mappings
             ports = []
@@ -41,22 +688,31 @@ class ContainerManager:
             
             created = datetime.fromisoformat(container.attrs['Created'].replace('Z', '+00:00')).timestamp() * 1000
             
-            return {
+            formatted = {
                 'id': container.id,
                 'name': container.name,
-                'image': container.image.tags[0] if container.image.tags else container.image.id,
+                'image': self._image_name(container),
                 'status': status,
                 'created': created,
                 'cpu': round(cpu_percent, 1),
                 'memory': round(memory_mb, 1),
                 'ports': ports
             }
+            if sample.get('pids') is not None:
+                formatted['pids'] = sample['pids']
+            if sample.get('blkio') is not None:
+                formatted['blkio'] = sample['blkio']
+            if 'latency_ms' in sample:
+                formatted['statsLatencyMs'] = sample['latency_ms']
+            if sample.get('stale'):
+                formatted['statsStale'] = True
+            return formatted
         except Exception as e:
             # Return minimal data if error occurs during stats collection
             return {
                 'id': container.id,
                 'name': container.name,
-                'image': container.image.tags[0] if hasattr(container, 'image') and container.image.tags else "unknown",
+                'image': self._safe_image_name(container),
                 'status': container.status if hasattr(container, 'status') else "unknown",
                 'created': 0,
                 'cpu': 0,
@@ -65,72 +721,116 @@ class ContainerManager:
                 'error': str(e)
             }
     
+    def _collect_samples(self, all_containers):
+        """Collect stats samples for the given containers using the configured mode"""
+        if self.stats_streamer:
+            self.stats_streamer.sync(all_containers)
+            samples = {}
+            for container in all_containers:
+                sample = self.stats_streamer.latest(container.id)
+                if sample is not None:
+                    samples[container.id] = sample
+            return samples
+        
+        if self.cgroup_reader:
+            running = [c for c in all_containers if c.status == 'running']
+            samples = self.cgroup_reader.collect([c.id for c in running])
+            fallback = [c for c in running if c.id not in samples]
+            if fallback:
+                samples.update(self.stats_collector.collect(fallback))
+            return samples
+        
+        return self.stats_collector.collect(all_containers)
+    
     def list_containers(self):
-        """List all containers"""
+        """List all containers
+        
+        Concurrent calls share one listing and stats collection. If it
+        times out, the previous listing is returned.
+        """
         if not self.client:
             return []
+        try:
+            self._last_listing = self.pool.coalesce(
+                'list_containers', lambda: self.pool.call('list', self._list_containers))
+        except DockerTimeout as e:
+            print(f"Listing containers timed out: {e}")
+        return self._last_listing
+    
+    def _list_containers(self):
+        all_containers = self._all_containers()
+        with CONTAINER_STATS_SECONDS.time(mode=self.stats_mode):
+            samples = self._collect_samples(all_containers)
         
         containers = []
-        for container in self.client.containers.list(all=True):
-            containers.append(self._format_container(container))
+        for container in all_containers:
+            started = time.perf_counter()
+            containers.append(self._format_container(container, samples.get(container.id, {})))
+            CONTAINER_FORMAT_SECONDS.observe(time.perf_counter() - started)
         return containers
     
     def list_containers_with_stats(self):
         """List containers with current stats"""
         return self.list_containers()
     
-    def get_container_logs(self, container_id, tail=100):
-        """Get logs for a specific container"""
+    def get_container_logs(self, container_id, tail=100, since=None, until=None):
+        """Get logs for a specific container
+        
+        `since` and `until` are epoch seconds. The returned cursor holds the
+        timestamps to pass as `until` (older page) or `since` (newer lines).
+        """
         if not self.client:
             return {"logs": []}
             
         try:
-            container = self.client.containers.get(container_id)
-            logs = container.logs(tail=tail, timestamps=True).decode('utf-8').strip().split('\n')
-            
-            formatted_logs = []
-            for log in logs:
-                if log:
-                    # Try to extract timestamp from the beginning of the log
-                    try:
-                        timestamp, message = log.split(' ', 1)
-                        # Determine log type by keywords
-                        if 'ERROR' in message or 'FATAL' in message or 'EXCEPTION' in message:
-                            log_type = 'ERROR'
-                        elif 'WARN' in message:
-                            log_type = 'WARN'
-                        elif 'DEBUG' in message:
-                            log_type = 'DEBUG'
-                        else:
-                            log_type = 'INFO'
-                            
-                        formatted_logs.append({
-                            'timestamp': timestamp,
-                            'type': log_type,
-                            'message': f"[{container.name}] {message}"
-                        })
-                    except ValueError:
-                        # If timestamp parsing fails, use the whole line as message
-                        formatted_logs.append({
-                            'timestamp': datetime.now().isoformat(),
-                            'type': 'INFO',
-                            'message': f"[{container.name}] {log}"
-                        })
-            
-            return {"logs": formatted_logs}
+            return self.pool.coalesce(('logs', container_id, tail, since, until),
+                                      lambda: self._get_container_logs(container_id, tail, since, until))
         except docker.errors.NotFound:
             return {"error": "Container not found"}
         except Exception as e:
             return {"error": str(e)}
     
+    def _get_container_logs(self, container_id, tail, since, until):
+        container = self.pool.call('get', self.client.containers.get, container_id)
+        kwargs = {'tail': tail, 'timestamps': True}
+        if since is not None:
+            kwargs['since'] = since
+        if until is not None:
+            kwargs['until'] = until
+        logs = self.pool.call('logs', container.logs, **kwargs).decode('utf-8').strip().split('\n')
+        
+        image = self._safe_image_name(container)
+        formatted_logs = [format_log_line(container.name, log, image) for log in logs if log]
+        epochs = [log['epoch'] for log in formatted_logs if log.get('epoch') is not None]
+        cursor = {
+            'until': epochs[0] if epochs else until,
+            # Docker's since is inclusive, so step past the newest line
+            'since': epochs[-1] + 1e-6 if epochs else since,
+        }
+        return {"logs": formatted_logs, "cursor": cursor}
+    
+    def open_log_stream(self, container_id, since=None):
+        """Open a follow-mode log stream, returning (stream, container name, image)
+        
+        The stream yields raw byte chunks and can be closed from another
+        thread to stop following.
+        """
+        container = self.pool.call('get', self.client.containers.get, container_id)
+        stream = self.pool.call(
+            'logs', container.logs, stream=True, follow=True, timestamps=True,
+            since=since if since is not None else int(time.time())
+        )
+        return stream, container.name, self._safe_image_name(container)
+    
     def start_container(self, container_id):
         """Start a container"""
         if not self.client:
             return False
             
         try:
-            container = self.client.containers.get(container_id)
-            container.start()
+            container = self.pool.call('get', self.client.containers.get, container_id)
+            self.pool.call('start', container.start)
+            self._refresh_inventory(container.id)
             return True
         except Exception:
             return False
@@ -141,25 +841,63 @@ class ContainerManager:
             return False
             
         try:
-            container = self.client.containers.get(container_id)
-            container.stop()
+            container = self.pool.call('get', self.client.containers.get, container_id)
+            self.pool.call('stop', container.stop)
+            self._refresh_inventory(container.id)
+            return True
+        except Exception:
+            return False
+    
+    def restart_container(self, container_id):
+        """Restart a container"""
+        if not self.client:
+            return False
+            
+        try:
+            container = self.pool.call('get', self.client.containers.get, container_id)
+            self.pool.call('restart', container.restart)
+            self._refresh_inventory(container.id)
             return True
         except Exception:
             return False
     
+    def bulk_action(self, action, ids=None, labels=None, workers=BULK_WORKERS):
+        """Apply start/stop/restart/delete to many containers concurrently
+        
+        Containers are given by ID and/or a label selector ("key=value,key").
+        Returns the started BulkOperation.
+        """
+        handlers = {
+            'start': self.start_container,
+            'stop': self.stop_container,
+            'restart': self.restart_container,
+            'delete': self.delete_container,
+        }
+        if action not in handlers:
+            raise ValueError(f"Unknown action '{action}'")
+        ids = list(ids or [])
+        selector = parse_label_selector(labels)
+        if selector and self.client:
+            containers = self.pool.call('list', self._all_containers)
+            ids += [c.id for c in containers if labels_match(c.labels, selector)]
+        return BulkOperation(action, ids, handlers[action], workers).start()
+    
     def delete_container(self, container_id):
         """Delete a container"""
         if not self.client:
             return False
             
         try:
-            container = self.client.containers.get(container_id)
-            container.remove(force=True)
+            container = self.pool.call('get', self.client.containers.get, container_id)
+            self.pool.call('remove', container.remove, force=True)
+            self._refresh_inventory(container.id)
+            self._volume_cache = None
             return True
         except Exception:
             return False
     
-    def create_container(self, image, name=None, ports=None, cpu_limit=None, memory_limit=None, gpu=False):
+    def create_container(self, image, name=None, ports=None, cpu_limit=None, memory_limit=None, gpu=False,
+                         labels=None):
         """Create a new container"""
         if not self.client:
             return {"success": False, "error": "Docker client not available"}
@@ -181,19 +919,23 @@ class ContainerManager:
                 device_requests = [docker.types.DeviceRequest(count=-1, capabilities=[['gpu']])]
                 
             # Create the container
-            container = self.client.containers.run(
+            container = self.pool.call(
+                'run', self.client.containers.run,
                 image=image,
                 name=name,
                 ports=ports,
                 mem_limit=mem_limit,
                 cpu_shares=cpu_shares,
                 device_requests=device_requests,
+                labels=labels,
                 detach=True
             )
+            self._refresh_inventory(container.id)
+            self._volume_cache = None
             
             return {
                 "success": True,
-                "container": self._format_container(container)
+                "container": self.pool.call('inspect', self._format_container, container)
             }
         except docker.errors.ImageNotFound:
             return {"success": False, "error": f"Image '{image}' not found"}
@@ -203,69 +945,95 @@ class ContainerManager:
             return {"success": False, "error": str(e)}
     
     def list_volumes(self):
-        """List all Docker volumes"""
+        """List all Docker volumes
+        
+        Listings are cached for VOLUME_CACHE_TTL seconds (and dropped when
+        volumes or containers change). Sizes come from the volume scanner
+        when one is configured, and otherwise from a df() call made in the
+        background at most every VOLUME_SIZE_TTL seconds.
+        """
         if not self.client:
             return []
-            
+        cached = self._volume_cache
+        if cached and time.time() - cached[0] < VOLUME_CACHE_TTL:
+            return cached[1]
+        return self.pool.coalesce('list_volumes', lambda: self.pool.call('volumes', self._list_volumes))
+    
+    def _list_volumes(self):
+        now = time.time()
+        # Volume name -> names of the containers mounting it, in one pass
+        used_by = {}
+        for container in self._all_containers():
+            for mount in container.attrs.get('Mounts') or []:
+                if mount.get('Type') == 'volume':
+                    used_by.setdefault(mount.get('Name'), []).append(container.name)
+        
+        listed = self.client.volumes.list()
+        sizes = self._volume_sizes(listed)
         volumes = []
-        for volume in self.client.volumes.list():
-            # Get containers using this volume
-            used_by = []
-            for container in self.client.containers.list(all=True):
-                for mount in container.attrs['Mounts']:
-                    if mount['Type'] == 'volume' and mount['Name'] == volume.name:
-                        used_by.append(container.name)
-            
-            # Try to get volume size (if possible)
-            try:
-                # This is a rough estimate and may not work on all systems
-                inspect_data = volume.attrs
-                mountpoint = inspect_data['Mountpoint']
-                size = "Unknown"  # Default value
-                
-                # Try to get size using docker system df
-                try:
-                    import subprocess
-                    output = subprocess.check_output(['docker', 'system', 'df', '-v']).decode('utf-8')
-                    for line in output.split('\n'):
-                        if volume.name in line:
-                            parts = line.split()
-                            if len(parts) >= 3:
-                                size = parts[2]
-                except Exception:
-                    pass
-                
-                volumes.append({
-                    'id': volume.id,
-                    'name': volume.name,
-                    'driver': volume.attrs['Driver'],
-                    'mountpoint': mountpoint,
-                    'size': size,
-                    'created': volume.attrs['CreatedAt'],
-                    'usedBy': used_by
-                })
-            except Exception as e:
-                volumes.append({
-                    'id': volume.id,
-                    'name': volume.name,
-                    'driver': volume.attrs['Driver'],
-                    'mountpoint': volume.attrs.get('Mountpoint', 'Unknown'),
-                    'size': 'Unknown',
-                    'created': volume.attrs.get('CreatedAt', 'Unknown'),
-                    'usedBy': used_by,
-                    'error': str(e)
-                })
+        for volume in listed:
+            attrs = volume.attrs
+            size_bytes = sizes.get(volume.name)
+            volumes.append({
+                'id': volume.id,
+                'name': volume.name,
+                'driver': attrs.get('Driver', 'Unknown'),
+                'mountpoint': attrs.get('Mountpoint', 'Unknown'),
+                'size': _format_size(size_bytes) if size_bytes is not None else 'Unknown',
+                'sizeBytes': size_bytes,
+                'created': attrs.get('CreatedAt', 'Unknown'),
+                'usedBy': used_by.get(volume.name, [])
+            })
         
+        self._volume_cache = (now, volumes)
         return volumes
     
+    def _volume_sizes(self, volumes):
+        """Volume name -> bytes, from the volume scanner and/or a cached df()"""
+        scanned = {}
+        need_df = True
+        if self.volume_scanner:
+            self.volume_scanner.set_targets({v.name: v.attrs.get('Mountpoint') for v in volumes})
+            scanned = self.volume_scanner.sizes()
+            need_df = bool(self.volume_scanner.unreadable())
+        
+        fetched_at, sizes = self._volume_size_cache
+        if need_df and time.time() - fetched_at >= VOLUME_SIZE_TTL and not self._volume_size_refreshing:
+            # df() walks every volume in the daemon, so it runs in the background
+            self._volume_size_refreshing = True
+            threading.Thread(target=self._refresh_volume_sizes, name='docker-df', daemon=True).start()
+        return dict(sizes, **scanned)
+    
+    def _refresh_volume_sizes(self):
+        try:
+            usage = self.pool.call('df', self.client.df)
+            sizes = {}
+            for volume in usage.get('Volumes') or []:
+                size = (volume.get('UsageData') or {}).get('Size', -1)
+                if size is not None and size >= 0:
+                    sizes[volume['Name']] = size
+            self._volume_size_cache = (time.time(), sizes)
+            self._volume_cache = None
+        except Exception as e:
+            print(f"Error fetching volume sizes: {e}")
+        finally:
+            self._volume_size_refreshing = False
+    
+    def volume_scan_stats(self):
+        """Return volume scanner progress and results"""
+        if not self.volume_scanner:
+            return {"enabled": False}
+        return dict(self.volume_scanner.stats(), enabled=True)
+    
     def delete_volume(self, volume_id):
         """Delete a Docker volume"""
         if not self.client:
             return False
             
         try:
-            volume = self.client.volumes.get(volume_id)
-            volume.remove()
+            volume = self.pool.call('get', self.client.volumes.get, volume_id)
+            self.pool.call('remove', volume.remove)
+            self._volume_cache = None
             return True
         except Exception:
             return False
@@ -0,0 +1,216 @@
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import docker
+
+try:
+    import eventlet
+except ImportError:
+    eventlet = None
+
+from metrics import Counter, Gauge, Histogram
+
+# Keep-alive connections to the daemon socket, and worker threads using them
+DOCKER_POOL_SIZE = 10
+
+# Seconds to wait for each kind of daemon call before giving up on it
+OP_TIMEOUTS = {
+    'list': 10,
+    'get': 5,
+    'inspect': 5,
+    'logs': 10,
+    'start': 30,
+    'stop': 30,   # the daemon waits up to the container's stop timeout (10s)
+    'restart': 40,
+    'remove': 30,
+    'run': 120,   # may pull the image
+    'volumes': 15,
+    'df': 60,
+}
+DEFAULT_TIMEOUT = 30
+# Seconds a call may wait for a free worker, e.g. while a hung daemon holds them all
+QUEUE_TIMEOUT = 60
+
+DOCKER_CALL_SECONDS = Histogram('containeros_docker_call_duration_seconds',
+                                'Docker daemon call latency by operation', labels=('op',))
+DOCKER_CALL_FAILURES = Counter('containeros_docker_call_failures_total',
+                               'Docker daemon calls that raised or timed out', labels=('op', 'reason'))
+DOCKER_CALLS_IN_FLIGHT = Gauge('containeros_docker_calls_in_flight', 'Docker daemon calls currently running')
+
+
+class DockerTimeout(Exception):
+    """A daemon call did not finish within its operation timeout"""
+
+
+class _Start:
+    """When a pooled call left the queue and began running"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.at = None
+
+    def mark(self):
+        self.at = time.monotonic()
+        self.event.set()
+
+
+class SingleFlight:
+    """Coalesce identical concurrent calls into one
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for and share its result (or exception).
+    """
+
+    def __init__(self, wait):
+        self._wait = wait
+        self._lock = threading.Lock()
+        self._flights = {}  # key -> Future
+        self.coalesced = 0
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._flights[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return self._wait(future, timeout)
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+
+
+class DockerPool:
+    """Pooled, timeout-bounded access to the Docker daemon
+
+    The client keeps up to `pool_size` keep-alive connections to the
+    daemon socket, and calls run on a worker pool of the same size so a
+    slow call never holds up the caller's event loop. Green threads on the
+    eventlet hub wait cooperatively; ordinary threads block. A call that
+    runs longer than its operation's timeout raises DockerTimeout (the
+    daemon call itself finishes in the background); time spent queued
+    behind other calls, e.g. a bulk operation, does not count. Queueing
+    has its own bound: a call that gets no worker within `queue_timeout`
+    is cancelled and raises DockerTimeout.
+    """
+
+    def __init__(self, pool_size=DOCKER_POOL_SIZE, timeouts=None, client=None, queue_timeout=QUEUE_TIMEOUT):
+        self.client = client or docker.from_env(max_pool_size=pool_size)
+        self.timeouts = dict(OP_TIMEOUTS, **(timeouts or {}))
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='docker-call')
+        self._main_thread = threading.main_thread()
+        self.flights = SingleFlight(self._wait)
+        self._lock = threading.Lock()
+        self._ops = {}  # op -> {'calls', 'errors', 'timeouts', 'totalMs', 'maxMs'}
+        self.in_flight = 0
+
+    def _green(self):
+        # Without monkey patching every green thread runs on the main thread
+        return eventlet is not None and threading.current_thread() is self._main_thread
+
+    def _wait(self, future, timeout, start=None):
+        """Wait for a future; with `start`, the timeout runs from when the call began"""
+        if not self._green():
+            remaining = timeout
+            if start is not None:
+                # cancel() fails once a worker has picked the call up
+                if not start.event.wait(self.queue_timeout) and future.cancel():
+                    raise self._queue_timeout_error()
+                start.event.wait()
+                if timeout is not None:
+                    remaining = max(0, timeout - (time.monotonic() - start.at))
+            try:
+                return future.result(remaining)
+            except FutureTimeout:
+                raise DockerTimeout(f"Docker call timed out after {timeout}s") from None
+        queue_deadline = None if start is None else time.monotonic() + self.queue_timeout
+        deadline = None
+        delay = 0.001
+        while not future.done():
+            now = time.monotonic()
+            if start is not None and start.at is None:
+                if now >= queue_deadline and future.cancel():
+                    raise self._queue_timeout_error()
+            elif deadline is None and timeout is not None:
+                deadline = (now if start is None else start.at) + timeout
+            if deadline is not None and now >= deadline:
+                raise DockerTimeout(f"Docker call timed out after {timeout}s")
+            eventlet.sleep(delay)
+            delay = min(delay * 2, 0.02)
+        return future.result()
+
+    def _queue_timeout_error(self):
+        return DockerTimeout(f"Docker call got no worker within {self.queue_timeout}s")
+
+    def call(self, op, fn, *args, timeout=None, **kwargs):
+        """Run fn(*args, **kwargs) on the pool, bounded by the op's timeout"""
+        timeout = timeout if timeout is not None else self.timeouts.get(op, DEFAULT_TIMEOUT)
+        started = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+            DOCKER_CALLS_IN_FLIGHT.set(self.in_flight)
+        outcome = 'errors'
+        try:
+            start = _Start()
+            future = self._executor.submit(self._run, start, fn, args, kwargs)
+            result = self._wait(future, timeout, start)
+            outcome = None
+            return result
+        except DockerTimeout:
+            outcome = 'timeouts'
+            raise
+        finally:
+            self._record(op, (time.perf_counter() - started) * 1000, outcome)
+
+    @staticmethod
+    def _run(start, fn, args, kwargs):
+        start.mark()
+        return fn(*args, **kwargs)
+
+    def coalesce(self, key, fn, timeout=None):
+        """Run fn once for all concurrent callers with the same key"""
+        return self.flights.do(key, fn, timeout)
+
+    def _record(self, op, elapsed_ms, outcome):
+        with self._lock:
+            self.in_flight -= 1
+            DOCKER_CALLS_IN_FLIGHT.set(self.in_flight)
+            stats = self._ops.get(op)
+            if stats is None:
+                stats = self._ops[op] = {'calls': 0, 'errors': 0, 'timeouts': 0, 'totalMs': 0.0, 'maxMs': 0.0}
+            stats['calls'] += 1
+            stats['totalMs'] += elapsed_ms
+            stats['maxMs'] = max(stats['maxMs'], elapsed_ms)
+            if outcome:
+                stats[outcome] += 1
+        DOCKER_CALL_SECONDS.observe(elapsed_ms / 1000, op=op)
+        if outcome:
+            DOCKER_CALL_FAILURES.inc(op=op, reason='timeout' if outcome == 'timeouts' else 'error')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'inFlight': self.in_flight,
+                'coalesced': self.flights.coalesced,
+                'ops': {
+                    op: dict(s, avgMs=round(s['totalMs'] / s['calls'], 3) if s['calls'] else 0,
+                             totalMs=round(s['totalMs'], 3), maxMs=round(s['maxMs'], 3))
+                    for op, s in self._ops.items()
+                },
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.client.close()
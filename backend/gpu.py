@@ -0,0 +1,280 @@
+
+import atexit
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+
+# Path to nvidia-smi; point it at a fake script to test without a GPU
+NVIDIA_SMI = os.environ.get('NVIDIA_SMI', 'nvidia-smi')
+GPU_QUERY = 'index,uuid,name,utilization.gpu,memory.used,memory.total,temperature.gpu'
+APP_QUERY = 'gpu_uuid,pid,used_memory'
+SAMPLE_INTERVAL_MS = 1000
+STALE_INTERVALS = 3  # a sample older than this many intervals is flagged stale
+
+CONTAINER_ID = re.compile(r'([0-9a-f]{64})')
+
+
+def container_id_for_pid(pid, proc_root='/proc'):
+    """Return the Docker container ID a process belongs to, if any"""
+    try:
+        with open(os.path.join(proc_root, str(pid), 'cgroup'), 'r') as f:
+            match = CONTAINER_ID.search(f.read())
+    except OSError:
+        return None
+    return match.group(1) if match else None
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        # nvidia-smi prints "[N/A]" or "[Not Supported]" for missing fields
+        return 0.0
+
+
+class GpuBackend:
+    """Base class for GPU samplers that keep a cached latest sample
+
+    Subclasses fill the sample from a background thread started by
+    start(); this class itself samples nothing and always reports stale.
+    """
+
+    name = 'none'
+
+    def __init__(self, interval_ms=SAMPLE_INTERVAL_MS):
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        self._gpus = {}       # index -> gpu dict
+        self._processes = {}  # (gpu uuid, pid) -> (process dict, seen at)
+        self.updated_at = None
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _set_gpu(self, gpu):
+        with self._lock:
+            self._gpus[gpu['index']] = gpu
+            self.updated_at = time.time()
+
+    def _set_process(self, process):
+        with self._lock:
+            self._processes[(process['gpu_uuid'], process['pid'])] = (process, time.time())
+
+    def latest(self):
+        """Latest sample: {'gpus': [...], 'processes': [...], 'updated_at': ts, 'stale': bool}
+
+        `stale` is set when no GPU row arrived for STALE_INTERVALS sample
+        intervals, e.g. because the sampler died; the figures are then the
+        last ones seen.
+        """
+        now = time.time()
+        # A process is dropped once it has been missing for two sample intervals
+        cutoff = now - 2 * self.interval_ms / 1000.0
+        with self._lock:
+            for key in [k for k, (_, seen) in self._processes.items() if seen < cutoff]:
+                del self._processes[key]
+            return {
+                'gpus': [self._gpus[i] for i in sorted(self._gpus)],
+                'processes': [process for process, _ in self._processes.values()],
+                'updated_at': self.updated_at,
+                'stale': (self.updated_at is None
+                          or now - self.updated_at > STALE_INTERVALS * self.interval_ms / 1000.0),
+            }
+
+
+class NvidiaSmiBackend(GpuBackend):
+    """Stream samples from long-running `nvidia-smi --loop-ms` processes
+
+    One process reports per-GPU utilisation and memory, another the compute
+    processes using each GPU. Both print a CSV row per item per interval,
+    which reader threads parse into the cached sample, so a tick costs a
+    dict lookup instead of a fork.
+
+    A reader whose process exits is restarted after RESTART_DELAY, doubled
+    after each failing exit that produced no row, up to MAX_RESTART_DELAY.
+    After MAX_FAILURES such exits in a row the reader gives up, and the
+    sample goes stale.
+    """
+
+    name = 'nvidia-smi'
+    RESTART_DELAY = 5.0
+    MAX_RESTART_DELAY = 300.0
+    MAX_FAILURES = 5
+
+    def __init__(self, binary=NVIDIA_SMI, interval_ms=SAMPLE_INTERVAL_MS):
+        super().__init__(interval_ms)
+        self.binary = binary
+        self._procs = []
+        self._closed = False
+
+    def start(self):
+        for query, handler in ((f'--query-gpu={GPU_QUERY}', self._parse_gpu),
+                               (f'--query-compute-apps={APP_QUERY}', self._parse_process)):
+            threading.Thread(target=self._run, args=(query, handler), name='nvidia-smi-reader', daemon=True).start()
+        atexit.register(self.close)
+
+    def _run(self, query, handler):
+        failures = 0
+        while not self._closed:
+            try:
+                proc = subprocess.Popen(
+                    [self.binary, query, '--format=csv,noheader,nounits', f'--loop-ms={self.interval_ms}'],
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1
+                )
+            except OSError as e:
+                print(f"Failed to start {self.binary}: {e}")
+                return
+            self._procs.append(proc)
+            parsed = False
+            for line in proc.stdout:
+                line = line.strip()
+                if line:
+                    try:
+                        handler([field.strip() for field in line.split(',')])
+                        parsed = True
+                    except (ValueError, IndexError):
+                        pass  # e.g. "No running processes found"
+            proc.wait()
+            self._procs.remove(proc)
+            if self._closed:
+                return
+            # The compute-apps query legitimately prints no row while no
+            # process uses a GPU, so only a failing exit status counts there
+            failures = 0 if parsed or proc.returncode == 0 else failures + 1
+            if failures >= self.MAX_FAILURES:
+                print(f"{self.binary} {query} failed {failures} times in a row "
+                      f"(exit status {proc.returncode}), giving up")
+                return
+            time.sleep(min(self.RESTART_DELAY * 2 ** failures, self.MAX_RESTART_DELAY))
+
+    def _parse_gpu(self, fields):
+        index, uuid, name, utilization, mem_used, mem_total, temperature = fields[:7]
+        mem_used, mem_total = _number(mem_used), _number(mem_total)
+        self._set_gpu({
+            'index': int(index),
+            'uuid': uuid,
+            'name': name,
+            'percent': _number(utilization),
+            'temperature': _number(temperature),
+            'memory': {
+                'used': mem_used,
+                'total': mem_total,
+                'percent': (mem_used / mem_total) * 100 if mem_total > 0 else 0
+            }
+        })
+
+    def _parse_process(self, fields):
+        gpu_uuid, pid, used_memory = fields[:3]
+        self._set_process({'gpu_uuid': gpu_uuid, 'pid': int(pid), 'memory': _number(used_memory)})
+
+    def close(self):
+        self._closed = True
+        for proc in list(self._procs):
+            if proc.poll() is None:
+                proc.terminate()
+
+
+class NvmlBackend(GpuBackend):
+    """Poll NVML in-process from a background thread (requires pynvml)"""
+
+    name = 'nvml'
+
+    def __init__(self, interval_ms=SAMPLE_INTERVAL_MS):
+        super().__init__(interval_ms)
+        import pynvml
+        self._nvml = pynvml
+        pynvml.nvmlInit()
+        self._closed = False
+
+    def start(self):
+        threading.Thread(target=self._run, name='nvml-sampler', daemon=True).start()
+        atexit.register(self.close)
+
+    def _sample(self):
+        nvml = self._nvml
+        for index in range(nvml.nvmlDeviceGetCount()):
+            handle = nvml.nvmlDeviceGetHandleByIndex(index)
+            uuid = nvml.nvmlDeviceGetUUID(handle)
+            uuid = uuid.decode() if isinstance(uuid, bytes) else uuid
+            name = nvml.nvmlDeviceGetName(handle)
+            name = name.decode() if isinstance(name, bytes) else name
+            utilization = nvml.nvmlDeviceGetUtilizationRates(handle)
+            memory = nvml.nvmlDeviceGetMemoryInfo(handle)
+            mem_used, mem_total = memory.used / (1024 * 1024), memory.total / (1024 * 1024)
+            self._set_gpu({
+                'index': index,
+                'uuid': uuid,
+                'name': name,
+                'percent': float(utilization.gpu),
+                'temperature': float(nvml.nvmlDeviceGetTemperature(handle, nvml.NVML_TEMPERATURE_GPU)),
+                'memory': {
+                    'used': mem_used,
+                    'total': mem_total,
+                    'percent': (mem_used / mem_total) * 100 if mem_total > 0 else 0
+                }
+            })
+            for process in nvml.nvmlDeviceGetComputeRunningProcesses(handle):
+                used = (process.usedGpuMemory or 0) / (1024 * 1024)
+                self._set_process({'gpu_uuid': uuid, 'pid': process.pid, 'memory': used})
+
+    def _run(self):
+        while not self._closed:
+            try:
+                self._sample()
+            except self._nvml.NVMLError as e:
+                print(f"NVML sampling failed: {e}")
+            time.sleep(self.interval_ms / 1000.0)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            try:
+                self._nvml.nvmlShutdown()
+            except Exception:
+                pass
+
+
+def nvidia_smi_works(binary=NVIDIA_SMI, timeout=10):
+    """Whether nvidia-smi is installed and lists at least one GPU
+
+    nvidia-smi is often on PATH on hosts without a GPU or driver, where
+    every query exits with an error.
+    """
+    if not shutil.which(binary):
+        return False
+    try:
+        result = subprocess.run(
+            [binary, '--query-gpu=index', '--format=csv,noheader'],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=timeout
+        )
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return result.returncode == 0 and bool(result.stdout.strip())
+
+
+def create_gpu_backend(prefer=None, interval_ms=SAMPLE_INTERVAL_MS):
+    """Start the best available GPU backend, or return None without a GPU
+
+    `prefer` may be 'nvml' or 'nvidia-smi'; by default NVML is used when
+    pynvml is importable and nvidia-smi streaming otherwise.
+    """
+    prefer = prefer or os.environ.get('GPU_BACKEND')
+    if prefer in (None, 'nvml'):
+        try:
+            backend = NvmlBackend(interval_ms)
+            backend.start()
+            return backend
+        except Exception:
+            if prefer == 'nvml':
+                print("NVML not available, falling back to nvidia-smi")
+    if nvidia_smi_works(NVIDIA_SMI):
+        backend = NvidiaSmiBackend(NVIDIA_SMI, interval_ms)
+        backend.start()
+        return backend
+    return None
@@ -0,0 +1,279 @@
+
+import math
+import threading
+import time
+from array import array
+
+# (step in seconds, number of slots) per resolution tier
+# Host metrics: 1s for 10 min, 10s for 24h, 1m for 30 days
+HOST_TIERS = ((1, 600), (10, 8640), (60, 43200))
+# Per-container metrics are kept shorter: 1s for 10 min, 10s for 1h, 1m for 24h
+CONTAINER_TIERS = ((1, 600), (10, 360), (60, 1440))
+
+
+class RingBuffer:
+    """Fixed-capacity circular buffer of (timestamp, avg, min, max) rows
+
+    Rows live in parallel typed arrays (4 bytes per column) that grow up to
+    `size` and then wrap, so memory is proportional to what is stored and
+    appends are O(1).
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.ts = array('I')
+        self.avg = array('f')
+        self.min = array('f')
+        self.max = array('f')
+        self.head = 0  # next slot to write once the buffer is full
+
+    def __len__(self):
+        return len(self.ts)
+
+    def append(self, ts, avg, low, high):
+        if len(self.ts) < self.size:
+            self.ts.append(int(ts))
+            self.avg.append(avg)
+            self.min.append(low)
+            self.max.append(high)
+            return
+        i = self.head
+        self.ts[i] = int(ts)
+        self.avg[i] = avg
+        self.min[i] = low
+        self.max[i] = high
+        self.head = (i + 1) % self.size
+
+    def _slot(self, i):
+        """Array slot of the i-th oldest row"""
+        if len(self.ts) < self.size:
+            return i
+        return (self.head + i) % self.size
+
+    def _bisect(self, ts):
+        """Position of the first row with timestamp >= ts"""
+        lo, hi = 0, len(self.ts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ts[self._slot(mid)] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def oldest(self):
+        return self.ts[self._slot(0)] if self.ts else None
+
+    def range(self, start, end):
+        """Rows with start <= timestamp <= end, oldest first"""
+        for i in range(self._bisect(start), len(self.ts)):
+            slot = self._slot(i)
+            ts = self.ts[slot]
+            if ts > end:
+                break
+            yield ts, self.avg[slot], self.min[slot], self.max[slot]
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in (self.ts, self.avg, self.min, self.max))
+
+
+class Series:
+    """One metric series stored at several resolutions
+
+    Every sample goes into each tier's open bucket; a bucket is written to
+    its ring buffer as avg/min/max once a sample lands past its end.
+    """
+
+    def __init__(self, tiers):
+        self.tiers = [(step, RingBuffer(slots)) for step, slots in tiers]
+        self._buckets = [None] * len(self.tiers)  # [start, sum, count, min, max]
+
+    def add(self, ts, value):
+        for i, (step, ring) in enumerate(self.tiers):
+            start = int(ts // step * step)
+            bucket = self._buckets[i]
+            if bucket is not None and bucket[0] != start:
+                ring.append(bucket[0], bucket[1] / bucket[2], bucket[3], bucket[4])
+                bucket = None
+            if bucket is None:
+                self._buckets[i] = [start, value, 1, value, value]
+            else:
+                bucket[1] += value
+                bucket[2] += 1
+                bucket[3] = min(bucket[3], value)
+                bucket[4] = max(bucket[4], value)
+
+    def pick_tier(self, start, step=None):
+        """Pick the tier to answer a query from
+
+        With a step, the coarsest tier that is not coarser than the step.
+        Otherwise the finest tier whose retention reaches back to `start`, or
+        the one with the oldest data if none do.
+        """
+        if step is not None:
+            candidates = [tier for tier in self.tiers if tier[0] <= step]
+            return max(candidates, key=lambda t: t[0]) if candidates else self.tiers[0]
+        for tier in self.tiers:
+            oldest = tier[1].oldest()
+            if oldest is not None and oldest <= start:
+                return tier
+        return min(self.tiers, key=lambda t: t[1].oldest() if len(t[1]) else math.inf)
+
+    def nbytes(self):
+        return sum(ring.nbytes() for _, ring in self.tiers)
+
+
+class MetricStore:
+    """Multi-resolution history keyed by (metric, container)
+
+    Host-level series use container=None. Series are created on first write.
+    """
+
+    def __init__(self, host_tiers=HOST_TIERS, container_tiers=CONTAINER_TIERS):
+        self.host_tiers = host_tiers
+        self.container_tiers = container_tiers
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def record(self, metric, value, container=None, ts=None):
+        """Add a sample for a metric"""
+        if value is None:
+            return
+        ts = time.time() if ts is None else ts
+        key = (metric, container)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                tiers = self.host_tiers if container is None else self.container_tiers
+                series = self._series[key] = Series(tiers)
+            series.add(ts, float(value))
+
+    def drop_container(self, container):
+        """Remove every series belonging to a container"""
+        with self._lock:
+            for key in [k for k in self._series if k[1] == container]:
+                del self._series[key]
+
+    def query(self, metric, container=None, start=None, end=None, step=None):
+        """Return points between start and end (epoch seconds)
+
+        Points are re-aggregated when `step` is coarser than the stored tier.
+        """
+        end = time.time() if end is None else end
+        start = end - 600 if start is None else start
+        with self._lock:
+            series = self._series.get((metric, container))
+            if series is None:
+                return None
+            tier_step, ring = series.pick_tier(start, step)
+            rows = list(ring.range(start, end))
+
+        out_step = tier_step
+        if step is not None and step > tier_step:
+            out_step = step
+            rows = rebucket(rows, step)
+        return {
+            'metric': metric,
+            'container': container,
+            'step': out_step,
+            'points': [
+                {'t': ts, 'avg': round(avg, 3), 'min': round(low, 3), 'max': round(high, 3)}
+                for ts, avg, low, high in rows
+            ],
+        }
+
+    def latest(self, metric, container=None, count=60):
+        """Last `count` finest-resolution points as (timestamp, value) pairs"""
+        with self._lock:
+            series = self._series.get((metric, container))
+            if series is None:
+                return []
+            _, ring = series.tiers[0]
+            n = len(ring)
+            return [
+                (ring.ts[ring._slot(i)], ring.avg[ring._slot(i)])
+                for i in range(max(0, n - count), n)
+            ]
+
+    def series(self):
+        """List stored series"""
+        with self._lock:
+            keys = list(self._series)
+        return [{'metric': metric, 'container': container} for metric, container in keys]
+
+    def nbytes(self):
+        with self._lock:
+            return sum(series.nbytes() for series in self._series.values())
+
+
+class HistoryRecorder:
+    """Write each monitoring sample to the in-memory history and the on-disk store
+
+    Used by the server's monitoring loop and by bench_monitoring.py, so the
+    benchmark measures exactly the writes the server makes. Containers are
+    recorded while running; one that disappears from its topic's listing
+    has been deleted, and its in-memory series are dropped (the on-disk
+    store keeps them until retention removes them).
+    """
+
+    def __init__(self, history, store):
+        self.history = history
+        self.store = store
+        self._listed = {}  # topic -> container ids in its previous listing
+
+    def record_host(self, stats, now=None):
+        """Record host cpu, memory and gpu"""
+        now = time.time() if now is None else now
+        values = {
+            'cpu': stats['cpu'],
+            'memory': stats['memory']['percent'],
+            'gpu': stats.get('gpu', 0),
+        }
+        for metric, value in values.items():
+            self.history.record(metric, value, ts=now)
+        self.store.append('host', now, values)
+
+    def record_containers(self, containers, topic, now=None):
+        """Record per-container cpu and memory from one topic's listing"""
+        now = time.time() if now is None else now
+        listed = set()
+        for container in containers:
+            listed.add(container['id'])
+            if container.get('status') != 'running':
+                continue
+            self.history.record('cpu', container.get('cpu'), container=container['id'], ts=now)
+            self.history.record('memory', container.get('memory'), container=container['id'], ts=now)
+            self.store.append(f"container/{container['id']}", now, {
+                'cpu': container.get('cpu') or 0,
+                'memory': container.get('memory') or 0
+            })
+        for container_id in self._listed.get(topic, set()) - listed:
+            self.history.drop_container(container_id)
+        self._listed[topic] = listed
+
+
+def rebucket(rows, step):
+    """Aggregate (timestamp, avg, min, max) rows into buckets of `step` seconds"""
+    buckets = []
+    for ts, avg, low, high in rows:
+        start = ts // step * step
+        if buckets and buckets[-1][0] == start:
+            bucket = buckets[-1]
+            bucket[1] += avg
+            bucket[2] += 1
+            bucket[3] = min(bucket[3], low)
+            bucket[4] = max(bucket[4], high)
+        else:
+            buckets.append([start, avg, 1, low, high])
+    return [(b[0], b[1] / b[2], b[3], b[4]) for b in buckets]
+
+
+def parse_time(value, default=None):
+    """Parse an epoch-seconds query parameter, allowing negative offsets from now"""
+    if value in (None, ''):
+        return default
+    value = float(value)
+    if value <= 0:
+        return time.time() + value
+    return value
+
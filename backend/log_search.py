@@ -0,0 +1,395 @@
+
+import json
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+
+# Keywords per level, highest priority first
+DEFAULT_LEVEL_RULES = {
+    'ERROR': ['ERROR', 'FATAL', 'EXCEPTION'],
+    'WARN': ['WARN'],
+    'DEBUG': ['DEBUG'],
+}
+DEFAULT_LEVEL = 'INFO'
+LEVELS = ('DEBUG', 'INFO', 'WARN', 'ERROR')
+
+SEGMENT_LINES = 65536  # lines per segment before it is sealed
+MAX_SEGMENTS = 64      # sealed segments kept; the oldest are dropped first
+
+TOKEN = re.compile(r'[a-z0-9_]{2,}')
+SEGMENT_MAGIC = b'LOGSEG1\n'
+
+
+class LogClassifier:
+    """Classify log levels with one compiled pattern
+
+    The pattern is an alternation of named groups, one per level, so a line
+    is scanned once. When a line matches several levels the one listed
+    first in the rules wins, regardless of where it appears in the line.
+    """
+
+    def __init__(self, rules=None):
+        rules = rules or DEFAULT_LEVEL_RULES
+        self.levels = list(rules)
+        alternatives = [
+            f"(?P<{level}>{'|'.join(re.escape(k) for k in keywords)})"
+            for level, keywords in rules.items() if keywords
+        ]
+        self.pattern = re.compile('|'.join(alternatives)) if alternatives else None
+
+    def classify(self, message):
+        if self.pattern is None:
+            return DEFAULT_LEVEL
+        best = None
+        for match in self.pattern.finditer(message):
+            rank = self.levels.index(match.lastgroup)
+            if rank == 0:
+                return match.lastgroup
+            if best is None or rank < best:
+                best = rank
+        return self.levels[best] if best is not None else DEFAULT_LEVEL
+
+
+class ClassifierRegistry:
+    """Pick a classifier by image name
+
+    Rules are a JSON object mapping an image name prefix to level rules,
+    e.g. {"nginx": {"ERROR": ["[error]", "[crit]"], "WARN": ["[warn]"]}}.
+    The longest matching prefix wins; other images use the default rules.
+    """
+
+    def __init__(self, image_rules=None):
+        self.default = LogClassifier()
+        self._by_prefix = sorted(
+            ((prefix, LogClassifier(rules)) for prefix, rules in (image_rules or {}).items()),
+            key=lambda item: len(item[0]), reverse=True
+        )
+
+    @classmethod
+    def from_file(cls, path):
+        if not path or not os.path.exists(path):
+            return cls()
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def for_image(self, image):
+        if image:
+            for prefix, classifier in self._by_prefix:
+                if image.startswith(prefix):
+                    return classifier
+        return self.default
+
+
+classifiers = ClassifierRegistry.from_file(os.environ.get('LOG_LEVEL_RULES'))
+
+
+def classify(message, image=None):
+    """Log level of a message, using per-image rules when configured"""
+    return classifiers.for_image(image).classify(message)
+
+
+def tokenize(text):
+    return set(TOKEN.findall(text.lower()))
+
+
+class LogSegment:
+    """Column-oriented block of log lines with an inverted token index
+
+    Columns are typed arrays (timestamp, level, container) plus one UTF-8
+    blob holding every message back to back with an offsets array. The
+    token index maps each token to the sorted ids of lines containing it.
+    """
+
+    def __init__(self):
+        self.timestamps = array('d')
+        self.levels = array('B')
+        self.containers = array('H')  # index into container_ids
+        self.offsets = array('I', [0])
+        self.blob = bytearray()
+        self.container_ids = []
+        self.container_names = []
+        self._container_slots = {}
+        self.postings = {}  # token -> array('I') of line ids
+        self.tmin = float('inf')
+        self.tmax = float('-inf')
+        self.sealed = False
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def add(self, ts, level, container_id, container_name, message):
+        slot = self._container_slots.get(container_id)
+        if slot is None:
+            slot = self._container_slots[container_id] = len(self.container_ids)
+            self.container_ids.append(container_id)
+            self.container_names.append(container_name)
+        line_id = len(self.timestamps)
+        self.timestamps.append(ts)
+        self.levels.append(LEVELS.index(level) if level in LEVELS else 1)
+        self.containers.append(slot)
+        self.blob += message.encode('utf-8', 'replace')
+        self.offsets.append(len(self.blob))
+        for token in tokenize(message):
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = array('I')
+            posting.append(line_id)
+        self.tmin = min(self.tmin, ts)
+        self.tmax = max(self.tmax, ts)
+
+    def message(self, line_id):
+        return self.blob[self.offsets[line_id]:self.offsets[line_id + 1]].decode('utf-8', 'replace')
+
+    def line(self, line_id):
+        slot = self.containers[line_id]
+        return {
+            'epoch': self.timestamps[line_id],
+            'type': LEVELS[self.levels[line_id]],
+            'container': self.container_ids[slot],
+            'name': self.container_names[slot],
+            'message': self.message(line_id),
+        }
+
+    def candidates(self, tokens):
+        """Line ids containing every token, newest first (None means all lines)"""
+        if not tokens:
+            return None
+        postings = []
+        for token in tokens:
+            posting = self.postings.get(token)
+            if posting is None:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        if len(postings) == 1:
+            return reversed(postings[0])
+        ids = set(postings[0])
+        for posting in postings[1:]:
+            ids.intersection_update(posting)
+            if not ids:
+                return []
+        return sorted(ids, reverse=True)
+
+    def save(self, path):
+        """Write a sealed segment to disk"""
+        tokens = sorted(self.postings)
+        token_blob = '\n'.join(tokens).encode('utf-8')
+        posting_lengths = array('I', (len(self.postings[t]) for t in tokens))
+        header = json.dumps({
+            'lines': len(self),
+            'containers': self.container_ids,
+            'names': self.container_names,
+            'tokens': len(tokens),
+            'blob': len(self.blob),
+            'token_blob': len(token_blob),
+            'tmin': self.tmin,
+            'tmax': self.tmax,
+        }).encode('utf-8')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(SEGMENT_MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            for column in (self.timestamps, self.levels, self.containers, self.offsets, posting_lengths):
+                f.write(column.tobytes())
+            for token in tokens:
+                f.write(self.postings[token].tobytes())
+            f.write(self.blob)
+            f.write(token_blob)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(SEGMENT_MAGIC):
+            raise ValueError(f"{path} is not a log segment")
+        position = len(SEGMENT_MAGIC)
+        (header_size,) = struct.unpack_from('<I', data, position)
+        position += 4
+        header = json.loads(data[position:position + header_size])
+        position += header_size
+
+        def take(typecode, count):
+            nonlocal position
+            column = array(typecode)
+            size = column.itemsize * count
+            column.frombytes(data[position:position + size])
+            position += size
+            return column
+
+        segment = cls()
+        lines = header['lines']
+        segment.timestamps = take('d', lines)
+        segment.levels = take('B', lines)
+        segment.containers = take('H', lines)
+        segment.offsets = take('I', lines + 1)
+        posting_lengths = take('I', header['tokens'])
+        postings = [take('I', n) for n in posting_lengths]
+        segment.blob = bytearray(data[position:position + header['blob']])
+        position += header['blob']
+        tokens = data[position:position + header['token_blob']].decode('utf-8').split('\n') if header['tokens'] else []
+        segment.postings = dict(zip(tokens, postings))
+        segment.container_ids = header['containers']
+        segment.container_names = header['names']
+        segment._container_slots = {cid: i for i, cid in enumerate(segment.container_ids)}
+        segment.tmin, segment.tmax = header['tmin'], header['tmax']
+        segment.sealed = True
+        return segment
+
+
+class LogIndex:
+    """Searchable store of log lines from every container
+
+    Lines are appended to an open segment that is sealed (and written to
+    `root`, when given) every `segment_lines` lines. Only the newest
+    `max_segments` sealed segments are kept.
+    """
+
+    def __init__(self, root=None, segment_lines=SEGMENT_LINES, max_segments=MAX_SEGMENTS):
+        self.root = root
+        self.segment_lines = segment_lines
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # orders segment writes and removals on disk
+        self._sealed = []  # [(sequence number, LogSegment)] oldest first
+        self._next_seq = 0
+        self._open = LogSegment()
+        self.lines_ingested = 0
+        if root:
+            os.makedirs(root, exist_ok=True)
+            self._load()
+
+    def _segment_path(self, seq):
+        return os.path.join(self.root, f"logseg-{seq:08d}.bin")
+
+    def _load(self):
+        for filename in sorted(os.listdir(self.root)):
+            if not (filename.startswith('logseg-') and filename.endswith('.bin')):
+                continue
+            seq = int(filename[len('logseg-'):-len('.bin')])
+            try:
+                self._sealed.append((seq, LogSegment.load(os.path.join(self.root, filename))))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Skipping unreadable log segment {filename}: {e}")
+            self._next_seq = max(self._next_seq, seq + 1)
+
+    def ingest(self, container_id, container_name, message, ts=None, level=None, image=None):
+        """Add one line; the level is classified here when not given"""
+        ts = time.time() if ts is None else ts
+        if level is None:
+            level = classify(message, image)
+        sealed = None
+        with self._lock:
+            self._open.add(ts, level, container_id, container_name, message)
+            self.lines_ingested += 1
+            if len(self._open) >= self.segment_lines:
+                sealed = self._seal()
+        if sealed:
+            self._persist(*sealed)
+
+    def _seal(self):
+        """Swap in a new open segment; returns what _persist must write and remove"""
+        segment, self._open = self._open, LogSegment()
+        segment.sealed = True
+        seq = self._next_seq
+        self._next_seq += 1
+        self._sealed.append((seq, segment))
+        dropped = []
+        while len(self._sealed) > self.max_segments:
+            dropped.append(self._sealed.pop(0)[0])
+        return seq, segment, dropped
+
+    def _persist(self, seq, segment, dropped):
+        """Write a sealed segment and delete dropped ones, outside the index lock"""
+        if not self.root:
+            return
+        with self._save_lock:
+            with self._lock:
+                kept = any(s is segment for _, s in self._sealed)
+            # A segment dropped before it was written is never written
+            if kept:
+                segment.save(self._segment_path(seq))
+            for old_seq in dropped:
+                if os.path.exists(self._segment_path(old_seq)):
+                    os.remove(self._segment_path(old_seq))
+
+    def search(self, q=None, level=None, container=None, start=None, end=None, limit=100):
+        """Newest lines matching every token of `q` and the given filters
+
+        `level` is one level or a comma-separated list (e.g. "WARN,ERROR");
+        `container` matches a container ID, ID prefix or name. A `q` with no
+        indexable token (e.g. "!" or "x") is matched as a case-insensitive
+        substring by scanning messages instead.
+        """
+        started = time.perf_counter()
+        tokens = tokenize(q) if q else set()
+        needle = q.lower() if q and not tokens else None
+        levels = None
+        if level:
+            levels = {LEVELS.index(name) for name in level.upper().split(',') if name in LEVELS}
+        start = float('-inf') if start is None else start
+        end = float('inf') if end is None else end
+
+        results = []
+        scanned = 0
+        with self._lock:
+            segments = [segment for _, segment in self._sealed] + [self._open]
+            for segment in reversed(segments):
+                if len(results) >= limit:
+                    break
+                if not len(segment) or segment.tmax < start or segment.tmin > end:
+                    continue
+                slots = None
+                if container:
+                    slots = {i for i, (cid, name) in enumerate(zip(segment.container_ids, segment.container_names))
+                             if cid == container or cid.startswith(container) or name == container}
+                    if not slots:
+                        continue
+                scanned += 1
+                ids = segment.candidates(tokens)
+                if ids is None:
+                    ids = range(len(segment) - 1, -1, -1)
+                for line_id in ids:
+                    ts = segment.timestamps[line_id]
+                    if ts < start or ts > end:
+                        continue
+                    if levels is not None and segment.levels[line_id] not in levels:
+                        continue
+                    if slots is not None and segment.containers[line_id] not in slots:
+                        continue
+                    if needle is not None and needle not in segment.message(line_id).lower():
+                        continue
+                    results.append(segment.line(line_id))
+                    if len(results) >= limit:
+                        break
+
+        return {
+            'results': results,
+            'count': len(results),
+            'segmentsScanned': scanned,
+            'tookMs': round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    def flush(self):
+        """Seal the open segment so it is persisted"""
+        sealed = None
+        with self._lock:
+            if len(self._open):
+                sealed = self._seal()
+        if sealed:
+            self._persist(*sealed)
+
+    def stats(self):
+        with self._lock:
+            segments = [segment for _, segment in self._sealed] + [self._open]
+            return {
+                'segments': len(segments),
+                'lines': sum(len(s) for s in segments),
+                'linesIngested': self.lines_ingested,
+                'tokens': sum(len(s.postings) for s in segments),
+                'bytes': sum(len(s.blob) for s in segments),
+            }
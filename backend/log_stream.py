@@ -0,0 +1,190 @@
+
+import threading
+import time
+from collections import deque
+
+# Lines kept per container between flushes before the oldest are dropped
+MAX_PENDING_LINES = 5000
+# Lines per emitted frame
+MAX_FRAME_LINES = 500
+# Viewer id for server-side consumers (the search index); lines are handed
+# to the hub's listener but not buffered for emitting
+INDEXER = '__indexer__'
+
+
+class LogFollower:
+    """Follow one container's log stream in a background thread
+
+    Raw chunks are split into lines (carrying partial lines over to the next
+    chunk) and handed to `on_lines`. stop() closes the stream so a blocked
+    read returns immediately.
+    """
+
+    def __init__(self, container_id, open_stream, on_lines, on_end):
+        self.container_id = container_id
+        self._open_stream = open_stream
+        self._on_lines = on_lines
+        self._on_end = on_end
+        self._stream = None
+        self._stopped = threading.Event()
+        self.name = container_id
+        self.image = None
+
+    def start(self):
+        threading.Thread(target=self._run, name=f"logs-{self.container_id[:12]}", daemon=True).start()
+
+    def _run(self):
+        partial = b''
+        try:
+            opened = self._open_stream(self.container_id)
+            self._stream, self.name = opened[:2]
+            self.image = opened[2] if len(opened) > 2 else None
+            for chunk in self._stream:
+                if self._stopped.is_set():
+                    break
+                partial += chunk
+                *lines, partial = partial.split(b'\n')
+                if lines:
+                    self._on_lines(self, [line.decode('utf-8', 'replace') for line in lines if line])
+        except Exception as e:
+            if not self._stopped.is_set():
+                print(f"Log stream for {self.container_id} ended: {e}")
+        finally:
+            if partial and not self._stopped.is_set():
+                self._on_lines(self, [partial.decode('utf-8', 'replace')])
+            self._on_end(self)
+
+    def stop(self):
+        self._stopped.set()
+        stream = self._stream
+        if stream is not None and hasattr(stream, 'close'):
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+class LogStreamHub:
+    """Share one follow-mode log stream per container among all its viewers
+
+    Followers push lines into per-container buffers; drain() collects them
+    into batched frames which the server emits to each container's room.
+    A follower is started with the first viewer and stopped with the last.
+    `listener(container_id, name, raw_lines, formatted_lines)` sees every
+    line, including those of streams only the INDEXER is watching.
+    """
+
+    def __init__(self, open_stream, format_line, max_pending=MAX_PENDING_LINES, max_frame=MAX_FRAME_LINES,
+                 listener=None):
+        self._open_stream = open_stream
+        self._format_line = format_line
+        self._listener = listener
+        self.max_pending = max_pending
+        self.max_frame = max_frame
+        self._lock = threading.Lock()
+        self._viewers = {}    # container id -> set of sids
+        self._followers = {}  # container id -> LogFollower
+        self._pending = {}    # container id -> deque of formatted lines
+        self._dropped = {}    # container id -> lines dropped since the last frame
+        self._ended = set()   # containers whose stream ended since the last drain
+        self.lines_received = 0
+
+    def watch(self, sid, container_id):
+        """Add a viewer, starting the container's stream if needed"""
+        with self._lock:
+            viewers = self._viewers.setdefault(container_id, set())
+            viewers.add(sid)
+            if container_id in self._followers:
+                return False
+            follower = LogFollower(container_id, self._open_stream, self._on_lines, self._on_end)
+            self._followers[container_id] = follower
+        follower.start()
+        return True
+
+    def unwatch(self, sid, container_id):
+        """Remove a viewer, stopping the stream once nobody is watching"""
+        with self._lock:
+            viewers = self._viewers.get(container_id)
+            if not viewers:
+                return
+            viewers.discard(sid)
+            if viewers:
+                return
+            del self._viewers[container_id]
+            follower = self._followers.pop(container_id, None)
+            self._pending.pop(container_id, None)
+            self._dropped.pop(container_id, None)
+        if follower:
+            follower.stop()
+
+    def watching(self, sid):
+        """Containers a viewer is watching"""
+        with self._lock:
+            return {cid for cid, viewers in self._viewers.items() if sid in viewers}
+
+    def drop(self, sid):
+        """Remove a disconnected client from every stream it watched"""
+        watched = self.watching(sid)
+        for container_id in watched:
+            self.unwatch(sid, container_id)
+        return watched
+
+    def _on_lines(self, follower, lines):
+        formatted = [self._format_line(follower.name, line, follower.image) for line in lines]
+        with self._lock:
+            if self._followers.get(follower.container_id) is not follower:
+                return
+            self.lines_received += len(lines)
+            buffered = self._viewers.get(follower.container_id, set()) - {INDEXER}
+        if self._listener is not None:
+            self._listener(follower.container_id, follower.name, lines, formatted)
+        if not buffered:
+            return
+        with self._lock:
+            pending = self._pending.setdefault(follower.container_id, deque())
+            pending.extend(formatted)
+            overflow = len(pending) - self.max_pending
+            if overflow > 0:
+                # Slow consumers lose the oldest lines rather than growing memory
+                for _ in range(overflow):
+                    pending.popleft()
+                self._dropped[follower.container_id] = self._dropped.get(follower.container_id, 0) + overflow
+
+    def _on_end(self, follower):
+        with self._lock:
+            if self._followers.get(follower.container_id) is follower:
+                # Container stopped; a later watch() starts a fresh stream
+                del self._followers[follower.container_id]
+                self._ended.add(follower.container_id)
+
+    def drain(self):
+        """Collect pending lines as frames: [{container, lines, cursor, dropped, ended}]"""
+        frames = []
+        with self._lock:
+            for container_id, pending in self._pending.items():
+                while pending:
+                    count = min(len(pending), self.max_frame)
+                    lines = [pending.popleft() for _ in range(count)]
+                    epochs = [line['epoch'] for line in lines if line.get('epoch') is not None]
+                    frames.append({
+                        'container': container_id,
+                        'lines': lines,
+                        'cursor': epochs[-1] + 1e-6 if epochs else None,
+                        'dropped': self._dropped.pop(container_id, 0),
+                        'ended': False,
+                    })
+            for container_id in self._ended:
+                if self._viewers.get(container_id, set()) - {INDEXER}:
+                    frames.append({'container': container_id, 'lines': [], 'cursor': None,
+                                   'dropped': 0, 'ended': True})
+            self._ended.clear()
+        return frames
+
+    def stats(self):
+        with self._lock:
+            return {
+                'streams': len(self._followers),
+                'viewers': sum(len(v) for v in self._viewers.values()),
+                'linesReceived': self.lines_received,
+                'at': time.time(),
+            }
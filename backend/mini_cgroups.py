@@ -0,0 +1,115 @@
+
+import os
+
+from container_utils import CGROUP_ROOT
+
+CGROUP_PARENT = 'mini_docker'  # every container's cgroup is created under this one
+CPU_PERIOD_US = 100000
+
+
+def _write(path, value):
+    with open(path, 'w') as f:
+        f.write(str(value))
+
+
+def cgroup_version(root=CGROUP_ROOT):
+    """2 for a unified hierarchy, 1 for per-controller mounts, None if there is neither"""
+    if os.path.exists(os.path.join(root, 'cgroup.controllers')):
+        return 2
+    if os.path.isdir(os.path.join(root, 'cpu')) or os.path.isdir(os.path.join(root, 'memory')):
+        return 1
+    return None
+
+
+def _limits(cpu_limit, memory_limit):
+    """{controller: [(file, value)]} for the v1 and v2 hierarchies"""
+    v1, v2 = {}, {}
+    if cpu_limit:
+        quota = max(1000, int(float(cpu_limit) * CPU_PERIOD_US))
+        v1['cpu'] = [('cpu.cfs_period_us', CPU_PERIOD_US), ('cpu.cfs_quota_us', quota)]
+        v2['cpu'] = [('cpu.max', f"{quota} {CPU_PERIOD_US}")]
+    if memory_limit:
+        limit = int(float(memory_limit) * 1024 * 1024)
+        v1['memory'] = [('memory.limit_in_bytes', limit)]
+        v2['memory'] = [('memory.max', limit)]
+    return v1, v2
+
+
+def cgroup_dirs(container_id, root=CGROUP_ROOT):
+    """Every directory a container's cgroup can have, whichever hierarchy is mounted"""
+    dirs = [os.path.join(root, CGROUP_PARENT, container_id)]
+    dirs += [os.path.join(root, controller, CGROUP_PARENT, container_id) for controller in ('cpu', 'memory')]
+    return dirs
+
+
+def create_cgroup(container_id, cpu_limit=None, memory_limit=None, root=CGROUP_ROOT):
+    """Create a container's cgroup with its CPU (cores) and memory (MB) limits
+
+    Returns the directories the container's workload must join (one per
+    v1 controller, or one on v2). Limits are best effort: with no limit
+    set, no cgroup hierarchy or one this process cannot write to, nothing
+    is created and [] is returned, so the container runs unlimited.
+    """
+    try:
+        v1, v2 = _limits(cpu_limit, memory_limit)
+    except (TypeError, ValueError):
+        print(f"Ignoring invalid limits for Mini Docker container {container_id}: "
+              f"cpu={cpu_limit!r} memory={memory_limit!r}")
+        return []
+    if not v1:
+        return []
+    version = cgroup_version(root)
+    if version is None:
+        print(f"No cgroup hierarchy at {root}: Mini Docker container {container_id} runs without limits")
+        return []
+    try:
+        if version == 2:
+            return [_create_v2(container_id, v2, root)]
+        return [_create_v1(container_id, controller, files, root) for controller, files in v1.items()]
+    except OSError as e:
+        print(f"Could not apply limits to Mini Docker container {container_id}: {e}")
+        remove_cgroup(container_id, root)
+        return []
+
+
+def _create_v2(container_id, limits, root):
+    # Controllers are only available in a cgroup once every ancestor
+    # delegates them through cgroup.subtree_control
+    with open(os.path.join(root, 'cgroup.controllers'), 'r') as f:
+        available = f.read().split()
+    missing = [controller for controller in limits if controller not in available]
+    if missing:
+        raise OSError(f"cgroup controllers not available: {', '.join(missing)}")
+    enable = ' '.join(f"+{controller}" for controller in limits)
+    parent = os.path.join(root, CGROUP_PARENT)
+    os.makedirs(parent, exist_ok=True)
+    _write(os.path.join(root, 'cgroup.subtree_control'), enable)
+    _write(os.path.join(parent, 'cgroup.subtree_control'), enable)
+    path = os.path.join(parent, container_id)
+    os.makedirs(path, exist_ok=True)
+    for files in limits.values():
+        for name, value in files:
+            _write(os.path.join(path, name), value)
+    return path
+
+
+def _create_v1(container_id, controller, files, root):
+    if not os.path.isdir(os.path.join(root, controller)):
+        raise OSError(f"cgroup controller {controller} is not mounted under {root}")
+    path = os.path.join(root, controller, CGROUP_PARENT, container_id)
+    os.makedirs(path, exist_ok=True)
+    for name, value in files:
+        _write(os.path.join(path, name), value)
+    return path
+
+
+def remove_cgroup(container_id, root=CGROUP_ROOT):
+    """Remove a container's cgroup directories; they must have no processes left"""
+    for path in cgroup_dirs(container_id, root):
+        if not os.path.isdir(path):
+            continue
+        try:
+            # cgroupfs directories are removed with rmdir even though they list files
+            os.rmdir(path)
+        except OSError as e:
+            print(f"Error removing cgroup {path}: {e}")
@@ -8,6 +8,7 @@
 #include <fcntl.h>
 #include <sched.h>
 #include <sys/mount.h>
+#include <sys/prctl.h>
 #include <sys/stat.h>
 #include <sys/types.h>
 #include <sys/wait.h>
@@ -16,6 +17,9 @@
 
 #define STACK_SIZE (1024 * 1024) /* Stack size for cloned child */
 #define MAX_PATH 4096
+#define MAX_REQUEST (64 * 1024) /* Largest start request a warm sandbox accepts */
+#define MAX_ARGS 256
+#define MAX_CGROUPS 8 /* One directory per v1 controller, or one on v2 */
 
 // Container configuration
 typedef struct {
@@ -24,12 +28,13 @@ typedef struct {
     char command[MAX_PATH];
     char **command_args;
     int command_argc;
-    char *cgroup_path;
-    int cpu_shares;
-    int memory_limit_mb;
+    char *cgroups[MAX_CGROUPS]; /* Cgroup directories the container joins */
+    int cgroup_count;
 } container_config;
 
 static char child_stack[STACK_SIZE]; /* Stack for child */
+static pid_t container_pid = 0; /* Signals sent to the runtime are forwarded here */
+static int host_mnt_fd = -1; /* Runtime's mount namespace, for warm sandboxes */
 
 // Setup the hostname for the container
 int setup_hostname(const char *hostname) {
@@ -80,73 +85,56 @@ int setup_mounts() {
     return 0;
 }
 
-// Setup cgroups for resource limiting
+// Move the calling process into the container's cgroups. The manager
+// creates them and sets their limits; the runtime only joins, so one
+// code path serves v1 (a directory per controller) and v2 hierarchies.
 int setup_cgroups(container_config *config) {
-    if (!config->cgroup_path) {
-        return 0; // No cgroup configuration
-    }
-    
-    char cpu_path[MAX_PATH];
-    char mem_path[MAX_PATH];
-    char pid_str[32];
+    char procs_path[MAX_PATH];
     FILE *fp;
     
-    // Get current PID
-    pid_t pid = getpid();
-    sprintf(pid_str, "%d", pid);
-    
-    // Setup CPU limits
-    if (config->cpu_shares > 0) {
-        snprintf(cpu_path, MAX_PATH, "%s/cpu/tasks", config->cgroup_path);
-        fp = fopen(cpu_path, "w");
+    for (int i = 0; i < config->cgroup_count; i++) {
+        snprintf(procs_path, MAX_PATH, "%s/cgroup.procs", config->cgroups[i]);
+        fp = fopen(procs_path, "w");
         if (!fp) {
-            perror("Failed to open CPU cgroup tasks");
+            perror(procs_path);
             return -1;
         }
-        fprintf(fp, "%s", pid_str);
-        fclose(fp);
-        
-        snprintf(cpu_path, MAX_PATH, "%s/cpu/cpu.shares", config->cgroup_path);
-        fp = fopen(cpu_path, "w");
-        if (!fp) {
-            perror("Failed to open CPU shares");
+        // "0" is the writing process, whatever its PID namespace
+        int written = fprintf(fp, "0");
+        if (fclose(fp) != 0 || written < 0) {
+            perror(procs_path);
             return -1;
         }
-        fprintf(fp, "%d", config->cpu_shares);
-        fclose(fp);
     }
     
-    // Setup Memory limits
-    if (config->memory_limit_mb > 0) {
-        snprintf(mem_path, MAX_PATH, "%s/memory/tasks", config->cgroup_path);
-        fp = fopen(mem_path, "w");
-        if (!fp) {
-            perror("Failed to open memory cgroup tasks");
+    return 0;
+}
+
+// Split a ':'-separated list of cgroup directories in place
+int parse_cgroups(char *list, container_config *config) {
+    char *item = list;
+    while (*item) {
+        if (config->cgroup_count == MAX_CGROUPS) {
+            fprintf(stderr, "Too many cgroups\n");
             return -1;
         }
-        fprintf(fp, "%s", pid_str);
-        fclose(fp);
-        
-        snprintf(mem_path, MAX_PATH, "%s/memory/memory.limit_in_bytes", config->cgroup_path);
-        fp = fopen(mem_path, "w");
-        if (!fp) {
-            perror("Failed to open memory limit");
-            return -1;
+        config->cgroups[config->cgroup_count++] = item;
+        char *end = strchr(item, ':');
+        if (!end) {
+            break;
         }
-        fprintf(fp, "%llu", (unsigned long long)config->memory_limit_mb * 1024 * 1024);
-        fclose(fp);
+        *end = '\0';
+        item = end + 1;
     }
-    
     return 0;
 }
 
-// Child function that runs inside the container
-int container_main(void *arg) {
-    container_config *config = (container_config *)arg;
-    
-    // Setup hostname
-    if (setup_hostname(config->hostname) != 0) {
-        fprintf(stderr, "Failed to setup hostname\n");
+// Set up the container's filesystem and limits, then exec the command
+int start_workload(container_config *config) {
+    // Setup cgroups for resource limiting (before chroot: the cgroup
+    // filesystem is not visible from inside the container's root)
+    if (setup_cgroups(config) != 0) {
+        fprintf(stderr, "Failed to setup cgroups\n");
         return 1;
     }
     
@@ -162,12 +150,6 @@ int container_main(void *arg) {
         return 1;
     }
     
-    // Setup cgroups for resource limiting
-    if (setup_cgroups(config) != 0) {
-        fprintf(stderr, "Failed to setup cgroups\n");
-        return 1;
-    }
-    
     // Execute the command
     execvp(config->command, config->command_args);
     
@@ -176,14 +158,134 @@ int container_main(void *arg) {
     return 1;
 }
 
-// Create and run a container
-int run_container(container_config *config) {
+// Child function that runs inside the container
+int container_main(void *arg) {
+    container_config *config = (container_config *)arg;
+    
+    // Don't outlive the runtime process (e.g. when it is SIGKILLed)
+    prctl(PR_SET_PDEATHSIG, SIGKILL);
+    
+    // Setup hostname
+    if (setup_hostname(config->hostname) != 0) {
+        fprintf(stderr, "Failed to setup hostname\n");
+        return 1;
+    }
+    
+    return start_workload(config);
+}
+
+// Read a start request "<cgroups>\0<rootfs>\0<command>\0<arg>\0...\0" from fd,
+// up to EOF; <cgroups> is a ':'-separated list of directories, possibly empty
+int read_request(int fd, container_config *config) {
+    static char buffer[MAX_REQUEST];
+    static char *args[MAX_ARGS + 3];
+    size_t length = 0;
+    ssize_t n;
+    
+    while ((n = read(fd, buffer + length, sizeof(buffer) - length)) != 0) {
+        if (n == -1) {
+            if (errno == EINTR) {
+                continue;
+            }
+            perror("read request");
+            return -1;
+        }
+        length += n;
+        if (length == sizeof(buffer)) {
+            fprintf(stderr, "Start request too large\n");
+            return -1;
+        }
+    }
+    
+    // Closed without a request: the pool is discarding this sandbox
+    if (length == 0) {
+        return -1;
+    }
+    if (buffer[length - 1] != '\0') {
+        fprintf(stderr, "Malformed start request\n");
+        return -1;
+    }
+    
+    int count = 0;
+    char *item = buffer;
+    while (item < buffer + length && count < MAX_ARGS + 2) {
+        args[count++] = item;
+        item += strlen(item) + 1;
+    }
+    if (count < 3) {
+        fprintf(stderr, "Start request needs cgroups, a rootfs and a command\n");
+        return -1;
+    }
+    args[count] = NULL;
+    
+    if (parse_cgroups(args[0], config) != 0) {
+        return -1;
+    }
+    strncpy(config->rootfs, args[1], sizeof(config->rootfs) - 1);
+    strncpy(config->command, args[2], sizeof(config->command) - 1);
+    config->command_args = &args[2];
+    config->command_argc = count - 2;
+    return 0;
+}
+
+// Child function of a warm sandbox: namespaces exist, the container is
+// chosen later by writing a start request to stdin
+int warm_main(void *arg) {
+    container_config *config = (container_config *)arg;
+    
+    prctl(PR_SET_PDEATHSIG, SIGKILL);
+    
+    if (setup_hostname(config->hostname) != 0) {
+        fprintf(stderr, "Failed to setup hostname\n");
+        return 1;
+    }
+    
+    // Parked until the manager hands this sandbox out
+    if (read_request(STDIN_FILENO, config) != 0) {
+        return 1;
+    }
+    
+    // The mount namespace copied when parking predates the container's
+    // rootfs mount; start again from a copy of the current one
+    if (setns(host_mnt_fd, CLONE_NEWNS) == -1 || unshare(CLONE_NEWNS) == -1) {
+        perror("refresh mount namespace");
+        return 1;
+    }
+    close(host_mnt_fd);
+    
+    // The request pipe is done with; the workload gets /dev/null
+    int null_fd = open("/dev/null", O_RDONLY);
+    if (null_fd != -1) {
+        dup2(null_fd, STDIN_FILENO);
+        close(null_fd);
+    }
+    
     printf("Starting container with hostname: %s, rootfs: %s\n", 
            config->hostname, config->rootfs);
+    fflush(stdout);
+    
+    return start_workload(config);
+}
+
+// Pass termination signals on to the container
+void forward_signal(int sig) {
+    if (container_pid > 0) {
+        kill(container_pid, sig);
+    }
+}
+
+// Clone the container process with namespace isolation and wait for it,
+// exiting with its status (128 + signal number if it was killed)
+int run_container(container_config *config, int (*child_main)(void *), int warm) {
+    if (!warm) {
+        printf("Starting container with hostname: %s, rootfs: %s\n", 
+               config->hostname, config->rootfs);
+        fflush(stdout);
+    }
     
     // Clone a new process with namespace isolation
     int clone_flags = CLONE_NEWPID | CLONE_NEWUTS | CLONE_NEWNS | CLONE_NEWNET;
-    pid_t pid = clone(container_main, 
+    pid_t pid = clone(child_main, 
                     child_stack + STACK_SIZE, 
                     clone_flags | SIGCHLD, 
                     config);
@@ -192,51 +294,87 @@ int run_container(container_config *config) {
         perror("clone");
         return 1;
     }
+    container_pid = pid;
+    
+    struct sigaction action;
+    memset(&action, 0, sizeof(action));
+    action.sa_handler = forward_signal;
+    action.sa_flags = SA_RESTART;
+    sigaction(SIGTERM, &action, NULL);
+    sigaction(SIGINT, &action, NULL);
+    sigaction(SIGHUP, &action, NULL);
     
-    printf("Container started with PID: %d\n", pid);
+    if (warm) {
+        // The manager waits for this line before pooling the sandbox
+        printf("ready %d\n", pid);
+    } else {
+        printf("Container started with PID: %d\n", pid);
+    }
+    fflush(stdout);
     
     // Wait for the container to exit
     int status;
-    if (waitpid(pid, &status, 0) == -1) {
-        perror("waitpid");
-        return 1;
+    while (waitpid(pid, &status, 0) == -1) {
+        if (errno != EINTR) {
+            perror("waitpid");
+            return 1;
+        }
     }
     
     if (WIFEXITED(status)) {
         printf("Container exited with status: %d\n", WEXITSTATUS(status));
-    } else if (WIFSIGNALED(status)) {
+        return WEXITSTATUS(status);
+    }
+    if (WIFSIGNALED(status)) {
         printf("Container terminated by signal: %d\n", WTERMSIG(status));
+        return 128 + WTERMSIG(status);
     }
-    
     return 0;
 }
 
 // This is just a simple example entry point
 // In practice, you'd build this into a library and expose APIs
 int main(int argc, char *argv[]) {
-    if (argc < 3) {
-        fprintf(stderr, "Usage: %s <rootfs_path> <command> [args...]\n", argv[0]);
-        return 1;
+    container_config config;
+    memset(&config, 0, sizeof(config));
+    
+    // Cgroups to join, each created (with its limits) by the caller
+    int first = 1;
+    while (first + 1 < argc && strcmp(argv[first], "--cgroup") == 0) {
+        if (parse_cgroups(argv[first + 1], &config) != 0) {
+            return 1;
+        }
+        first += 2;
     }
     
-    container_config config;
+    int warm = argc == 2 && strcmp(argv[1], "--warm") == 0;
+    if (argc - first < 2 && !warm) {
+        fprintf(stderr, "Usage: %s [--cgroup <dir>[:<dir>...]] <rootfs_path> <command> [args...]\n", argv[0]);
+        fprintf(stderr, "       %s --warm   (read \"<cgroups>\\0<rootfs>\\0<command>\\0<args>...\" from stdin)\n", argv[0]);
+        return 1;
+    }
     
     // Set the hostname
     gethostname(config.hostname, sizeof(config.hostname));
     strncat(config.hostname, "-container", sizeof(config.hostname) - strlen(config.hostname) - 1);
     
+    if (warm) {
+        host_mnt_fd = open("/proc/self/ns/mnt", O_RDONLY | O_CLOEXEC);
+        if (host_mnt_fd == -1) {
+            perror("open mount namespace");
+            return 1;
+        }
+        // Root filesystem and command arrive with the start request
+        return run_container(&config, warm_main, 1);
+    }
+    
     // Set the root filesystem
-    strncpy(config.rootfs, argv[1], sizeof(config.rootfs) - 1);
+    strncpy(config.rootfs, argv[first], sizeof(config.rootfs) - 1);
     
     // Set the command and arguments
-    strncpy(config.command, argv[2], sizeof(config.command) - 1);
-    config.command_args = &argv[2];
-    config.command_argc = argc - 2;
-    
-    // Example cgroup setup (in real usage, create these directories first)
-    config.cgroup_path = "/sys/fs/cgroup";
-    config.cpu_shares = 1024; // Default value
-    config.memory_limit_mb = 512; // 512MB limit
+    strncpy(config.command, argv[first + 1], sizeof(config.command) - 1);
+    config.command_args = &argv[first + 1];
+    config.command_argc = argc - first - 1;
     
-    return run_container(&config);
+    return run_container(&config, container_main, 0);
 }
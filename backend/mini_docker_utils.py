@@ -1,30 +1,175 @@
 
+import atexit
 import os
+import select
+import shutil
 import subprocess
-import json
+import tarfile
+import threading
 import uuid
 import signal
 import time
-import psutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Union
 
+from bulk import BULK_WORKERS, BulkOperation, labels_match, parse_label_selector
+from metrics import Histogram
+from mini_cgroups import create_cgroup, remove_cgroup
+from mini_images import ImageStore
+from mini_logs import ContainerLog, LogPump, LogFollowStream, format_record
+from mini_pool import WarmPool
+from mini_stats import MiniStatsEngine
+from mini_store import MetadataStore
+
 # Containers will be stored in this directory structure
 MINI_DOCKER_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mini_docker_containers")
 MINI_DOCKER_RUNTIME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mini_docker/mini_docker")
+# Metadata of every container, in one SQLite database
+MINI_DOCKER_DB = os.environ.get('MINI_DOCKER_DB', os.path.join(MINI_DOCKER_ROOT, "containers.db"))
+# Imported images; keep it on the same filesystem as MINI_DOCKER_ROOT so
+# container rootfs can hard-link image files
+MINI_DOCKER_IMAGES = os.environ.get('MINI_DOCKER_IMAGES',
+                                    os.path.join(os.path.dirname(os.path.abspath(__file__)), "mini_docker_images"))
+# Set to 0 to always build rootfs as hard-link farms instead of overlay mounts
+MINI_DOCKER_OVERLAY = os.environ.get('MINI_DOCKER_OVERLAY', '1') == '1'
+# Parked namespace sandboxes kept ready for starts (0 disables the pool)
+MINI_DOCKER_WARM_POOL = int(os.environ.get('MINI_DOCKER_WARM_POOL', '0'))
+# Set by the collector process, which only reads what the server writes
+MINI_DOCKER_OBSERVER = os.environ.get('MINI_DOCKER_OBSERVER') == '1'
 
 # Ensure container directory exists
 os.makedirs(MINI_DOCKER_ROOT, exist_ok=True)
 
+# Seconds between SIGTERM and SIGKILL when stopping a container
+STOP_TIMEOUT = 2.5
+# Threads removing deleted containers' files
+DELETE_WORKERS = 4
+
+CREATE_SECONDS = Histogram('containeros_mini_create_seconds',
+                           'Time to create a Mini Docker container, by how its rootfs was built', labels=('rootfs',))
+START_SECONDS = Histogram('containeros_mini_start_seconds',
+                          'Time to start a Mini Docker container, from a parked sandbox (warm) or not (cold)',
+                          labels=('path',))
+
 # In-memory storage of container metadata
 _containers = {}
 
+class ProcessSupervisor:
+    """Notice container runtime exits as they happen and reap them
+    
+    Each watched process gets a pidfd registered in one epoll loop; where
+    pidfd_open is unavailable, a thread blocks in the child's wait()
+    instead. Either way the process is reaped the moment it exits (no
+    zombies left looking alive) and on_exit(container_id, pid, exit_code,
+    finished_at) is called from the supervisor's thread. Exit codes follow
+    Docker: 128 + signal number for a signalled process, None when the
+    process was not our child (adopted after a restart).
+    """
+    
+    def __init__(self, on_exit):
+        self.on_exit = on_exit
+        self._lock = threading.Lock()
+        self._watched = {}  # pidfd -> (container id, pid, Popen or None)
+        self._epoll = select.epoll() if hasattr(os, 'pidfd_open') and hasattr(select, 'epoll') else None
+        self._thread = None
+        self.reaped = 0
+    
+    def watch(self, container_id: str, pid: int, process: Optional[subprocess.Popen] = None) -> bool:
+        """Watch a process; returns False if its exit cannot be observed"""
+        if self._epoll is not None:
+            try:
+                fd = os.pidfd_open(pid)
+            except ProcessLookupError:
+                # Already gone: report it right away
+                self._reap(container_id, pid, process)
+                return True
+            except OSError:
+                fd = None  # e.g. ENOSYS on kernels before 5.3
+            if fd is not None:
+                with self._lock:
+                    self._watched[fd] = (container_id, pid, process)
+                    if self._thread is None:
+                        self._thread = threading.Thread(target=self._run, name='mini-supervisor', daemon=True)
+                        self._thread.start()
+                self._epoll.register(fd, select.EPOLLIN)
+                return True
+        if process is not None:
+            threading.Thread(target=self._reap, args=(container_id, pid, process),
+                             name=f'mini-wait-{pid}', daemon=True).start()
+            return True
+        return False
+    
+    def _run(self):
+        while True:
+            for fd, _ in self._epoll.poll():
+                with self._lock:
+                    watched = self._watched.pop(fd, None)
+                self._epoll.unregister(fd)
+                os.close(fd)
+                if watched:
+                    self._reap(*watched)
+    
+    def _reap(self, container_id, pid, process):
+        exit_code = None
+        try:
+            if process is not None:
+                exit_code = process.wait()
+            else:
+                _, status = os.waitpid(pid, 0)
+                exit_code = os.waitstatus_to_exitcode(status)
+        except ChildProcessError:
+            pass  # not our child: it was started before this server
+        if exit_code is not None and exit_code < 0:
+            exit_code = 128 - exit_code
+        self.reaped += 1
+        try:
+            self.on_exit(container_id, pid, exit_code, time.time())
+        except Exception as e:
+            print(f"Error handling exit of container {container_id}: {e}")
+    
+    def watching(self) -> int:
+        with self._lock:
+            return len(self._watched)
+
 class MiniDockerManager:
     """Manage Mini Docker containers"""
     
-    def __init__(self):
-        """Initialize the Mini Docker manager"""
-        self._load_containers()
-        self._compile_runtime()
+    def __init__(self, observer: bool = False):
+        """Initialize the Mini Docker manager
+        
+        An observer (the out-of-process collector) opens the metadata store
+        read-only and only lists containers: it never migrates, compiles,
+        watches processes or writes metadata, so it cannot race the server.
+        """
+        self.observer = observer
+        self._logs = {}  # container id -> ContainerLog
+        # Called as log_listener(container_id, name, image, stream, message)
+        # for every line a container writes, e.g. to feed the search index
+        self.log_listener = None
+        # Samples all running containers (and their process trees) in one pass
+        self.stats_engine = MiniStatsEngine()
+        self.store = MetadataStore(MINI_DOCKER_DB, read_only=observer)
+        atexit.register(self.store.close)
+        self.images = None if observer else ImageStore(MINI_DOCKER_IMAGES, overlay=MINI_DOCKER_OVERLAY)
+        # Filled once started by the server
+        self.warm_pool = (WarmPool(MINI_DOCKER_RUNTIME, MINI_DOCKER_WARM_POOL)
+                          if MINI_DOCKER_WARM_POOL > 0 and not observer else None)
+        # Exits are handled as they happen; stops and deletes can complete
+        # in the background and report through drain_events()
+        self.supervisor = ProcessSupervisor(self._on_exit)
+        self._exited = {}       # container id -> Event set when its process exits
+        self._kill_timers = {}  # container id -> pending SIGKILL Timer
+        self._operations = {}   # container id -> [pending async operations]
+        self._events = deque(maxlen=10000)
+        self._lock = threading.Lock()
+        self._delete_executor = ThreadPoolExecutor(max_workers=DELETE_WORKERS, thread_name_prefix='mini-delete')
+        self._import_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mini-import')
+        if observer:
+            self.refresh_from_disk()
+        else:
+            self._load_containers()
+            self._compile_runtime()
     
     def _compile_runtime(self):
         """Compile the Mini Docker runtime if needed"""
@@ -36,37 +181,54 @@ class MiniDockerManager:
                 print(f"Failed to compile Mini Docker runtime: {e}")
     
     def _load_containers(self):
-        """Load containers from disk"""
-        global _containers
-        if not os.path.exists(MINI_DOCKER_ROOT):
-            return
-            
-        for container_id in os.listdir(MINI_DOCKER_ROOT):
-            container_path = os.path.join(MINI_DOCKER_ROOT, container_id)
-            metadata_path = os.path.join(container_path, "metadata.json")
-            
-            if os.path.exists(metadata_path):
-                try:
-                    with open(metadata_path, 'r') as f:
-                        metadata = json.load(f)
-                        _containers[container_id] = metadata
-                        
-                        # Update container status by checking if process is still running
-                        if metadata.get('pid') and metadata['status'] == 'running':
-                            if not self._is_process_running(metadata['pid']):
-                                metadata['status'] = 'exited'
-                                self._save_container_metadata(container_id, metadata)
-                except Exception as e:
-                    print(f"Error loading container {container_id}: {e}")
+        """Load containers from the metadata store"""
+        # Earlier versions kept one metadata.json per container directory
+        self.store.migrate_directories(MINI_DOCKER_ROOT)
+        _containers.update(self.store.load())
+        
+        for container_id, metadata in _containers.items():
+            # Update container status by checking if process is still running
+            if metadata.get('pid') and metadata['status'] == 'running':
+                if not self._is_process_running(metadata['pid']):
+                    metadata['status'] = 'exited'
+                    self._save_container_metadata(container_id, metadata)
+                else:
+                    # Started before this server: watch it for its exit
+                    self._exited[container_id] = threading.Event()
+                    self.supervisor.watch(container_id, metadata['pid'])
     
-    def _save_container_metadata(self, container_id: str, metadata: Dict):
-        """Save container metadata to disk"""
-        container_path = os.path.join(MINI_DOCKER_ROOT, container_id)
-        os.makedirs(container_path, exist_ok=True)
+    def refresh_from_disk(self):
+        """Replace the in-memory metadata with what is in the store
         
-        metadata_path = os.path.join(container_path, "metadata.json")
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f)
+        Used by processes that only observe containers (the out-of-process
+        collector) to pick up changes made by the server.
+        """
+        found = self.store.load()
+        _containers.clear()
+        _containers.update(found)
+    
+    def _save_container_metadata(self, container_id: str, metadata: Dict):
+        """Queue container metadata to be written to the store"""
+        if self.observer:
+            return  # the server owns the metadata
+        self.store.put(container_id, metadata)
+    
+    def _get_log(self, container_id: str) -> ContainerLog:
+        """Open (or reuse) a container's log files"""
+        log = self._logs.get(container_id)
+        if log is None:
+            log = ContainerLog(os.path.join(MINI_DOCKER_ROOT, container_id, "logs"))
+            self._logs[container_id] = log
+        return log
+    
+    def _line_callback(self, container_id: str):
+        """Forward a container's lines to log_listener, if one is set"""
+        def on_line(stream, message):
+            listener = self.log_listener
+            if listener is not None:
+                metadata = _containers.get(container_id, {})
+                listener(container_id, metadata.get('name', container_id), metadata.get('image'), stream, message)
+        return on_line
     
     def _is_process_running(self, pid: int) -> bool:
         """Check if a process is running"""
@@ -76,55 +238,57 @@ class MiniDockerManager:
         except (OSError, ProcessLookupError):
             return False
     
-    def _get_container_stats(self, container_id: str) -> Dict:
-        """Get container statistics"""
-        metadata = _containers.get(container_id)
-        if not metadata or metadata['status'] != 'running':
-            return {'cpu': 0, 'memory': 0}
-            
-        try:
-            pid = metadata.get('pid')
-            if not pid:
-                return {'cpu': 0, 'memory': 0}
-                
-            process = psutil.Process(pid)
-            cpu_percent = process.cpu_percent(interval=0.1)
-            memory_info = process.memory_info()
-            
-            return {
-                'cpu': cpu_percent,
-                'memory': memory_info.rss / (1024 * 1024)  # in MB
-            }
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            # Process is gone, update status
-            metadata['status'] = 'exited'
-            self._save_container_metadata(container_id, metadata)
-            return {'cpu': 0, 'memory': 0}
+    def _collect_stats(self) -> Dict[str, Dict]:
+        """Get statistics for every running container in one pass
+        
+        Read-only: a container whose process is gone is marked exited by
+        the supervisor, which also records its exit code.
+        """
+        roots = {
+            # A copy: deletes finish on other threads and remove entries
+            container_id: metadata['pid'] for container_id, metadata in list(_containers.items())
+            if metadata['status'] == 'running' and metadata.get('pid')
+        }
+        return self.stats_engine.sample(roots)
     
     def create_container(self, image: str, name: Optional[str] = None, 
                         cpu_limit: Optional[int] = None, 
-                        memory_limit: Optional[int] = None) -> Dict:
+                        memory_limit: Optional[int] = None,
+                        labels: Optional[Dict[str, str]] = None) -> Dict:
         """Create a new container"""
+        started = time.perf_counter()
         # Generate container ID and name
         container_id = str(uuid.uuid4())[:12]
         if not name:
             name = f"mini-{container_id[:6]}"
-            
-        # For simplicity we'll use a basic rootfs
-        # In a real implementation, you would extract image contents
-        rootfs = os.path.join(MINI_DOCKER_ROOT, container_id, "rootfs")
-        os.makedirs(rootfs, exist_ok=True)
         
-        # Create a basic binary to run (for demo purpose)
-        os.makedirs(os.path.join(rootfs, "bin"), exist_ok=True)
-        
-        # For now, we'll create a simple script that echoes a message and sleeps
-        with open(os.path.join(rootfs, "bin", "init.sh"), 'w') as f:
-            f.write('#!/bin/sh\n')
-            f.write('echo "Mini Docker container started"\n')
-            f.write('sleep 3600\n')  # Sleep for an hour
+        container_dir = os.path.join(MINI_DOCKER_ROOT, container_id)
+        try:
+            prepared = self.images.prepare_rootfs(image, container_dir)
+        except OSError as e:
+            shutil.rmtree(container_dir, ignore_errors=True)
+            return {'success': False, 'error': f"Failed to create rootfs: {e}"}
         
-        os.chmod(os.path.join(rootfs, "bin", "init.sh"), 0o755)
+        if prepared:
+            rootfs_mode = prepared['mode']
+            command = prepared['command']
+        else:
+            # Image not imported: use a basic demo rootfs
+            rootfs_mode = 'demo'
+            command = ['/bin/init.sh']
+            rootfs = os.path.join(container_dir, "rootfs")
+            os.makedirs(rootfs, exist_ok=True)
+            
+            # Create a basic binary to run (for demo purpose)
+            os.makedirs(os.path.join(rootfs, "bin"), exist_ok=True)
+            
+            # For now, we'll create a simple script that echoes a message and sleeps
+            with open(os.path.join(rootfs, "bin", "init.sh"), 'w') as f:
+                f.write('#!/bin/sh\n')
+                f.write('echo "Mini Docker container started"\n')
+                f.write('sleep 3600\n')  # Sleep for an hour
+            
+            os.chmod(os.path.join(rootfs, "bin", "init.sh"), 0o755)
         
         # Save container metadata
         metadata = {
@@ -138,11 +302,16 @@ class MiniDockerManager:
             'cpu_limit': cpu_limit,
             'memory_limit': memory_limit,
             'pid': None,
-            'ports': []
+            'ports': [],
+            'labels': labels or {},
+            'command': command,
+            'rootfs': rootfs_mode,
+            'imageId': prepared['imageId'] if prepared else None
         }
         
         _containers[container_id] = metadata
         self._save_container_metadata(container_id, metadata)
+        CREATE_SECONDS.observe(time.perf_counter() - started, rootfs=rootfs_mode)
         
         return metadata
     
@@ -157,29 +326,81 @@ class MiniDockerManager:
         if metadata['status'] == 'running':
             return {'success': False, 'error': 'Container already running'}
             
-        rootfs = os.path.join(MINI_DOCKER_ROOT, container_id, "rootfs")
+        container_dir = os.path.join(MINI_DOCKER_ROOT, container_id)
+        rootfs = os.path.join(container_dir, "rootfs")
         
         # Start the container
         try:
-            # In a real implementation, you would use proper command and args
-            # from the container configuration
-            process = subprocess.Popen(
-                [MINI_DOCKER_RUNTIME, rootfs, "/bin/init.sh"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
+            started = time.perf_counter()
+            if metadata.get('rootfs') == 'overlay':
+                self.images.ensure_mounted(metadata['imageId'], container_dir)
+            command = metadata.get('command') or ["/bin/init.sh"]
+            # The workload joins these before it runs; [] when no limit is set
+            # or limits cannot be applied on this host
+            cgroups = create_cgroup(container_id, metadata.get('cpu_limit'), metadata.get('memory_limit'))
+            process = self.warm_pool.take() if self.warm_pool else None
+            if process is not None:
+                process = self.warm_pool.activate(process, rootfs, command, cgroups)
+            path = 'warm' if process is not None else 'cold'
+            if process is None:
+                options = ['--cgroup', ':'.join(cgroups)] if cgroups else []
+                process = subprocess.Popen(
+                    [MINI_DOCKER_RUNTIME] + options + [rootfs] + command,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE
+                )
+            # Drain both pipes into the container's log files
+            LogPump(self._get_log(container_id), process,
+                    on_line=self._line_callback(container_id)).start()
             
             # Update metadata
             metadata['status'] = 'running'
             metadata['pid'] = process.pid
+            metadata['startedAt'] = time.time() * 1000  # milliseconds
+            metadata['exitCode'] = None
             self._save_container_metadata(container_id, metadata)
             
+            # Learn about the exit the moment it happens
+            self._exited[container_id] = threading.Event()
+            self.supervisor.watch(container_id, process.pid, process)
+            START_SECONDS.observe(time.perf_counter() - started, path=path)
+            
             return {'success': True, 'container': metadata}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def stop_container(self, container_id: str) -> Dict:
-        """Stop a container"""
+    def _on_exit(self, container_id: str, pid: int, exit_code: Optional[int], finished_at: float):
+        """Record a container's exit (called by the supervisor)"""
+        timer = self._kill_timers.pop(container_id, None)
+        if timer:
+            timer.cancel()
+        metadata = _containers.get(container_id)
+        if metadata and metadata.get('pid') == pid:
+            metadata['status'] = 'exited'
+            metadata['pid'] = None
+            metadata['exitCode'] = exit_code
+            metadata['finishedAt'] = finished_at * 1000  # milliseconds
+            self._save_container_metadata(container_id, metadata)
+            self._events.append(('container_exited', {
+                'container': container_id,
+                'name': metadata['name'],
+                'exitCode': exit_code,
+                'finishedAt': metadata['finishedAt'],
+            }))
+        with self._lock:
+            exited = self._exited.get(container_id)
+            if exited:
+                exited.set()
+            operations = self._operations.pop(container_id, [])
+        for operation in operations:
+            self._continue_operation(operation)
+    
+    def _begin_stop(self, container_id: str, timeout: float) -> Dict:
+        """Send SIGTERM now and arm a SIGKILL for after `timeout` seconds
+        
+        Returns {'success': True, 'pending': True} while the process is
+        still exiting, or a finished result.
+        """
         if container_id not in _containers:
             return {'success': False, 'error': 'Container not found'}
             
@@ -194,29 +415,139 @@ class MiniDockerManager:
             metadata['status'] = 'exited'
             self._save_container_metadata(container_id, metadata)
             return {'success': True, 'container': metadata}
-            
-        # Send SIGTERM to the container process
+        
+        self._exited.setdefault(container_id, threading.Event())
+        if container_id in self._kill_timers:
+            return {'success': True, 'pending': True}  # already stopping
         try:
             os.kill(pid, signal.SIGTERM)
-            
-            # Wait for the process to terminate
-            for _ in range(5):
-                if not self._is_process_running(pid):
-                    break
-                time.sleep(0.5)
-                
-            # Force kill if still running
-            if self._is_process_running(pid):
-                os.kill(pid, signal.SIGKILL)
-                
-            # Update metadata
-            metadata['status'] = 'exited'
-            metadata['pid'] = None
-            self._save_container_metadata(container_id, metadata)
-            
-            return {'success': True, 'container': metadata}
-        except Exception as e:
+        except ProcessLookupError:
+            pass  # exiting already; the supervisor reports it
+        except OSError as e:
             return {'success': False, 'error': str(e)}
+        timer = threading.Timer(timeout, self._kill, args=(container_id, pid))
+        timer.daemon = True
+        self._kill_timers[container_id] = timer
+        timer.start()
+        return {'success': True, 'pending': True}
+    
+    def _kill(self, container_id: str, pid: int):
+        """Force kill a container that ignored SIGTERM"""
+        self._kill_timers.pop(container_id, None)
+        metadata = _containers.get(container_id)
+        if not metadata or metadata.get('pid') != pid:
+            return
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        exited = self._exited.get(container_id)
+        if exited and not exited.wait(1.0) and not self._is_process_running(pid):
+            # Nothing is watching this process (adopted without pidfd support)
+            self._on_exit(container_id, pid, None, time.time())
+    
+    def stop_container(self, container_id: str, timeout: float = STOP_TIMEOUT) -> Dict:
+        """Stop a container, waiting for its process to exit"""
+        result = self._begin_stop(container_id, timeout)
+        if not result.get('pending'):
+            return result
+        if not self._exited[container_id].wait(timeout + 2.0):
+            return {'success': False, 'error': 'Container did not stop'}
+        return {'success': True, 'container': _containers.get(container_id)}
+    
+    def _new_operation(self, action: str, container_id: str) -> Dict:
+        return {
+            'operation': uuid.uuid4().hex[:12],
+            'action': action,
+            'container': container_id,
+            'startedAt': time.time(),
+        }
+    
+    def _after_exit(self, container_id: str, operation: Dict):
+        """Continue an operation once the container's process has exited"""
+        with self._lock:
+            if not self._exited[container_id].is_set():
+                self._operations.setdefault(container_id, []).append(operation)
+                return
+        self._continue_operation(operation)
+    
+    def _continue_operation(self, operation: Dict):
+        if operation['action'] == 'delete':
+            self._delete_executor.submit(self._finish_delete, operation)
+        else:
+            self._complete_operation(operation)
+    
+    def _finish_delete(self, operation: Dict):
+        result = self._remove_container(operation['container'])
+        self._complete_operation(operation, result.get('error'))
+    
+    def _complete_operation(self, operation: Dict, error: Optional[str] = None):
+        event = {key: value for key, value in operation.items() if key != 'startedAt'}
+        event['success'] = error is None
+        event['durationMs'] = round((time.time() - operation['startedAt']) * 1000, 3)
+        metadata = _containers.get(operation['container'])
+        if metadata:
+            event['status'] = metadata['status']
+            event['exitCode'] = metadata.get('exitCode')
+        if error:
+            event['error'] = error
+        self._events.append(('container_operation', event))
+    
+    def stop_container_async(self, container_id: str, timeout: float = STOP_TIMEOUT) -> Dict:
+        """Start stopping a container; completion is reported as a container_operation event"""
+        result = self._begin_stop(container_id, timeout)
+        if not result['success']:
+            return result
+        operation = self._new_operation('stop', container_id)
+        if result.get('pending'):
+            self._after_exit(container_id, operation)
+        else:
+            self._complete_operation(operation)
+        return {'success': True, 'operation': operation['operation'], 'status': 'stopping'}
+    
+    def delete_container_async(self, container_id: str, timeout: float = STOP_TIMEOUT) -> Dict:
+        """Start deleting a container (stopping it first if needed); completion is reported as an event"""
+        if container_id not in _containers:
+            return {'success': False, 'error': 'Container not found'}
+        operation = self._new_operation('delete', container_id)
+        if _containers[container_id]['status'] == 'running':
+            result = self._begin_stop(container_id, timeout)
+            if not result['success']:
+                return result
+            if result.get('pending'):
+                self._after_exit(container_id, operation)
+                return {'success': True, 'operation': operation['operation'], 'status': 'deleting'}
+        self._continue_operation(operation)
+        return {'success': True, 'operation': operation['operation'], 'status': 'deleting'}
+    
+    def import_image_async(self, source: str, name: Optional[str] = None) -> Dict:
+        """Start importing an image; completion is reported as an image_import event"""
+        operation = {
+            'operation': uuid.uuid4().hex[:12],
+            'source': source,
+            'name': name,
+            'startedAt': time.time(),
+        }
+        self._import_executor.submit(self._finish_import, operation)
+        return {'success': True, 'operation': operation['operation'], 'status': 'importing'}
+    
+    def _finish_import(self, operation: Dict):
+        event = {key: value for key, value in operation.items() if key != 'startedAt'}
+        try:
+            event['images'] = self.images.import_image(operation['source'], operation['name'])
+            event['success'] = True
+        except (OSError, ValueError, KeyError, tarfile.TarError) as e:
+            event['success'] = False
+            event['error'] = str(e)
+        event['durationMs'] = round((time.time() - operation['startedAt']) * 1000, 3)
+        self._events.append(('image_import', event))
+    
+    def drain_events(self) -> List:
+        """(event name, payload) pairs queued since the last call"""
+        events = []
+        while self._events:
+            events.append(self._events.popleft())
+        return events
     
     def delete_container(self, container_id: str) -> Dict:
         """Delete a container"""
@@ -228,50 +559,129 @@ class MiniDockerManager:
         # If running, stop it first
         if metadata['status'] == 'running':
             self.stop_container(container_id)
-            
+        
+        return self._remove_container(container_id)
+    
+    def _remove_container(self, container_id: str) -> Dict:
+        """Remove a stopped container's files and metadata"""
+        if container_id not in _containers:
+            return {'success': False, 'error': 'Container not found'}
+        
         # Remove container directory
         try:
-            import shutil
-            shutil.rmtree(os.path.join(MINI_DOCKER_ROOT, container_id))
+            log = self._logs.pop(container_id, None)
+            if log:
+                log.close()
+            container_dir = os.path.join(MINI_DOCKER_ROOT, container_id)
+            self.images.release_rootfs(container_dir)
+            shutil.rmtree(container_dir)
+            remove_cgroup(container_id)
             
             # Remove from in-memory storage
             del _containers[container_id]
+            self._exited.pop(container_id, None)
+            self.store.delete(container_id)
             
             return {'success': True}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def restart_container(self, container_id: str) -> Dict:
+        """Restart a container"""
+        if _containers.get(container_id, {}).get('status') == 'running':
+            result = self.stop_container(container_id)
+            if not result['success']:
+                return result
+        return self.start_container(container_id)
+    
+    def bulk_action(self, action: str, ids: Optional[List[str]] = None,
+                    labels: Union[str, Dict, None] = None, workers: int = BULK_WORKERS) -> BulkOperation:
+        """Apply start/stop/restart/delete to many containers concurrently
+        
+        Stops and deletes only signal the containers, so they do not hold a
+        bulk worker through the stop timeout; each completes later as a
+        container_operation event.
+        """
+        handlers = {
+            'start': self.start_container,
+            'stop': self.stop_container_async,
+            'restart': self.restart_container,
+            'delete': self.delete_container_async,
+        }
+        if action not in handlers:
+            raise ValueError(f"Unknown action '{action}'")
+        ids = list(ids or [])
+        selector = parse_label_selector(labels)
+        if selector:
+            ids += [cid for cid, metadata in list(_containers.items())
+                    if labels_match(metadata.get('labels'), selector)]
+        return BulkOperation(action, ids, handlers[action], workers).start()
+    
     def list_containers(self) -> List[Dict]:
         """List all containers"""
         containers = []
+        stats = self._collect_stats()
         
-        for container_id, metadata in _containers.items():
-            # If container is running, get stats
-            if metadata['status'] == 'running':
-                stats = self._get_container_stats(container_id)
-                metadata['cpu'] = stats['cpu']
-                metadata['memory'] = stats['memory']
+        for container_id, metadata in list(_containers.items()):
+            sample = stats.get(container_id)
+            if sample:
+                metadata['cpu'] = round(sample['cpu'], 1)
+                metadata['memory'] = round(sample['memory'], 1)
+                metadata['pids'] = sample['pids']
+            elif metadata['status'] != 'running':
+                metadata['cpu'] = 0
+                metadata['memory'] = 0
                 
             containers.append(metadata)
             
         return containers
     
-    def get_container_logs(self, container_id: str) -> Dict:
-        """Get container logs"""
+    def find_containers(self, name: Optional[str] = None, status: Optional[str] = None,
+                        image: Optional[str] = None) -> List[Dict]:
+        """Containers matching all given fields, looked up through the store's indexes"""
+        ids = self.store.find(name=name, status=status, image=image)
+        return [_containers[container_id] for container_id in ids if container_id in _containers]
+    
+    def get_container_logs(self, container_id: str, tail: int = 100,
+                           since: Optional[float] = None, until: Optional[float] = None,
+                           cursor: Optional[int] = None) -> Dict:
+        """Get container logs
+        
+        Without arguments the last `tail` lines are returned. `since`/`until`
+        (epoch seconds, either or both) select a time range via the log
+        index, read forward from its start, and `cursor` (a byte offset
+        returned by a previous call) continues from where that call stopped.
+        """
         if container_id not in _containers:
             return {'logs': [], 'error': 'Container not found'}
-            
-        # In a real implementation, you would read logs from a file
-        # Here we'll just return a mock log
+        
+        name = _containers[container_id]['name']
+        image = _containers[container_id].get('image')
+        log = self._get_log(container_id)
+        if cursor is not None or since is not None or until is not None:
+            records, next_cursor = log.read(start=cursor, limit=tail, since=since, until=until)
+        else:
+            records, next_cursor = log.tail(tail), log.end
+        
         return {
-            'logs': [
-                {
-                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
-                    'type': 'INFO',
-                    'message': f"[{_containers[container_id]['name']}] Mini Docker container started"
-                }
-            ]
+            'logs': [format_record(name, record, image) for record in records],
+            'cursor': next_cursor
         }
+    
+    def open_log_stream(self, container_id: str, since: Optional[float] = None):
+        """Open a follow stream over a container's log, returning (stream, name, image)"""
+        if container_id not in _containers:
+            raise KeyError(f"Container {container_id} not found")
+        metadata = _containers[container_id]
+        return LogFollowStream(self._get_log(container_id)), metadata['name'], metadata.get('image')
+    
+    def has_container(self, container_id: str) -> bool:
+        return container_id in _containers
+    
+    def get_status(self, container_id: str) -> Optional[str]:
+        """Current status of a container, or None if it does not exist"""
+        metadata = _containers.get(container_id)
+        return metadata['status'] if metadata else None
 
 # Initialize the manager
-mini_docker_manager = MiniDockerManager()
+mini_docker_manager = MiniDockerManager(observer=MINI_DOCKER_OBSERVER)
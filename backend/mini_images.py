@@ -0,0 +1,385 @@
+
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+
+WHITEOUT_PREFIX = '.wh.'
+OPAQUE_WHITEOUT = '.wh..wh..opq'
+MNT_DETACH = 2
+DEFAULT_COMMAND = ['/bin/sh']
+
+_libc = None
+
+
+def _mount_call(name, *args):
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    if getattr(_libc, name)(*args) != 0:
+        code = ctypes.get_errno()
+        raise OSError(code, os.strerror(code))
+
+
+def mount_overlay(lower, upper, work, target):
+    options = f"lowerdir={lower},upperdir={upper},workdir={work}"
+    _mount_call('mount', b'overlay', target.encode(), b'overlay', 0, options.encode())
+
+
+def unmount(target):
+    _mount_call('umount2', target.encode(), MNT_DETACH)
+
+
+def normalize_name(name):
+    """'busybox' -> 'busybox:latest'"""
+    last = name.rsplit('/', 1)[-1]
+    return name if ':' in last or '@' in name else f"{name}:latest"
+
+
+def _remove(path):
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _place(entry, path, link):
+    """Recreate one non-directory entry at path"""
+    if entry.is_symlink():
+        os.symlink(os.readlink(entry.path), path)
+    elif entry.is_file(follow_symlinks=False):
+        if link:
+            try:
+                os.link(entry.path, path)
+                return
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EMLINK, errno.EPERM):
+                    raise
+        shutil.copy2(entry.path, path, follow_symlinks=False)
+    # Sockets, FIFOs and device nodes are left out
+
+
+def merge_tree(source, target, link=True, fresh=False):
+    """Merge the tree at source into target, applying layer whiteouts
+
+    Regular files are hard-linked (copied across filesystems). With fresh
+    the target is known to be empty, so nothing is checked for replacement.
+    """
+    entries = list(os.scandir(source))
+    if not fresh and any(entry.name == OPAQUE_WHITEOUT for entry in entries):
+        for name in os.listdir(target):
+            _remove(os.path.join(target, name))
+        fresh = True
+    for entry in entries:
+        if entry.name == OPAQUE_WHITEOUT:
+            continue
+        if entry.name.startswith(WHITEOUT_PREFIX):
+            _remove(os.path.join(target, entry.name[len(WHITEOUT_PREFIX):]))
+            continue
+        path = os.path.join(target, entry.name)
+        if entry.is_dir(follow_symlinks=False):
+            created = fresh
+            if not fresh and (os.path.islink(path) or not os.path.isdir(path)):
+                _remove(path)
+                created = True
+            if created:
+                os.mkdir(path)
+            merge_tree(entry.path, path, link, created)
+            shutil.copystat(entry.path, path, follow_symlinks=False)
+        else:
+            if not fresh:
+                _remove(path)
+            _place(entry, path, link)
+
+
+class ImageStore:
+    """Images for mini containers, unpacked once into content-addressed layers
+
+    Layers are extracted to layers/<sha256 of the uncompressed layer tar>,
+    so images sharing a layer share its files and an image imported twice
+    costs nothing. The layers of an image are flattened once (whiteouts
+    applied, files hard-linked) into roots/<chain id>. A container's rootfs
+    is an overlayfs mount with that root as the read-only lower layer when
+    mounting is permitted; otherwise it is a hard-link farm of the root.
+    Files in a farm are shared with the image, so a container writing to
+    an existing file in place (rather than replacing it) changes the image.
+    """
+
+    def __init__(self, root, overlay=True):
+        self.root = root
+        self.layers_dir = os.path.join(root, 'layers')
+        self.roots_dir = os.path.join(root, 'roots')
+        self._index_path = os.path.join(root, 'images.json')
+        self._lock = threading.RLock()
+        self._overlay = None if overlay else False  # None until a mount is tried
+        for directory in (self.layers_dir, self.roots_dir):
+            os.makedirs(directory, exist_ok=True)
+        self._images = self._read_index()
+
+    def _read_index(self):
+        try:
+            with open(self._index_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Error reading image index: {e}")
+            return {}
+
+    def _write_index(self):
+        temp_path = self._index_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self._images, f, indent=2)
+        os.replace(temp_path, self._index_path)
+
+    def list_images(self):
+        with self._lock:
+            return [dict(record) for _, record in sorted(self._images.items())]
+
+    def get(self, name):
+        with self._lock:
+            return self._images.get(normalize_name(name))
+
+    # Importing
+
+    def import_image(self, source, name=None):
+        """Import a `docker save` archive, a rootfs tarball or a rootfs directory
+
+        Returns the image records created (an archive may carry several tags).
+        """
+        if os.path.isdir(source):
+            if not name:
+                raise ValueError("A name is required to import a directory")
+            digest, size = self._import_directory(source)
+            return [self._register(name, [digest], DEFAULT_COMMAND, size, source)]
+        with tarfile.open(source, 'r:*') as archive:
+            try:
+                manifest = json.load(archive.extractfile('manifest.json'))
+            except KeyError:
+                manifest = None  # a plain rootfs tarball, e.g. from `docker export`
+            if manifest is None:
+                if not name:
+                    raise ValueError("A name is required to import a rootfs tarball")
+                with open(source, 'rb') as f:
+                    digest = self._hash_stream(f)
+                with open(source, 'rb') as f:
+                    size = self._extract_layer(digest, f)
+                return [self._register(name, [digest], DEFAULT_COMMAND, size, source)]
+            return [record for entry in manifest
+                    for record in self._import_manifest_entry(archive, entry, name, source)]
+
+    def _import_manifest_entry(self, archive, entry, name, source):
+        config = json.load(archive.extractfile(entry['Config']))
+        diff_ids = config.get('rootfs', {}).get('diff_ids', [])
+        layer_paths = entry['Layers']
+        if len(diff_ids) != len(layer_paths):
+            diff_ids = [None] * len(layer_paths)
+        digests = []
+        size = 0
+        for path, diff_id in zip(layer_paths, diff_ids):
+            # The config names each layer by the digest of its uncompressed
+            # tar, so known layers are skipped without reading them
+            digest = diff_id.split(':', 1)[-1] if diff_id else self._hash_stream(archive.extractfile(path))
+            size += self._extract_layer(digest, archive.extractfile(path))
+            digests.append(digest)
+        image_config = config.get('config') or {}
+        command = (image_config.get('Entrypoint') or []) + (image_config.get('Cmd') or []) or DEFAULT_COMMAND
+        names = [name] if name else (entry.get('RepoTags') or [])
+        if not names:
+            names = [entry['Config'].rsplit('/', 1)[-1].split('.', 1)[0][:12]]
+        return [self._register(tag, digests, command, size, source) for tag in names]
+
+    @staticmethod
+    def _hash_stream(stream):
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def _layer_path(self, digest):
+        return os.path.join(self.layers_dir, digest)
+
+    def _extract_layer(self, digest, stream):
+        """Unpack a layer tar (possibly compressed) unless already present; returns its size"""
+        path = self._layer_path(digest)
+        if os.path.isdir(path):
+            return self._layer_size(path)
+        temp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=self.layers_dir)
+        size = 0
+
+        def layer_filter(member, dest_path):
+            nonlocal size
+            if member.isdev() and os.geteuid() != 0:
+                return None
+            try:
+                # Rejects paths and links escaping the layer, but also
+                # strips setuid/setgid bits that a rootfs needs (su, ping)
+                safe = tarfile.tar_filter(member, dest_path)
+            except tarfile.FilterError as e:
+                print(f"Skipping layer entry {member.name}: {e}")
+                return None
+            if safe.mode is not None and member.mode is not None:
+                safe = safe.replace(mode=member.mode, deep=False)
+            size += safe.size if safe.isfile() else 0
+            return safe
+
+        try:
+            with tarfile.open(fileobj=stream, mode='r|*') as layer:
+                # Owners are the image's uids, not names looked up on this host
+                if hasattr(tarfile, 'tar_filter'):
+                    layer.extractall(temp_dir, numeric_owner=True, filter=layer_filter)
+                else:
+                    layer.extractall(temp_dir, numeric_owner=True)
+            os.rename(temp_dir, path)
+        except OSError as e:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            if e.errno in (errno.EEXIST, errno.ENOTEMPTY):
+                return self._layer_size(path)  # extracted concurrently
+            raise
+        except BaseException:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        return size
+
+    def _import_directory(self, source):
+        digest = hashlib.sha256()
+        size = 0
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                info = os.lstat(path)
+                digest.update(f"{os.path.relpath(path, source)}\0{info.st_mode}\0".encode())
+                if os.path.islink(path):
+                    digest.update(os.readlink(path).encode())
+                elif os.path.isfile(path):
+                    size += info.st_size
+                    with open(path, 'rb') as f:
+                        digest.update(self._hash_stream(f).encode())
+        digest = digest.hexdigest()
+        path = self._layer_path(digest)
+        if not os.path.isdir(path):
+            temp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=self.layers_dir)
+            try:
+                # Copied, not linked: the source directory may change later
+                merge_tree(source, temp_dir, link=False, fresh=True)
+                os.rename(temp_dir, path)
+            except OSError:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                if not os.path.isdir(path):
+                    raise
+        return digest, size
+
+    @staticmethod
+    def _layer_size(path):
+        return sum(os.lstat(os.path.join(dirpath, filename)).st_size
+                   for dirpath, _, filenames in os.walk(path) for filename in filenames)
+
+    def _register(self, name, layers, command, size, source):
+        chain_id = hashlib.sha256('\n'.join(layers).encode()).hexdigest()
+        record = {
+            'name': normalize_name(name),
+            'id': chain_id[:12],
+            'chainId': chain_id,
+            'layers': layers,
+            'command': command,
+            'sizeBytes': size,
+            'source': source,
+            'imported': time.time() * 1000,  # milliseconds
+        }
+        self._image_root(record)
+        with self._lock:
+            self._images[record['name']] = record
+            self._write_index()
+        return record
+
+    def _image_root(self, record):
+        """The image's flattened root, built on first use"""
+        path = os.path.join(self.roots_dir, record['chainId'])
+        if os.path.isdir(path):
+            return path
+        with self._lock:
+            if os.path.isdir(path):
+                return path
+            temp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=self.roots_dir)
+            try:
+                for index, digest in enumerate(record['layers']):
+                    merge_tree(self._layer_path(digest), temp_dir, fresh=index == 0)
+                os.chmod(temp_dir, 0o755)
+                os.rename(temp_dir, path)
+            except BaseException:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                raise
+        return path
+
+    # Container root filesystems
+
+    def prepare_rootfs(self, name, container_dir):
+        """Create <container_dir>/rootfs from an image
+
+        Returns {'rootfs', 'mode', 'imageId' (the chain id), 'command'}, or
+        None when the image has not been imported.
+        """
+        record = self.get(name)
+        if record is None:
+            return None
+        lower = self._image_root(record)
+        rootfs = os.path.join(container_dir, 'rootfs')
+        os.makedirs(rootfs, exist_ok=True)
+        mode = 'hardlink'
+        if self._overlay is not False:
+            try:
+                self._mount(lower, container_dir)
+                self._overlay = True
+                mode = 'overlay'
+            except OSError as e:
+                # Not permitted (no CAP_SYS_ADMIN) or not supported: stop trying
+                print(f"overlayfs unavailable ({e}); using hard-link farms for mini container rootfs")
+                self._overlay = False
+                for directory in ('upper', 'work'):
+                    shutil.rmtree(os.path.join(container_dir, directory), ignore_errors=True)
+        if mode == 'hardlink':
+            merge_tree(lower, rootfs, fresh=True)
+            shutil.copystat(lower, rootfs)
+        return {'rootfs': rootfs, 'mode': mode, 'imageId': record['chainId'], 'command': record['command']}
+
+    def _mount(self, lower, container_dir):
+        upper = os.path.join(container_dir, 'upper')
+        work = os.path.join(container_dir, 'work')
+        os.makedirs(upper, exist_ok=True)
+        os.makedirs(work, exist_ok=True)
+        mount_overlay(lower, upper, work, os.path.join(container_dir, 'rootfs'))
+
+    def ensure_mounted(self, chain_id, container_dir):
+        """Remount an overlay rootfs, e.g. after a reboot"""
+        rootfs = os.path.join(container_dir, 'rootfs')
+        if os.path.ismount(rootfs):
+            return
+        lower = os.path.join(self.roots_dir, chain_id)
+        if not os.path.isdir(lower):
+            raise FileNotFoundError(f"Image {chain_id[:12]} is no longer in the image store")
+        self._mount(lower, container_dir)
+
+    def release_rootfs(self, container_dir):
+        """Unmount a container's overlay rootfs before its directory is removed"""
+        rootfs = os.path.join(container_dir, 'rootfs')
+        if os.path.ismount(rootfs):
+            unmount(rootfs)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'images': len(self._images),
+                'layers': sum(1 for name in os.listdir(self.layers_dir) if not name.startswith('.')),
+                'overlay': self._overlay,
+            }
@@ -0,0 +1,323 @@
+
+import bisect
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+
+from log_search import classify
+
+LOG_MAX_BYTES = 10 * 1024 * 1024  # rotate the active file past this size
+LOG_BACKUPS = 3                   # rotated files kept per container
+INDEX_EVERY_BYTES = 64 * 1024     # write an index entry at least this often...
+INDEX_EVERY_SECONDS = 1.0         # ...and at least once per second of output
+
+# Index files start with the logical offset of their log file's first byte,
+# followed by (timestamp, logical offset) entries
+INDEX_HEADER = struct.Struct('<Q')
+INDEX_ENTRY = struct.Struct('<dQ')
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def format_record(name, line, image=None):
+    """Format a stored record for the frontend"""
+    timestamp, epoch, stream, message = parse_record(line)
+    return {
+        'timestamp': timestamp,
+        'epoch': epoch,
+        'stream': stream,
+        'type': classify(message, image),
+        'message': f"[{name}] {message}"
+    }
+
+
+def parse_record(line):
+    """Split a stored record into (timestamp, epoch, stream, message)"""
+    timestamp, _, rest = line.partition(' ')
+    stream, _, message = rest.partition(' ')
+    try:
+        epoch = datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        epoch = None
+    return timestamp, epoch, stream, message
+
+
+class ContainerLog:
+    """Append-only, size-rotated log for one mini container
+
+    Each record is one line: "<RFC 3339 time> <stdout|stderr> <message>".
+    Positions are logical offsets (bytes written since the log was created)
+    that stay valid across rotation, so they can be used as cursors. A
+    sparse (timestamp, offset) index per file turns tail and time-range
+    reads into seeks instead of full scans.
+    """
+
+    def __init__(self, directory, name='container.log', max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        self.directory = directory
+        self.name = name
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.RLock()
+        self._file = None
+        self._index = None
+        self._base = 0
+        self._size = 0
+        self._last_index_ts = 0.0
+        self._last_index_offset = 0
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    def _path(self, generation=0):
+        suffix = f'.{generation}' if generation else ''
+        return os.path.join(self.directory, self.name + suffix)
+
+    def _index_path(self, generation=0):
+        return self._path(generation) + '.idx'
+
+    def _open(self):
+        path, index_path = self._path(), self._index_path()
+        if not os.path.exists(index_path):
+            base = 0
+            if os.path.exists(self._index_path(1)):
+                base, entries = self._read_index(1)
+                base += os.path.getsize(self._path(1)) if os.path.exists(self._path(1)) else 0
+            with open(index_path, 'wb') as f:
+                f.write(INDEX_HEADER.pack(base))
+        self._base, entries = self._read_index(0)
+        self._file = open(path, 'ab')
+        self._index = open(index_path, 'ab')
+        self._size = self._file.tell()
+        if entries:
+            self._last_index_ts, self._last_index_offset = entries[-1]
+
+    def _read_index(self, generation):
+        """Return (base offset, [(ts, logical offset)]) for one file"""
+        try:
+            with open(self._index_path(generation), 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return None, []
+        if len(raw) < INDEX_HEADER.size:
+            return 0, []
+        base = INDEX_HEADER.unpack_from(raw)[0]
+        body = raw[INDEX_HEADER.size:]
+        body = body[:len(body) - len(body) % INDEX_ENTRY.size]
+        return base, list(INDEX_ENTRY.iter_unpack(body))
+
+    @property
+    def end(self):
+        """Logical offset just past the last record"""
+        return self._base + self._size
+
+    def write(self, stream, message, ts=None):
+        """Append one record"""
+        ts = time.time() if ts is None else ts
+        record = f"{_iso(ts)} {stream} {message.rstrip(chr(10))}\n".encode('utf-8', 'replace')
+        with self._lock:
+            if self._file is None:
+                return
+            offset = self.end
+            if (ts - self._last_index_ts >= INDEX_EVERY_SECONDS
+                    or offset - self._last_index_offset >= INDEX_EVERY_BYTES):
+                self._index.write(INDEX_ENTRY.pack(ts, offset))
+                self._last_index_ts, self._last_index_offset = ts, offset
+            self._file.write(record)
+            self._size += len(record)
+            if self._size >= self.max_bytes:
+                self._rotate()
+
+    def flush(self):
+        with self._lock:
+            if self._file is None:
+                return  # closed: the container was deleted
+            self._file.flush()
+            self._index.flush()
+
+    def _rotate(self):
+        self._file.close()
+        self._index.close()
+        for generation in range(self.backups, 0, -1):
+            for path_of in (self._path, self._index_path):
+                source = path_of(generation - 1)
+                if generation == self.backups:
+                    if os.path.exists(path_of(generation)):
+                        os.remove(path_of(generation))
+                if os.path.exists(source):
+                    os.replace(source, path_of(generation))
+        base = self.end
+        with open(self._index_path(), 'wb') as f:
+            f.write(INDEX_HEADER.pack(base))
+        self._last_index_ts = 0.0
+        self._open()
+
+    def _files(self):
+        """Existing files oldest first: [(path, base offset, size, index entries)]"""
+        files = []
+        for generation in range(self.backups, -1, -1):
+            if not os.path.exists(self._path(generation)):
+                continue
+            base, entries = self._read_index(generation)
+            if base is None:
+                continue
+            files.append((self._path(generation), base, os.path.getsize(self._path(generation)), entries))
+        return files
+
+    def read(self, start=None, limit=1000, since=None, until=None):
+        """Read records from logical offset `start` (or the first at/after `since`)
+
+        Returns (records, next offset); records are decoded lines.
+        """
+        # Held while reading so a rotation cannot rename files underneath us
+        with self._lock:
+            self.flush()
+            return self._read(self._files(), start, limit, since, until)
+
+    def _read(self, files, start, limit, since, until):
+        if not files:
+            return [], 0
+
+        if start is None:
+            start = files[0][1]
+            if since is not None:
+                start = self._offset_for_time(files, since)
+        start = max(start, files[0][1])
+
+        records = []
+        position = start
+        for path, base, size, _ in files:
+            if position >= base + size or len(records) >= limit:
+                continue
+            with open(path, 'rb') as f:
+                f.seek(max(0, position - base))
+                for raw in f:
+                    if not raw.endswith(b'\n'):
+                        break  # partially written record
+                    line = raw.decode('utf-8', 'replace').rstrip('\n')
+                    _, epoch, _, _ = parse_record(line)
+                    if since is not None and epoch is not None and epoch < since:
+                        position += len(raw)
+                        continue
+                    if until is not None and epoch is not None and epoch > until:
+                        return records, position
+                    records.append(line)
+                    position += len(raw)
+                    if len(records) >= limit:
+                        break
+        return records, position
+
+    def _offset_for_time(self, files, since):
+        """Logical offset of the last index entry at or before `since`"""
+        timestamps, offsets = [], []
+        for _, base, _, entries in files:
+            if not entries:
+                timestamps.append(float('-inf'))
+                offsets.append(base)
+            for ts, offset in entries:
+                timestamps.append(ts)
+                offsets.append(offset)
+        i = bisect.bisect_right(timestamps, since) - 1
+        return offsets[i] if i >= 0 else files[0][1]
+
+    def tail(self, count=100, block_size=64 * 1024):
+        """Last `count` records, found by reading blocks backwards from the end"""
+        with self._lock:
+            self.flush()
+            return self._tail(self._files(), count, block_size)
+
+    def _tail(self, files, count, block_size):
+        lines = []
+        for path, base, size, _ in reversed(files):
+            with open(path, 'rb') as f:
+                position = size
+                carry = b''
+                while position > 0 and len(lines) < count:
+                    read_size = min(block_size, position)
+                    position -= read_size
+                    f.seek(position)
+                    chunk = f.read(read_size) + carry
+                    parts = chunk.split(b'\n')
+                    carry = parts.pop(0) if position > 0 else b''
+                    for raw in reversed(parts):
+                        if raw:
+                            lines.append(raw.decode('utf-8', 'replace'))
+            if len(lines) >= count:
+                break
+        return list(reversed(lines[:count]))
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._index.close()
+                self._file = self._index = None
+
+
+class LogPump:
+    """Copy a process's stdout/stderr pipes into a ContainerLog
+
+    One reader thread per pipe keeps the pipes drained, so a chatty
+    container can never block on a full pipe buffer.
+    """
+
+    def __init__(self, log, process, on_line=None):
+        self.log = log
+        self.process = process
+        self.on_line = on_line
+        self._threads = []
+
+    def start(self):
+        for stream_name, pipe in (('stdout', self.process.stdout), ('stderr', self.process.stderr)):
+            if pipe is None:
+                continue
+            thread = threading.Thread(target=self._pump, args=(stream_name, pipe),
+                                      name=f"log-pump-{stream_name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _pump(self, stream_name, pipe):
+        try:
+            for raw in iter(pipe.readline, b''):
+                message = raw.decode('utf-8', 'replace').rstrip('\n')
+                self.log.write(stream_name, message)
+                if self.on_line:
+                    self.on_line(stream_name, message)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.log.flush()
+            pipe.close()
+
+
+class LogFollowStream:
+    """Iterate new records of a ContainerLog as they are written
+
+    Yields raw "<timestamp> <message>" lines like a Docker follow stream,
+    so the shared WebSocket log hub can consume it. close() ends iteration.
+    """
+
+    POLL_INTERVAL = 0.25
+
+    def __init__(self, log, start=None, sleep=time.sleep):
+        self.log = log
+        self.position = log.end if start is None else start
+        self._closed = False
+        self._sleep = sleep
+
+    def __iter__(self):
+        while not self._closed:
+            records, self.position = self.log.read(start=self.position, limit=500)
+            if records:
+                chunk = []
+                for record in records:
+                    timestamp, _, stream, message = parse_record(record)
+                    chunk.append(f"{timestamp} {message}\n")
+                yield ''.join(chunk).encode('utf-8')
+            else:
+                self._sleep(self.POLL_INTERVAL)
+
+    def close(self):
+        self._closed = True
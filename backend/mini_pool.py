@@ -0,0 +1,173 @@
+
+import subprocess
+import threading
+import time
+
+from metrics import Counter, Gauge, Histogram
+
+SPAWN_RETRY_MIN = 0.5   # seconds to wait after a sandbox fails to start...
+SPAWN_RETRY_MAX = 30.0  # ...doubling up to this
+# Pause before replacing taken sandboxes, so parking a new one does not
+# compete for CPU with the container that was just started
+REPLENISH_DELAY = 0.02
+
+POOL_IDLE = Gauge('containeros_mini_warm_pool_idle', 'Parked Mini Docker sandboxes ready to be handed out')
+POOL_SIZE = Gauge('containeros_mini_warm_pool_size', 'Target number of parked Mini Docker sandboxes')
+POOL_REQUESTS = Counter('containeros_mini_warm_pool_requests_total',
+                        'Mini Docker starts by whether a parked sandbox was available', labels=('result',))
+POOL_SPAWN_SECONDS = Histogram('containeros_mini_warm_pool_spawn_seconds',
+                               'Time to create and park one Mini Docker sandbox')
+
+
+def encode_request(rootfs, command, cgroups=()):
+    """The start request a parked sandbox reads from stdin"""
+    return b''.join(part.encode() + b'\0' for part in [':'.join(cgroups), rootfs] + list(command))
+
+
+class WarmPool:
+    """Parked Mini Docker sandboxes, ready to become containers
+
+    Each sandbox is the runtime started with --warm: it has cloned the
+    container's PID/UTS/mount/net namespaces and set the hostname, then
+    waits for a start request (rootfs and command) on stdin. take() hands
+    one out without blocking and a background thread parks a replacement,
+    so a start costs a pipe write, chroot, mounts and exec instead of a
+    fork/exec of the runtime plus namespace creation. When the pool is
+    empty, take() returns None and the caller starts the runtime cold.
+    """
+
+    def __init__(self, runtime, size):
+        self.runtime = runtime
+        self.size = size
+        self._idle = []  # parked Popen objects, oldest first
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+        self.spawn_failures = 0
+        self.last_spawn_ms = 0.0
+        POOL_SIZE.set(size)
+
+    def start(self):
+        if self._thread is None and self.size > 0:
+            self._thread = threading.Thread(target=self._run, name='mini-warm-pool', daemon=True)
+            self._thread.start()
+        return self
+
+    def _spawn(self):
+        """Start one sandbox and wait until it is parked"""
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [self.runtime, '--warm'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        # "ready <pid>" once the namespaces exist
+        line = process.stdout.readline()
+        if not line.startswith(b'ready '):
+            process.kill()
+            error = process.stderr.read().decode('utf-8', 'replace').strip()
+            process.wait()
+            raise RuntimeError(error or f"runtime exited with status {process.returncode}")
+        elapsed = time.perf_counter() - started
+        POOL_SPAWN_SECONDS.observe(elapsed)
+        self.last_spawn_ms = round(elapsed * 1000, 3)
+        return process
+
+    def _run(self):
+        retry = SPAWN_RETRY_MIN
+        while not self._closed:
+            with self._lock:
+                missing = self.size - len(self._idle)
+            if missing <= 0:
+                self._wake.wait()
+                self._wake.clear()
+                time.sleep(REPLENISH_DELAY)
+                continue
+            try:
+                process = self._spawn()
+            except (OSError, RuntimeError) as e:
+                self.spawn_failures += 1
+                print(f"Error parking Mini Docker sandbox: {e}")
+                time.sleep(retry)
+                retry = min(retry * 2, SPAWN_RETRY_MAX)
+                continue
+            retry = SPAWN_RETRY_MIN
+            with self._lock:
+                if self._closed:
+                    self._discard(process)
+                    break
+                self._idle.append(process)
+                POOL_IDLE.set(len(self._idle))
+
+    def take(self):
+        """A parked sandbox, or None if none is ready"""
+        process = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop(0)
+                if candidate.poll() is None:
+                    process = candidate
+                    break
+                self._discard(candidate)  # died while parked
+            POOL_IDLE.set(len(self._idle))
+        self._wake.set()
+        if process is None:
+            self.misses += 1
+            POOL_REQUESTS.inc(result='miss')
+        else:
+            self.hits += 1
+            POOL_REQUESTS.inc(result='hit')
+        return process
+
+    def activate(self, process, rootfs, command, cgroups=()):
+        """Turn a parked sandbox into a container running command in rootfs, inside cgroups
+
+        Returns None if the sandbox died after it was taken.
+        """
+        try:
+            process.stdin.write(encode_request(rootfs, command, cgroups))
+            process.stdin.close()
+        except BrokenPipeError:
+            self._discard(process)
+            return None
+        return process
+
+    @staticmethod
+    def _discard(process):
+        # EOF on the request pipe makes the sandbox exit
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=1.0)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        for pipe in (process.stdout, process.stderr):
+            pipe.close()
+
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+        return {
+            'size': self.size,
+            'idle': idle,
+            'hits': self.hits,
+            'misses': self.misses,
+            'spawnFailures': self.spawn_failures,
+            'lastSpawnMs': self.last_spawn_ms,
+        }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            POOL_IDLE.set(0)
+        self._wake.set()
+        for process in idle:
+            self._discard(process)
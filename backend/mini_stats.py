@@ -0,0 +1,189 @@
+
+import os
+import time
+
+import psutil
+
+from container_utils import CGROUP_ROOT, CgroupStatsReader
+
+
+def _read_cgroup_path(pid):
+    """A process's cgroup path relative to the hierarchy root, or None
+
+    Uses the unified (v2) entry, or the memory controller's path on v1.
+    """
+    try:
+        with open(f'/proc/{pid}/cgroup', 'r') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    fallback = None
+    for line in lines:
+        _, controllers, path = line.split(':', 2)
+        if controllers == '':
+            fallback = path
+        elif 'memory' in controllers.split(','):
+            return path
+    return fallback
+
+
+class MiniCgroupReader(CgroupStatsReader):
+    """CgroupStatsReader for mini containers, located by cgroup path rather than Docker ID"""
+
+    def __init__(self, root=CGROUP_ROOT, cpu_count=None):
+        super().__init__(root, cpu_count)
+        self.paths = {}  # container id -> cgroup path relative to the hierarchy root
+
+    def _relative_paths(self, container_id):
+        path = self.paths.get(container_id)
+        return (path.lstrip('/'),) if path else ()
+
+
+class MiniStatsEngine:
+    """Sample every running mini container in one non-blocking pass
+
+    A container's usage is that of its runtime wrapper plus the whole
+    descendant tree (the namespaced workload under it). Each sample() lists
+    processes once to build the parent -> children map, reads CPU times and
+    RSS through psutil.Process handles kept across passes, and derives CPU%
+    from the change in the tree's total CPU time since the previous pass.
+    The total includes time of reaped children, so short-lived processes
+    are counted. When a container's processes sit in a cgroup of their own
+    (not the server's, not the hierarchy root), its cgroup files are read
+    instead. CPU% is normalized to the whole host, like the Docker path.
+    """
+
+    def __init__(self, cgroup_root=CGROUP_ROOT, cpu_count=None):
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self.cgroups = MiniCgroupReader(cgroup_root, self.cpu_count)
+        self._own_cgroup = _read_cgroup_path(os.getpid())
+        self._handles = {}     # pid -> psutil.Process
+        self._previous = {}    # container id -> (monotonic time, tree CPU seconds)
+        self._sources = {}     # container id -> (root pid, 'tree' or 'cgroup', final)
+        self.last_pass_ms = 0.0
+        self.processes_seen = 0
+
+    def _handle(self, pid):
+        handle = self._handles.get(pid)
+        if handle is None:
+            handle = self._handles[pid] = psutil.Process(pid)
+        return handle
+
+    def _children_map(self):
+        children = {}
+        for process in psutil.process_iter(['ppid']):
+            ppid = process.info['ppid']
+            if ppid:
+                children.setdefault(ppid, []).append(process.pid)
+        return children
+
+    @staticmethod
+    def _tree(root, children):
+        pids = [root]
+        for pid in pids:
+            pids.extend(children.get(pid, ()))
+        return pids
+
+    def _source(self, container_id, root, tree):
+        """'cgroup' if the workload has a dedicated cgroup, else 'tree'"""
+        cached = self._sources.get(container_id)
+        if cached and cached[0] == root and cached[2]:
+            return cached[1]
+        # Check the workload, not only the wrapper: the runtime may move it
+        paths = {_read_cgroup_path(pid) for pid in tree[:2]}
+        path = paths.pop() if len(paths) == 1 else None
+        if path and path != '/' and path != self._own_cgroup:
+            self.cgroups.paths[container_id] = path
+            source = 'cgroup'
+        else:
+            self.cgroups.paths.pop(container_id, None)
+            source = 'tree'
+        # Until the workload has been forked only the wrapper could be checked
+        self._sources[container_id] = (root, source, len(tree) > 1)
+        return source
+
+    def _sample_tree(self, container_id, tree, now):
+        cpu_seconds = 0.0
+        rss = 0
+        alive = 0
+        for pid in tree:
+            try:
+                handle = self._handle(pid)
+                with handle.oneshot():
+                    times = handle.cpu_times()
+                    memory = handle.memory_info()
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                self._handles.pop(pid, None)
+                continue
+            cpu_seconds += times.user + times.system + times.children_user + times.children_system
+            rss += memory.rss
+            alive += 1
+        cpu = 0.0
+        previous = self._previous.get(container_id)
+        if previous and now > previous[0]:
+            cpu = max(0.0, (cpu_seconds - previous[1]) / ((now - previous[0]) * self.cpu_count) * 100.0)
+        self._previous[container_id] = (now, cpu_seconds)
+        return {'cpu': cpu, 'memory': rss / (1024 * 1024), 'pids': alive, 'source': 'tree'}
+
+    def sample(self, roots):
+        """Sample {container id: runtime pid}, returning {container id: stats}
+
+        Containers whose runtime process no longer exists are left out.
+        """
+        started = time.perf_counter()
+        children = self._children_map() if roots else {}
+        now = time.monotonic()
+        results = {}
+        by_cgroup = {}  # container id -> process tree
+        seen = set()
+        for container_id, root in roots.items():
+            if not psutil.pid_exists(root):
+                continue
+            tree = self._tree(root, children)
+            seen.update(tree)
+            if self._source(container_id, root, tree) == 'cgroup':
+                by_cgroup[container_id] = tree
+            else:
+                results[container_id] = self._sample_tree(container_id, tree, now)
+
+        if by_cgroup:
+            samples = self.cgroups.collect(list(by_cgroup))
+            for container_id, tree in by_cgroup.items():
+                sample = samples.get(container_id)
+                if sample is None:
+                    # Its cgroup files cannot be read (e.g. cpuacct not split
+                    # out on a v1 host); use the process tree from now on
+                    self.cgroups.paths.pop(container_id, None)
+                    self._sources[container_id] = (roots[container_id], 'tree', True)
+                    results[container_id] = self._sample_tree(container_id, tree, now)
+                    continue
+                results[container_id] = {
+                    'cpu': sample['cpu'],
+                    'memory': sample['memory'],
+                    'pids': sample['pids'] if sample['pids'] is not None else len(tree),
+                    'source': 'cgroup',
+                }
+
+        # Forget processes and containers that are gone
+        for pid in list(self._handles):
+            if pid not in seen:
+                del self._handles[pid]
+        for state in (self._previous, self._sources):
+            for container_id in list(state):
+                if container_id not in roots:
+                    del state[container_id]
+        self.processes_seen = len(seen)
+        self.last_pass_ms = round((time.perf_counter() - started) * 1000, 3)
+        return results
+
+    def stats(self):
+        return {
+            'containers': len(self._sources),
+            'cgroupContainers': sum(1 for _, source, _ in self._sources.values() if source == 'cgroup'),
+            'processes': self.processes_seen,
+            'cachedHandles': len(self._handles),
+            'lastPassMs': self.last_pass_ms,
+        }
+
+    def close(self):
+        self.cgroups.close()
@@ -0,0 +1,219 @@
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+FLUSH_INTERVAL = 0.2  # seconds a write may wait to be batched with others
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS containers (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    image TEXT,
+    status TEXT NOT NULL,
+    created REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS containers_name ON containers (name);
+CREATE INDEX IF NOT EXISTS containers_status ON containers (status);
+CREATE INDEX IF NOT EXISTS containers_image ON containers (image);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class MetadataStore:
+    """Mini Docker container metadata in one SQLite database (WAL mode)
+
+    Writes are coalesced per container and committed together in a single
+    transaction by a background flusher every FLUSH_INTERVAL seconds, so a
+    burst of status changes costs one commit. Name, status and image are
+    indexed columns next to the full metadata JSON; startup is one SELECT
+    however many containers there are. Readers in other processes (the
+    out-of-process collector) see each batch atomically.
+
+    A read_only store opens the database with mode=ro and refuses writes;
+    it is for those readers, so they can never overwrite the server's rows.
+    """
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL, read_only=False):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._pending = {}  # container id -> metadata, or None to delete
+        self._wake = threading.Event()
+        self._closed = False
+        self._flusher = None
+        self.flushes = 0
+        self.rows_written = 0
+        self.last_flush_ms = 0.0
+        if read_only:
+            self._db = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True,
+                                       check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA busy_timeout=5000")
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(SCHEMA)
+        self._db.execute("INSERT OR IGNORE INTO store_meta (key, value) VALUES ('schema_version', ?)",
+                         (str(SCHEMA_VERSION),))
+
+    def _meta(self, key):
+        row = self._db.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def migrate_directories(self, root):
+        """Import <root>/<id>/metadata.json files, once
+
+        Returns the number of containers imported. The JSON files are left
+        in place but no longer read or written.
+        """
+        with self._lock:
+            if self._meta('json_migrated'):
+                return 0
+            rows = []
+            if os.path.isdir(root):
+                for container_id in os.listdir(root):
+                    metadata_path = os.path.join(root, container_id, "metadata.json")
+                    try:
+                        with open(metadata_path, 'r') as f:
+                            metadata = json.load(f)
+                    except (FileNotFoundError, NotADirectoryError):
+                        continue  # e.g. the database files themselves
+                    except (OSError, ValueError) as e:
+                        print(f"Error migrating container {container_id}: {e}")
+                        continue
+                    rows.append(self._row(metadata.get('id', container_id), metadata))
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Rows already in the database are newer than the JSON files
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO containers (id, name, image, status, created, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._db.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES ('json_migrated', ?)",
+                                 (str(time.time()),))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        if rows:
+            print(f"Migrated {len(rows)} Mini Docker containers from metadata.json files")
+        return len(rows)
+
+    @staticmethod
+    def _row(container_id, metadata):
+        return (
+            container_id,
+            metadata.get('name') or container_id,
+            metadata.get('image'),
+            metadata.get('status') or 'created',
+            metadata.get('created'),
+            json.dumps(metadata),
+        )
+
+    def load(self):
+        """Every container's metadata: {id: metadata}"""
+        self.flush()
+        with self._lock:
+            rows = self._db.execute("SELECT id, data FROM containers").fetchall()
+        return {container_id: json.loads(data) for container_id, data in rows}
+
+    def find(self, name=None, status=None, image=None):
+        """IDs of containers matching all given fields, via the indexes"""
+        clauses = []
+        params = []
+        for column, value in (('name', name), ('status', status), ('image', image)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        query = "SELECT id FROM containers"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        self.flush()
+        with self._lock:
+            return [row[0] for row in self._db.execute(query + " ORDER BY created", params)]
+
+    def put(self, container_id, metadata):
+        """Queue a container's metadata to be written with the next batch"""
+        if self.read_only:
+            raise PermissionError(f"{self.path} is open read-only")
+        with self._lock:
+            # Copy now: callers keep mutating the live dict
+            self._pending[container_id] = dict(metadata)
+            if self._flusher is None and not self._closed:
+                self._flusher = threading.Thread(target=self._run, name='mini-store-flush', daemon=True)
+                self._flusher.start()
+        self._wake.set()
+
+    def delete(self, container_id):
+        if self.read_only:
+            raise PermissionError(f"{self.path} is open read-only")
+        with self._lock:
+            self._pending[container_id] = None
+        self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Error writing Mini Docker metadata: {e}")
+
+    def flush(self):
+        """Write all queued changes in one transaction"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            started = time.perf_counter()
+            upserts = [self._row(cid, metadata) for cid, metadata in pending.items() if metadata is not None]
+            deletes = [(cid,) for cid, metadata in pending.items() if metadata is None]
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO containers (id, name, image, status, created, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    upserts
+                )
+                self._db.executemany("DELETE FROM containers WHERE id = ?", deletes)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                # Keep the batch, minus anything queued again since
+                for cid, metadata in pending.items():
+                    self._pending.setdefault(cid, metadata)
+                raise
+            self.flushes += 1
+            self.rows_written += len(pending)
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 3)
+            return len(pending)
+
+    def stats(self):
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM containers").fetchone()[0]
+            return {
+                'containers': count,
+                'pending': len(self._pending),
+                'flushes': self.flushes,
+                'rowsWritten': self.rows_written,
+                'lastFlushMs': self.last_flush_ms,
+            }
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self.flush()
+        with self._lock:
+            self._db.close()
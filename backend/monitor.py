@@ -1,25 +1,188 @@
 
 import psutil
-import subprocess
 import json
 import os
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+from gpu import create_gpu_backend, container_id_for_pid
+
+PROC_STAT = '/proc/stat'
+
+
+@dataclass
+class SystemSnapshot:
+    """Host metrics gathered in a single sampling pass"""
+    timestamp: float
+    cpu_percent: float
+    per_core: List[float]
+    memory: Dict
+    disk: Dict
+    load_avg: List[float]
+    network: Dict
+    disk_io: Dict
+    collection_ms: float
+    gpu: Optional[Dict] = field(default=None)
+    
+    def to_dict(self):
+        return asdict(self)
+
+
+class ProcSampler:
+    """Non-blocking host sampler
+    
+    Each sample() reads /proc/stat once and derives aggregate and per-core
+    CPU utilisation from the jiffy deltas against the previous call, instead
+    of sleeping inside psutil.cpu_percent(interval=...). Memory, disk usage,
+    load average and network/disk I/O counters (as rates since the previous
+    call) are gathered in the same pass.
+    """
+    
+    def __init__(self, proc_stat=PROC_STAT, disk_path='/'):
+        self.proc_stat = proc_stat
+        self.disk_path = disk_path
+        self._prev_cpu = None
+        self._prev_io = None
+        self.sample()  # prime the deltas
+    
+    def _read_cpu_times(self):
+        """Return [(busy, total)] for the aggregate CPU followed by each core"""
+        try:
+            with open(self.proc_stat, 'r') as f:
+                lines = [line for line in f if line.startswith('cpu')]
+            times = []
+            for line in lines:
+                values = [int(v) for v in line.split()[1:]]
+                # user nice system idle iowait irq softirq steal (guest time is already in user)
+                total = sum(values[:8])
+                idle = values[3] + (values[4] if len(values) > 4 else 0)
+                times.append((total - idle, total))
+            return times
+        except (OSError, ValueError, IndexError):
+            # No procfs (e.g. Windows or macOS): psutil's own counters work everywhere
+            times = []
+            for t in [psutil.cpu_times()] + psutil.cpu_times(percpu=True):
+                total = sum(t)
+                idle = t.idle + getattr(t, 'iowait', 0)
+                times.append((total - idle, total))
+            return times
+    
+    @staticmethod
+    def _percent(current, previous):
+        busy = current[0] - previous[0]
+        total = current[1] - previous[1]
+        if total <= 0:
+            return 0.0
+        return round(max(0.0, min(100.0, busy / total * 100.0)), 1)
+    
+    def _io_counters(self):
+        net = psutil.net_io_counters()
+        try:
+            disk = psutil.disk_io_counters()
+        except (RuntimeError, OSError):
+            disk = None
+        return {
+            'net_sent': net.bytes_sent if net else 0,
+            'net_recv': net.bytes_recv if net else 0,
+            'disk_read': disk.read_bytes if disk else 0,
+            'disk_write': disk.write_bytes if disk else 0,
+        }
+    
+    def sample(self):
+        """Take one snapshot of the host"""
+        started = time.perf_counter()
+        now = time.time()
+        
+        cpu_times = self._read_cpu_times()
+        if self._prev_cpu and len(self._prev_cpu) == len(cpu_times):
+            percents = [self._percent(c, p) for c, p in zip(cpu_times, self._prev_cpu)]
+        else:
+            percents = [0.0] * len(cpu_times)
+        self._prev_cpu = cpu_times
+        
+        io = self._io_counters()
+        rates = {name: 0.0 for name in io}
+        if self._prev_io:
+            elapsed = now - self._prev_io[0]
+            if elapsed > 0:
+                rates = {name: max(0, io[name] - self._prev_io[1][name]) / elapsed for name in io}
+        self._prev_io = (now, io)
+        
+        mem = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        try:
+            load_avg = [round(v, 2) for v in os.getloadavg()]
+        except (AttributeError, OSError):
+            load_avg = []
+        
+        return SystemSnapshot(
+            timestamp=now,
+            cpu_percent=percents[0],
+            per_core=percents[1:],
+            memory={
+                'total': mem.total // (1024 * 1024),  # MB
+                'used': mem.used // (1024 * 1024),    # MB
+                'percent': mem.percent
+            },
+            disk={
+                'total': disk.total // (1024 * 1024),  # MB
+                'used': disk.used // (1024 * 1024),    # MB
+                'percent': disk.percent
+            },
+            load_avg=load_avg,
+            network={
+                'bytes_sent': io['net_sent'],
+                'bytes_recv': io['net_recv'],
+                'sent_per_sec': round(rates['net_sent']),
+                'recv_per_sec': round(rates['net_recv'])
+            },
+            disk_io={
+                'read_bytes': io['disk_read'],
+                'write_bytes': io['disk_write'],
+                'read_per_sec': round(rates['disk_read']),
+                'write_per_sec': round(rates['disk_write'])
+            },
+            collection_ms=round((time.perf_counter() - started) * 1000, 3)
+        )
+
 
 class SystemMonitor:
     """Monitor system resources (CPU, Memory, Disk, GPU)"""
     
-    def __init__(self):
-        self.has_gpu = self._check_gpu_available()
+    def __init__(self, sampler=True, gpu_backend=None):
+        # GPU samples come from a long-running backend (NVML or a streaming
+        # nvidia-smi) rather than a fork per call
+        self.gpu = create_gpu_backend(gpu_backend)
+        self.has_gpu = self.gpu is not None
+        # With a sampler, CPU figures come from /proc/stat deltas between
+        # calls instead of blocking psutil.cpu_percent(interval=0.1) calls
+        self.sampler = ProcSampler() if sampler else None
+        self.last_snapshot = None
     
-    def _check_gpu_available(self):
-        """Check if NVIDIA GPU is available"""
-        try:
-            subprocess.check_output(['nvidia-smi'])
-            return True
-        except (subprocess.SubprocessError, FileNotFoundError):
-            return False
+    def get_snapshot(self):
+        """Take a single-pass snapshot of the host (sampler mode only)"""
+        snapshot = self.sampler.sample()
+        if self.has_gpu:
+            gpu_stats = self.get_gpu_stats()
+            # A stale reading is left out rather than recorded as current
+            if gpu_stats['available'] and not gpu_stats['stale']:
+                snapshot.gpu = gpu_stats
+        self.last_snapshot = snapshot
+        return snapshot
     
     def get_cpu_stats(self):
         """Get CPU usage percentage"""
+        if self.sampler:
+            # Reuse the monitoring loop's snapshot rather than shortening its delta window
+            snapshot = self.last_snapshot
+            if snapshot is None or time.time() - snapshot.timestamp > 1.0:
+                snapshot = self.sampler.sample()
+            return {
+                'percent': snapshot.cpu_percent,
+                'cores': len(snapshot.per_core),
+                'per_core': snapshot.per_core
+            }
         return {
             'percent': psutil.cpu_percent(interval=0.1),
             'cores': psutil.cpu_count(),
@@ -45,28 +208,61 @@ class SystemMonitor:
         }
     
     def get_gpu_stats(self):
-        """Get NVIDIA GPU statistics if available"""
+        """Get NVIDIA GPU statistics if available
+        
+        The top-level figures are for the first GPU; every GPU is listed
+        under 'gpus'. 'stale' is set when the backend has stopped updating
+        them.
+        """
         if not self.has_gpu:
             return {'available': False}
-            
-        try:
-            result = subprocess.check_output(['nvidia-smi', '--query-gpu=utilization.gpu,memory.used,memory.total', '--format=csv,noheader,nounits'])
-            utilization, mem_used, mem_total = result.decode('utf-8').strip().split(', ')
-            
-            return {
-                'available': True,
-                'percent': float(utilization),
-                'memory': {
-                    'used': float(mem_used),
-                    'total': float(mem_total),
-                    'percent': (float(mem_used) / float(mem_total)) * 100 if float(mem_total) > 0 else 0
-                }
-            }
-        except subprocess.SubprocessError:
+        
+        sample = self.gpu.latest()
+        if not sample['gpus']:
             return {'available': False}
+        
+        first = sample['gpus'][0]
+        return {
+            'available': True,
+            'percent': first['percent'],
+            'memory': first['memory'],
+            'gpus': sample['gpus'],
+            'backend': self.gpu.name,
+            'stale': sample['stale']
+        }
+    
+    def get_gpu_processes(self):
+        """Get per-process GPU memory, attributed to Docker containers where possible"""
+        if not self.has_gpu:
+            return {'available': False, 'processes': [], 'containers': {}}
+        
+        processes = []
+        containers = {}
+        sample = self.gpu.latest()
+        for process in sample['processes']:
+            container_id = container_id_for_pid(process['pid'])
+            processes.append(dict(process, container=container_id))
+            if container_id:
+                containers[container_id] = containers.get(container_id, 0) + process['memory']
+        return {'available': True, 'processes': processes, 'containers': containers, 'stale': sample['stale']}
     
     def get_stats(self):
         """Get all system stats"""
+        if self.sampler:
+            snapshot = self.get_snapshot()
+            stats = {
+                'cpu': snapshot.cpu_percent,
+                'memory': snapshot.memory,
+                'disk': snapshot.disk,
+                'load': snapshot.load_avg,
+                'network': snapshot.network,
+                'diskIO': snapshot.disk_io,
+                'collectionMs': snapshot.collection_ms,
+            }
+            if snapshot.gpu:
+                stats['gpu'] = snapshot.gpu['percent']
+            return stats
+        
         stats = {
             'cpu': self.get_cpu_stats()['percent'],
             'memory': self.get_memory_stats(),
@@ -75,7 +271,7 @@ class SystemMonitor:
         
         if self.has_gpu:
             gpu_stats = self.get_gpu_stats()
-            if gpu_stats['available']:
+            if gpu_stats['available'] and not gpu_stats['stale']:
                 stats['gpu'] = gpu_stats['percent']
         
         return stats
@@ -0,0 +1,164 @@
+
+import json
+import threading
+
+# Bump when the shape of snapshot/patch messages changes
+PROTOCOL_VERSION = 1
+
+# No payload encoded yet (None is a payload: a container that is gone)
+_NOTHING = object()
+
+
+def _payload_size(payload):
+    """Approximate wire size of a payload as compact JSON"""
+    return len(json.dumps(payload, separators=(',', ':'), default=str))
+
+
+class DeltaEncoder:
+    """Turn successive full payloads for one topic into snapshot + patch messages
+
+    Lists of dicts are keyed by `key` and diffed item by item (added items in
+    full, removed items by key, changed items by field). Dicts are diffed by
+    top-level field. Every patch carries a sequence number so clients can
+    detect a missed message and ask for a new snapshot.
+    """
+
+    def __init__(self, topic, key='id'):
+        self.topic = topic
+        self.key = key
+        self.seq = 0
+        self._previous = _NOTHING
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """Full state message for the latest payload"""
+        with self._lock:
+            return {
+                'v': PROTOCOL_VERSION,
+                'topic': self.topic,
+                'seq': self.seq,
+                'data': None if self._previous is _NOTHING else self._previous,
+            }
+
+    def encode(self, payload):
+        """Record a new payload, returning a patch message or None if unchanged"""
+        # Keep copies: producers may mutate the same dicts in place next tick
+        if isinstance(payload, list):
+            payload = [dict(item) for item in payload]
+        elif isinstance(payload, dict):
+            payload = dict(payload)
+        with self._lock:
+            previous = self._previous
+            self._previous = payload
+            if previous is _NOTHING or type(previous) is not type(payload):
+                diff = {'replace': payload}
+            elif isinstance(payload, list):
+                diff = self._diff_list(previous, payload)
+            elif isinstance(payload, dict):
+                diff = self._diff_fields(previous, payload)
+            else:
+                diff = {'replace': payload} if payload != previous else {}
+
+            if not diff:
+                return None
+            self.seq += 1
+            return dict(diff, v=PROTOCOL_VERSION, topic=self.topic, seq=self.seq)
+
+    def _diff_fields(self, old, new):
+        changed = {k: v for k, v in new.items() if k not in old or old[k] != v}
+        removed = [k for k in old if k not in new]
+        diff = {}
+        if changed:
+            diff['changed'] = changed
+        if removed:
+            diff['removed'] = removed
+        return diff
+
+    def _diff_list(self, old, new):
+        old_items = {item[self.key]: item for item in old}
+        new_items = {item[self.key]: item for item in new}
+
+        added = [item for item in new if item[self.key] not in old_items]
+        removed = [k for k in old_items if k not in new_items]
+        changed = {}
+        for k, item in new_items.items():
+            if k in old_items and old_items[k] != item:
+                fields = self._diff_fields(old_items[k], item)
+                if fields:
+                    changed[k] = fields
+        # Item order is part of the payload
+        order_changed = [k for k in new_items if k in old_items] != [k for k in old_items if k in new_items]
+
+        diff = {}
+        if added:
+            diff['added'] = added
+        if removed:
+            diff['removed'] = removed
+        if changed:
+            diff['changed'] = changed
+        if order_changed or added:
+            diff['order'] = list(new_items)
+        return diff
+
+
+class PushStats:
+    """Count emitted bytes and messages per event, against full-payload bytes
+
+    Serializing the full payload just to count it would cost as much as
+    the legacy protocol saved, so its size is measured on one call in
+    FULL_SIZE_EVERY per event and reused in between: fullBytes is an
+    estimate that follows payload growth within that many ticks.
+    """
+
+    FULL_SIZE_EVERY = 10
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = {}
+        self._full_sizes = {}  # event -> (last measured full size, calls since)
+
+    def _full_size(self, event, full_payload):
+        with self._lock:
+            size, age = self._full_sizes.get(event, (None, 0))
+            if size is not None and age < self.FULL_SIZE_EVERY:
+                self._full_sizes[event] = (size, age + 1)
+                return size
+        size = _payload_size(full_payload)
+        with self._lock:
+            self._full_sizes[event] = (size, 1)
+        return size
+
+    def record(self, event, payload, full_payload=None):
+        """Record an emit; `full_payload` is what the legacy protocol would have sent"""
+        sent = _payload_size(payload)
+        full = self._full_size(event, full_payload) if full_payload is not None else sent
+        with self._lock:
+            counters = self._events.setdefault(event, {'emits': 0, 'bytes': 0, 'fullBytes': 0})
+            counters['emits'] += 1
+            counters['bytes'] += sent
+            counters['fullBytes'] += full
+        return sent
+
+    def record_skipped(self, event, full_payload):
+        """Record a tick where nothing changed and no message was sent"""
+        full = self._full_size(event, full_payload)
+        with self._lock:
+            counters = self._events.setdefault(event, {'emits': 0, 'bytes': 0, 'fullBytes': 0})
+            counters['fullBytes'] += full
+
+    def summary(self):
+        with self._lock:
+            events = {name: dict(counters) for name, counters in self._events.items()}
+        total_bytes = sum(c['bytes'] for c in events.values())
+        total_full = sum(c['fullBytes'] for c in events.values())
+        for counters in events.values():
+            counters['savedPercent'] = (
+                round((1 - counters['bytes'] / counters['fullBytes']) * 100, 1) if counters['fullBytes'] else 0.0
+            )
+        return {
+            'protocolVersion': PROTOCOL_VERSION,
+            'events': events,
+            'bytes': total_bytes,
+            'fullBytes': total_full,
+            'savedPercent': round((1 - total_bytes / total_full) * 100, 1) if total_full else 0.0,
+        }
@@ -1,27 +1,75 @@
 
-from flask import Flask, jsonify, request
-from flask_socketio import SocketIO
+from flask import Flask, Response, g, jsonify, request, stream_with_context
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS
+import atexit
 import eventlet
 import json
+import os
 import time
 import threading
 import platform
 
 from monitor import SystemMonitor
-from container_utils import ContainerManager
+from container_utils import ContainerManager, format_log_line
+from log_stream import INDEXER, LogStreamHub
+from log_search import LogIndex
+from push_protocol import DeltaEncoder, PushStats
+from history import HistoryRecorder, MetricStore, parse_time, rebucket
+from tsdb import TimeSeriesStore
+from bulk import BULK_WORKERS
+from volume_scanner import VolumeScanner
+from collector import CollectorProcess, TickStats
+import metrics
+from metrics import Counter, Gauge, Histogram, SIZE_BUCKETS
+from subscriptions import SubscriptionRegistry, DEFAULT_RATE, MAX_RATE, stream_name, ticks_per_emit
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
 
+# Server self-instrumentation, served at /api/metrics
+HTTP_REQUEST_SECONDS = Histogram('containeros_http_request_duration_seconds', 'REST handler latency',
+                                 labels=('method', 'route', 'status'))
+MONITOR_TICK_SECONDS = Histogram('containeros_monitor_tick_duration_seconds', 'Monitoring loop tick duration')
+MONITOR_MISSED_TICKS = Counter('containeros_monitor_missed_ticks_total', 'Monitoring ticks skipped by overruns')
+EMIT_BYTES = Histogram('containeros_emit_payload_bytes', 'Size of pushed WebSocket messages',
+                       labels=('event',), buckets=SIZE_BUCKETS)
+CONNECTED_CLIENTS = Gauge('containeros_connected_clients', 'Connected WebSocket clients')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=request.method,
+                                     route=route, status=response.status_code)
+    return response
+
 # Check if running on Windows
 is_windows = platform.system() == "Windows"
 
 # Initialize monitoring and container management
 system_monitor = SystemMonitor()
-container_manager = ContainerManager()
+# Background volume disk usage scanner (VOLUME_SIZE_SOURCE=df uses the daemon's df() instead)
+volume_scanner = None
+if os.environ.get('VOLUME_SIZE_SOURCE', 'scan') == 'scan':
+    volume_scanner = VolumeScanner(
+        os.environ.get('VOLUME_SCAN_STATE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'volume_scan.json')),
+        interval=float(os.environ.get('VOLUME_SCAN_INTERVAL', 300))
+    ).start()
+
+container_manager = ContainerManager(
+    stats_mode=os.environ.get('DOCKER_STATS_MODE', 'poll'),
+    cgroup_root=os.environ.get('CGROUP_ROOT', '/sys/fs/cgroup'),
+    pool_size=int(os.environ.get('DOCKER_POOL_SIZE', 10)),
+    volume_scanner=volume_scanner
+)
 
 # Initialize mini_docker_manager only on Linux
 mini_docker_manager = None
@@ -50,61 +98,385 @@ else:
         def delete_container(self, container_id):
             return {"success": False, "message": "Mini Docker runtime not available on Windows"}
         
-        def get_container_logs(self, container_id):
+        def get_container_logs(self, container_id, **kwargs):
             return {"logs": "", "message": "Mini Docker runtime not available on Windows"}
+        
+        def stop_container_async(self, container_id):
+            return self.stop_container(container_id)
+        
+        def delete_container_async(self, container_id):
+            return self.delete_container(container_id)
+        
+        def drain_events(self):
+            return []
     
     mini_docker_manager = DummyMiniDockerManager()
 
-# Store historical data (last 60 seconds, 1 sample per second)
-history_buffer = {
-    'cpu': [],
-    'memory': [],
-    'gpu': [],
-    'timestamps': []
-}
-
-def update_history(stats):
-    """Update history buffer with latest stats"""
-    current_time = time.strftime('%H:%M:%S')
-    
-    history_buffer['timestamps'].append(current_time)
-    history_buffer['cpu'].append(stats['cpu'])
-    history_buffer['memory'].append(stats['memory']['percent'])
-    if 'gpu' in stats:
-        history_buffer['gpu'].append(stats['gpu'])
+# Historical metrics at 1s/10s/1m resolution, keyed by metric and container
+metrics_history = MetricStore()
+
+# Persistent copy of the same samples, flushed to disk in batches
+metrics_store = TimeSeriesStore(
+    os.environ.get('METRICS_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metrics_data')),
+    retention=float(os.environ.get('METRICS_RETENTION_DAYS', 7)) * 24 * 3600
+)
+
+# Writes every sample to both of the above
+history_recorder = HistoryRecorder(metrics_history, metrics_store)
+
+# Delta push protocol: a client gets a snapshot when it subscribes to a
+# stream, then sequence-numbered patches containing only what changed.
+# Every (stream, rate) pair is a Socket.IO room with its own encoder.
+subscriptions = SubscriptionRegistry()
+push_encoders = {}
+push_stats = PushStats()
+
+def get_encoder(room, stream):
+    encoder = push_encoders.get(room)
+    if encoder is None:
+        encoder = push_encoders[room] = DeltaEncoder(stream)
+    return encoder
+
+def push_room(room, stream, payload):
+    """Emit a patch to a room if its payload changed since the last emit"""
+    patch = get_encoder(room, stream).encode(payload)
+    if patch is None:
+        push_stats.record_skipped(f"{room}.patch", payload)
+        return
+    EMIT_BYTES.observe(push_stats.record(f"{room}.patch", patch, payload), event='patch')
+    socketio.emit('patch', patch, to=room)
+
+def send_snapshot(room, stream):
+    """Send the current snapshot for a room to the requesting client"""
+    snapshot = get_encoder(room, stream).snapshot()
+    EMIT_BYTES.observe(push_stats.record(f"{room}.snapshot", snapshot), event='snapshot')
+    emit('snapshot', snapshot)
+
+def release_room(room):
+    """Drop a room's encoder once nobody is left in it"""
+    if room not in subscriptions.active_rooms():
+        push_encoders.pop(room, None)
+
+@socketio.on('subscribe')
+def handle_subscribe(data=None):
+    data = data or {}
+    topic = data.get('topic')
+    container = data.get('container')
+    try:
+        old_room, room = subscriptions.subscribe(request.sid, topic, data.get('rate', DEFAULT_RATE), container)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    if old_room:
+        leave_room(old_room)
+        release_room(old_room)
+    join_room(room)
+    send_snapshot(room, stream_name(topic, container))
+    return {"success": True, "room": room}
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data=None):
+    data = data or {}
+    room = subscriptions.unsubscribe(request.sid, data.get('topic'), data.get('container'))
+    if room:
+        leave_room(room)
+        release_room(room)
+    return {"success": room is not None}
+
+@socketio.on('resnapshot')
+def handle_resnapshot(data=None):
+    # Sent by clients that detected a sequence gap
+    stream = (data or {}).get('topic')
+    for room in subscriptions.rooms_for(request.sid, stream):
+        send_snapshot(room, room.rsplit('@', 1)[0])
+
+@socketio.on('connect')
+def handle_connect():
+    CONNECTED_CLIENTS.inc()
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    CONNECTED_CLIENTS.dec()
+    for room in subscriptions.drop(request.sid):
+        release_room(room)
+    log_hub.drop(request.sid)
+
+# Follow-mode logs: one shared daemon stream per watched container, pushed
+# to the container's room in batched frames
+def is_mini_container(container_id):
+    return bool(mini_docker_manager and getattr(mini_docker_manager, 'has_container', None)
+                and mini_docker_manager.has_container(container_id))
+
+def open_log_stream(container_id):
+    """Open a follow stream for a container of either runtime"""
+    if is_mini_container(container_id):
+        return mini_docker_manager.open_log_stream(container_id)
+    return container_manager.open_log_stream(container_id)
+
+# Full-text search index over Mini Docker output and the Docker logs being followed
+log_index = LogIndex(
+    os.environ.get('LOG_INDEX_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'log_index'))
+)
+atexit.register(log_index.flush)
+# Following every running Docker container costs a daemon stream each, so
+# by default only containers someone is watching are indexed
+LOG_INDEX_ALL = os.environ.get('LOG_INDEX_ALL', '0') == '1'
+LOG_INDEX_SYNC_INTERVAL = 10
+
+def index_stream_lines(container_id, name, lines, formatted):
+    """Feed lines from the shared Docker log streams into the search index"""
+    if is_mini_container(container_id):
+        return  # mini output is indexed as it is written
+    for raw, entry in zip(lines, formatted):
+        message = raw.split(' ', 1)[1] if entry.get('epoch') is not None else raw
+        log_index.ingest(container_id, name, message, ts=entry.get('epoch'), level=entry['type'])
+
+def index_mini_line(container_id, name, image, stream, message):
+    log_index.ingest(container_id, name, message, image=image)
+
+if hasattr(mini_docker_manager, 'log_listener'):
+    mini_docker_manager.log_listener = index_mini_line
+
+log_hub = LogStreamHub(open_log_stream, format_log_line, listener=index_stream_lines)
+
+def log_index_loop():
+    """Keep a shared log stream open for every running Docker container"""
+    while True:
+        running = set(container_manager.running_container_ids())
+        for container_id in running:
+            # No-op while the stream is open; restarts it after the container restarts
+            log_hub.watch(INDEXER, container_id)
+        for container_id in log_hub.watching(INDEXER) - running:
+            log_hub.unwatch(INDEXER, container_id)
+        time.sleep(LOG_INDEX_SYNC_INTERVAL)
+
+LOG_FLUSH_INTERVAL = 0.25
+
+@socketio.on('watch_logs')
+def handle_watch_logs(data=None):
+    container_id = (data or {}).get('container')
+    if not container_id:
+        return {"success": False, "error": "container is required"}
+    join_room(f"logs:{container_id}")
+    log_hub.watch(request.sid, container_id)
+    return {"success": True}
+
+@socketio.on('unwatch_logs')
+def handle_unwatch_logs(data=None):
+    container_id = (data or {}).get('container')
+    leave_room(f"logs:{container_id}")
+    log_hub.unwatch(request.sid, container_id)
+    return {"success": True}
+
+def log_push_loop():
+    """Emit batched log frames to the rooms watching each container"""
+    while True:
+        for frame in log_hub.drain():
+            socketio.emit('container_logs', frame, to=f"logs:{frame['container']}")
+        socketio.sleep(LOG_FLUSH_INTERVAL)
+
+MINI_EVENT_INTERVAL = 0.05
+
+def mini_event_loop():
+    """Emit Mini Docker exits, completed stop/delete operations and image imports"""
+    while True:
+        for event, payload in mini_docker_manager.drain_events():
+            socketio.emit(event, payload)
+        socketio.sleep(MINI_EVENT_INTERVAL)
+
+def collect_topic(topic):
+    """Collect the current payload for a topic"""
+    if topic == 'system_stats':
+        return system_monitor.get_stats()
+    if topic == 'docker_containers':
+        return container_manager.list_containers_with_stats()
+    # Get mini containers if not on Windows
+    if mini_docker_manager:
+        mini_containers = mini_docker_manager.list_containers()
     else:
-        history_buffer['gpu'].append(0)
-        
-    # Keep only last 60 samples
-    if len(history_buffer['timestamps']) > 60:
-        history_buffer['timestamps'].pop(0)
-        history_buffer['cpu'].pop(0)
-        history_buffer['memory'].pop(0)
-        history_buffer['gpu'].pop(0)
+        mini_containers = {"containers": []}
+    if isinstance(mini_containers, dict):
+        mini_containers = mini_containers.get('containers', [])
+    return mini_containers
+
+# COLLECTOR_MODE=process samples topics in a separate collector process so
+# slow psutil and Docker calls never stall this event loop
+collector = CollectorProcess() if os.environ.get('COLLECTOR_MODE', 'inprocess') == 'process' else None
+monitor_tick_stats = TickStats(1.0 / MAX_RATE)
+# Collected once a second whether or not anyone subscribes, for the history
+HISTORY_TOPICS = ('system_stats', 'docker_containers', 'mini_containers')
+
+def gather_payloads(topics, rooms):
+    """Current payload of each topic, from the collector process or sampled here"""
+    if not collector:
+        return {topic: collect_topic(topic) for topic in topics}
+    # Sample each topic at the fastest rate anyone subscribes to it, and
+    # the history topics at least once a second
+    rates = {topic: 1.0 for topic in HISTORY_TOPICS}
+    for topic, _, rate in rooms.values():
+        rates[topic] = max(rates.get(topic, 0), rate)
+    collector.set_topics(rates)
+    payloads = {}
+    for topic in topics:
+        latest = collector.latest(topic)
+        if latest is not None:
+            payloads[topic] = latest[2]
+    return payloads
 
 def background_monitoring():
-    """Background thread to emit system stats every second"""
+    """Background thread that collects and emits subscribed topics
+    
+    The loop ticks at the fastest supported rate. On each tick it works out
+    which rooms are due, collects each topic they need once, and emits to
+    those rooms. Topics nobody subscribes to are never collected, except
+    the HISTORY_TOPICS once a second, so host and container history has
+    no gaps while nobody is watching.
+    """
+    tick_interval = 1.0 / MAX_RATE
+    history_every = ticks_per_emit(1.0)
+    tick = 0
     while True:
-        system_stats = system_monitor.get_stats()
-        docker_containers = container_manager.list_containers_with_stats()
-        
-        # Get mini containers if not on Windows
-        if mini_docker_manager:
-            mini_containers = mini_docker_manager.list_containers()
-        else:
-            mini_containers = {"containers": []}
+        started = time.time()
         
-        # Update history
-        update_history(system_stats)
+        try:
+            rooms = subscriptions.active_rooms()
+            due = {
+                room: info for room, info in rooms.items()
+                if tick % ticks_per_emit(info[2]) == 0
+            }
+            topics = {topic for topic, _, _ in due.values()}
+            if tick % history_every == 0:
+                topics.update(HISTORY_TOPICS)
+            payloads = gather_payloads(topics, rooms)
+            
+            # Update history
+            if tick % history_every == 0 and 'system_stats' in payloads:
+                history_recorder.record_host(payloads['system_stats'])
+                for topic in ('docker_containers', 'mini_containers'):
+                    if topic in payloads:
+                        history_recorder.record_containers(payloads[topic], topic)
+            
+            # Emit changes via WebSocket
+            for room, (topic, container, rate) in due.items():
+                if topic not in payloads:
+                    continue  # the collector process has not published it yet
+                payload = payloads[topic]
+                if container:
+                    payload = next((c for c in payload if c.get('id') == container), None)
+                push_room(room, stream_name(topic, container), payload)
+        except Exception as e:
+            # One bad sample must not end the loop and stop every push
+            print(f"Error in monitoring tick: {e}")
         
-        # Emit data via WebSocket
-        socketio.emit('system_stats', system_stats)
-        socketio.emit('docker_containers', docker_containers)
-        socketio.emit('mini_containers', mini_containers)
-        
-        eventlet.sleep(1)
+        elapsed = time.time() - started
+        MONITOR_MISSED_TICKS.inc(monitor_tick_stats.record(elapsed))
+        MONITOR_TICK_SECONDS.observe(elapsed)
+        tick += 1
+        eventlet.sleep(max(0, tick_interval - (time.time() - started)))
+
+@app.route('/api/collector/stats', methods=['GET'])
+def get_collector_stats():
+    """Monitoring loop timing, and the collector process's when it is used"""
+    return jsonify({
+        'mode': 'process' if collector else 'inprocess',
+        'loop': monitor_tick_stats.summary(),
+        'collector': collector.stats() if collector else None,
+    })
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Server metrics in the Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/push/stats', methods=['GET'])
+def get_push_stats():
+    """Bytes and emit counts for the WebSocket push protocol"""
+    return jsonify(dict(push_stats.summary(), subscribers=subscriptions.counts()))
+
+# ... keep existing code (API routes for CPU, memory, GPU, disk)
+
+def query_stored_history(metric, container, start, end, step):
+    """Answer a history query from the on-disk store"""
+    end = time.time() if end is None else end
+    start = end - 3600 if start is None else start
+    series = f"container/{container}" if container else 'host'
+    data = metrics_store.query(series, start, end)
+    if data is None or metric not in data['columns']:
+        return None
+    rows = [(ts, v, v, v) for ts, v in zip(data['t'], data['columns'][metric])]
+    if step:
+        rows = rebucket(rows, step)
+    return {
+        'metric': metric,
+        'container': container,
+        'step': step or 1,
+        'points': [
+            {'t': ts, 'avg': round(avg, 3), 'min': round(low, 3), 'max': round(high, 3)}
+            for ts, avg, low, high in rows
+        ],
+    }
+
+@app.route('/api/gpu/processes', methods=['GET'])
+def get_gpu_processes():
+    return jsonify(system_monitor.get_gpu_processes())
+
+@app.route('/api/history', methods=['GET'])
+def get_history():
+    metric = request.args.get('metric')
+    if not metric:
+        # Last 60 seconds of host metrics in the original list format
+        samples = {name: metrics_history.latest(name) for name in ('cpu', 'memory', 'gpu')}
+        return jsonify({
+            'timestamps': [time.strftime('%H:%M:%S', time.localtime(ts)) for ts, _ in samples['cpu']],
+            'cpu': [round(value, 1) for _, value in samples['cpu']],
+            'memory': [round(value, 1) for _, value in samples['memory']],
+            'gpu': [round(value, 1) for _, value in samples['gpu']],
+        })
+    
+    try:
+        end = parse_time(request.args.get('to'))
+        start = parse_time(request.args.get('from'))
+        step = request.args.get('step')
+        step = float(step) if step else None
+    except ValueError:
+        return jsonify({"error": "from, to and step must be numbers"}), 400
+    
+    container = request.args.get('container')
+    if request.args.get('source') == 'disk':
+        result = query_stored_history(metric, container, start, end, step)
+    else:
+        result = metrics_history.query(metric, container=container, start=start, end=end, step=step)
+    if result is None:
+        return jsonify({"error": "No history for this metric"}), 404
+    return jsonify(result)
+
+@app.route('/api/history/series', methods=['GET'])
+def get_history_series():
+    return jsonify({
+        'series': metrics_history.series(),
+        'bytes': metrics_history.nbytes(),
+        'disk': dict(metrics_store.stats(), series=metrics_store.series())
+    })
 
-# ... keep existing code (API routes for CPU, memory, GPU, disk, and history)
+@app.route('/api/logs/search', methods=['GET'])
+def search_logs():
+    try:
+        start = parse_time(request.args.get('from'))
+        end = parse_time(request.args.get('to'))
+        limit = min(int(request.args.get('limit', 100)), 1000)
+    except ValueError:
+        return jsonify({"error": "from, to and limit must be numbers"}), 400
+    return jsonify(log_index.search(
+        q=request.args.get('q'),
+        level=request.args.get('level'),
+        container=request.args.get('container'),
+        start=start,
+        end=end,
+        limit=limit
+    ))
+
+@app.route('/api/logs/index', methods=['GET'])
+def get_log_index_stats():
+    return jsonify(log_index.stats())
 
 # Docker container routes
 @app.route('/api/containers', methods=['GET'])
@@ -113,6 +485,9 @@ def get_containers():
     runtime = request.args.get('runtime', 'docker')
     
     if runtime == 'mini':
+        filters = {key: request.args[key] for key in ('name', 'status', 'image') if key in request.args}
+        if filters and hasattr(mini_docker_manager, 'find_containers'):
+            return jsonify(mini_docker_manager.find_containers(**filters))
         if mini_docker_manager:
             return jsonify(mini_docker_manager.list_containers())
         else:
@@ -120,6 +495,54 @@ def get_containers():
     else:
         return jsonify(container_manager.list_containers())
 
+@app.route('/api/mini/images', methods=['GET'])
+def list_mini_images():
+    if is_windows or not mini_docker_manager:
+        return jsonify({"images": [], "message": "Mini Docker runtime not available on this platform"})
+    return jsonify({"images": mini_docker_manager.images.list_images(), "store": mini_docker_manager.images.stats()})
+
+@app.route('/api/mini/images', methods=['POST'])
+def import_mini_image():
+    """Import a `docker save` archive, rootfs tarball or rootfs directory on the server"""
+    if is_windows or not mini_docker_manager:
+        return jsonify({"success": False, "message": "Mini Docker runtime not available on this platform"})
+    data = request.get_json() or {}
+    source = data.get('source')
+    if not source or not os.path.exists(source):
+        return jsonify({"success": False, "error": "source must be an existing archive or directory"}), 400
+    # Unpacking layers can take minutes: do it off the event loop
+    return jsonify(mini_docker_manager.import_image_async(source, data.get('name'))), 202
+
+@app.route('/api/mini/pool', methods=['GET'])
+def get_mini_pool_stats():
+    pool = getattr(mini_docker_manager, 'warm_pool', None)
+    if not pool:
+        return jsonify({"enabled": False})
+    return jsonify(dict(pool.stats(), enabled=True))
+
+@app.route('/api/containers/resync', methods=['POST'])
+def resync_containers():
+    return jsonify(container_manager.resync_inventory())
+
+@app.route('/api/docker/pool', methods=['GET'])
+def get_docker_pool_stats():
+    return jsonify(container_manager.pool_stats())
+
+@app.route('/api/volumes/scan', methods=['GET'])
+def get_volume_scan():
+    return jsonify(container_manager.volume_scan_stats())
+
+@app.route('/api/volumes/scan', methods=['POST'])
+def start_volume_scan():
+    if not volume_scanner:
+        return jsonify({"success": False, "error": "Volume scanner not enabled"})
+    volume_scanner.scan_now()
+    return jsonify({"success": True})
+
+@app.route('/api/containers/inventory', methods=['GET'])
+def get_container_inventory():
+    return jsonify(container_manager.inventory_metrics())
+
 @app.route('/api/containers/<container_id>/start', methods=['POST'])
 def start_container(container_id):
     # Get runtime type from request body
@@ -144,7 +567,10 @@ def stop_container(container_id):
     
     if runtime == 'mini':
         if mini_docker_manager:
-            result = mini_docker_manager.stop_container(container_id)
+            # Completes in the background; see the container_operation event
+            result = mini_docker_manager.stop_container_async(container_id)
+            if result['success']:
+                return jsonify(result), 202
         else:
             result = {"success": False, "message": "Mini Docker runtime not available on this platform"}
     else:
@@ -159,7 +585,9 @@ def delete_container(container_id):
     
     if runtime == 'mini':
         if mini_docker_manager:
-            result = mini_docker_manager.delete_container(container_id)
+            result = mini_docker_manager.delete_container_async(container_id)
+            if result['success']:
+                return jsonify(result), 202
         else:
             result = {"success": False, "message": "Mini Docker runtime not available on this platform"}
     else:
@@ -167,18 +595,86 @@ def delete_container(container_id):
         
     return jsonify(result)
 
+BULK_PROGRESS_INTERVAL = 0.1
+
+@app.route('/api/containers/bulk', methods=['POST'])
+def bulk_containers():
+    """Apply one action to many containers, reporting progress over Socket.IO"""
+    data = request.get_json() or {}
+    runtime = data.get('runtime', 'docker')
+    manager = mini_docker_manager if runtime == 'mini' else container_manager
+    if not getattr(manager, 'bulk_action', None):
+        return jsonify({"success": False, "message": "Mini Docker runtime not available on this platform"})
+    if not data.get('ids') and not data.get('labels'):
+        return jsonify({"success": False, "error": "ids or labels is required"}), 400
+    
+    try:
+        operation = manager.bulk_action(
+            data.get('action'),
+            ids=data.get('ids'),
+            labels=data.get('labels'),
+            workers=int(data.get('concurrency', BULK_WORKERS))
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    
+    # Wait cooperatively, relaying each finished item as it completes
+    while True:
+        finished = operation.finished()
+        for event in operation.progress():
+            socketio.emit('bulk_progress', event)
+        if finished:
+            break
+        socketio.sleep(BULK_PROGRESS_INTERVAL)
+    
+    result = operation.result()
+    result['success'] = result['failed'] == 0
+    return jsonify(result)
+
+MINI_FOLLOW_POLL_INTERVAL = 0.5
+
+def follow_mini_logs(container_id, cursor, tail):
+    """Stream a mini container's logs as NDJSON until it stops"""
+    page = mini_docker_manager.get_container_logs(container_id, tail=tail, cursor=cursor)
+    while 'error' not in page:
+        for line in page['logs']:
+            yield json.dumps(dict(line, cursor=page['cursor'])) + '\n'
+        if not page['logs']:
+            if mini_docker_manager.get_status(container_id) != 'running':
+                return
+            socketio.sleep(MINI_FOLLOW_POLL_INTERVAL)
+        page = mini_docker_manager.get_container_logs(container_id, tail=500, cursor=page['cursor'])
+
 @app.route('/api/containers/<container_id>/logs', methods=['GET'])
 def get_logs(container_id):
     # Get runtime type from query params
     runtime = request.args.get('runtime', 'docker')
     
+    try:
+        tail = request.args.get('tail', 100)
+        tail = 'all' if tail == 'all' else int(tail)
+        since = request.args.get('since')
+        until = request.args.get('until')
+        cursor = request.args.get('cursor')
+        since = float(since) if since else None
+        until = float(until) if until else None
+        cursor = int(cursor) if cursor else None
+    except ValueError:
+        return jsonify({"error": "tail, since, until and cursor must be numbers"}), 400
+    follow = request.args.get('follow') in ('1', 'true')
+    
     if runtime == 'mini':
-        if mini_docker_manager:
-            logs = mini_docker_manager.get_container_logs(container_id)
-        else:
-            logs = {"logs": "", "message": "Mini Docker runtime not available on this platform"}
+        if not mini_docker_manager:
+            return jsonify({"logs": "", "message": "Mini Docker runtime not available on this platform"})
+        if tail == 'all':
+            tail = 10000
+        if follow and getattr(mini_docker_manager, 'has_container', None):
+            return Response(stream_with_context(follow_mini_logs(container_id, cursor, tail)),
+                            mimetype='application/x-ndjson')
+        logs = mini_docker_manager.get_container_logs(container_id, tail=tail, since=since,
+                                                      until=until, cursor=cursor)
     else:
-        logs = container_manager.get_container_logs(container_id)
+        logs = container_manager.get_container_logs(container_id, tail=tail, since=since, until=until)
         
     return jsonify(logs)
 
@@ -195,7 +691,8 @@ def create_container():
                 image=data.get('image', 'busybox'),
                 name=data.get('name'),
                 cpu_limit=data.get('cpu_limit'),
-                memory_limit=data.get('memory_limit')
+                memory_limit=data.get('memory_limit'),
+                labels=data.get('labels')
             )
         else:
             result = {"success": False, "message": "Mini Docker runtime not available on this platform", "container_id": None}
@@ -206,16 +703,39 @@ def create_container():
             ports=data.get('ports', {}),
             cpu_limit=data.get('cpu_limit'),
             memory_limit=data.get('memory_limit'),
-            gpu=data.get('gpu', False)
+            gpu=data.get('gpu', False),
+            labels=data.get('labels')
         )
     
     return jsonify(result)
 
-# ... keep existing code (volume management routes)
+@app.route('/api/volumes', methods=['GET'])
+def get_volumes():
+    """Volumes with their users and sizes, from the listing cache and the volume scanner"""
+    return jsonify(container_manager.list_volumes())
+
+@app.route('/api/volumes/<volume_id>', methods=['DELETE'])
+def delete_volume(volume_id):
+    result = container_manager.delete_volume(volume_id)
+    return jsonify(result)
 
 if __name__ == '__main__':
     # Start background monitoring thread
+    if collector:
+        collector.start()
+        atexit.register(collector.close)
+    # Disk writes, fsync and compaction of stored metrics run on their own thread
+    metrics_store.start()
+    atexit.register(metrics_store.close)
     threading.Thread(target=background_monitoring, daemon=True).start()
+    socketio.start_background_task(log_push_loop)
+    if mini_docker_manager:
+        socketio.start_background_task(mini_event_loop)
+    if getattr(mini_docker_manager, 'warm_pool', None):
+        mini_docker_manager.warm_pool.start()
+        atexit.register(mini_docker_manager.warm_pool.close)
+    if LOG_INDEX_ALL:
+        threading.Thread(target=log_index_loop, daemon=True).start()
     
     # Start Flask-SocketIO server
     socketio.run(app, host='0.0.0.0', port=5000, debug=True)
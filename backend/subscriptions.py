@@ -0,0 +1,107 @@
+
+import threading
+
+# Emit rates clients can pick from, in Hz. Each rate must divide the fastest
+# one so every rate lands on a whole number of monitoring ticks.
+RATES = (0.2, 1.0, 5.0)
+DEFAULT_RATE = 1.0
+MAX_RATE = max(RATES)
+
+# Topics clients can subscribe to, and whether they accept a container filter
+TOPICS = ('system_stats', 'docker_containers', 'mini_containers')
+CONTAINER_TOPICS = ('docker_containers', 'mini_containers')
+
+
+def normalize_rate(rate):
+    """Snap a requested rate to the closest supported rate"""
+    try:
+        rate = float(rate)
+    except (TypeError, ValueError):
+        return DEFAULT_RATE
+    return min(RATES, key=lambda r: abs(r - rate))
+
+
+def stream_name(topic, container=None):
+    """Name of a stream as seen by clients (the `topic` field of messages)"""
+    return f"{topic}/{container}" if container else topic
+
+
+def room_name(topic, rate, container=None):
+    """Socket.IO room for a stream at a given rate"""
+    return f"{stream_name(topic, container)}@{rate:g}"
+
+
+def ticks_per_emit(rate):
+    """How many fastest-rate ticks pass between emits at `rate`"""
+    return max(1, round(MAX_RATE / rate))
+
+
+class SubscriptionRegistry:
+    """Track which client is watching which stream at which rate
+
+    A stream is a topic, optionally narrowed to one container. Each
+    (stream, rate) pair maps to a Socket.IO room, so the monitoring loop
+    only has to collect topics that have at least one room and emit once
+    per room.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}  # sid -> {(topic, container): rate}
+
+    def subscribe(self, sid, topic, rate=DEFAULT_RATE, container=None):
+        """Subscribe a client, returning (room to leave or None, room to join)"""
+        if topic not in TOPICS:
+            raise ValueError(f"Unknown topic '{topic}'")
+        if container and topic not in CONTAINER_TOPICS:
+            raise ValueError(f"Topic '{topic}' does not support container subscriptions")
+
+        rate = normalize_rate(rate)
+        key = (topic, container or None)
+        with self._lock:
+            streams = self._clients.setdefault(sid, {})
+            previous = streams.get(key)
+            streams[key] = rate
+        old_room = room_name(topic, previous, container) if previous and previous != rate else None
+        return old_room, room_name(topic, rate, container)
+
+    def unsubscribe(self, sid, topic, container=None):
+        """Unsubscribe a client from a stream, returning the room to leave"""
+        with self._lock:
+            rate = self._clients.get(sid, {}).pop((topic, container or None), None)
+        return room_name(topic, rate, container) if rate else None
+
+    def drop(self, sid):
+        """Forget a disconnected client, returning the rooms it was in"""
+        with self._lock:
+            streams = self._clients.pop(sid, {})
+        return [room_name(topic, rate, container) for (topic, container), rate in streams.items()]
+
+    def rooms_for(self, sid, stream=None):
+        """Rooms a client is in, optionally only those for one stream name"""
+        with self._lock:
+            streams = dict(self._clients.get(sid, {}))
+        return [
+            room_name(topic, rate, container)
+            for (topic, container), rate in streams.items()
+            if stream is None or stream_name(topic, container) == stream
+        ]
+
+    def active_rooms(self):
+        """Every room with at least one subscriber: {room: (topic, container, rate)}"""
+        rooms = {}
+        with self._lock:
+            for streams in self._clients.values():
+                for (topic, container), rate in streams.items():
+                    rooms[room_name(topic, rate, container)] = (topic, container, rate)
+        return rooms
+
+    def counts(self):
+        """Subscriber counts per room"""
+        counts = {}
+        with self._lock:
+            for streams in self._clients.values():
+                for (topic, container), rate in streams.items():
+                    room = room_name(topic, rate, container)
+                    counts[room] = counts.get(room, 0) + 1
+        return counts
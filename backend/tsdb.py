@@ -0,0 +1,426 @@
+
+import bisect
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+
+# Index entry: series id, byte offset of the block, row count, first ts, last ts
+INDEX_ENTRY = struct.Struct('<IQIdd')
+SEGMENT_FILE = re.compile(r'^seg-(\d+)\.(\d+)\.(dat|idx)$')
+
+SEGMENT_SECONDS = 3600
+FLUSH_INTERVAL = 30
+MAINTENANCE_INTERVAL = 3600
+RETENTION_SECONDS = 7 * 24 * 3600
+
+
+class Segment:
+    """One time slice of the store: a data file of blocks plus its index
+
+    A block holds `count` rows of one series stored column by column: the
+    timestamps, then each value column, all as little-endian doubles. Range
+    reads map the data file and cast slices of it straight to float arrays.
+    """
+
+    def __init__(self, root, start, generation=0, pending=False):
+        self.root = root
+        self.start = start
+        self.generation = generation
+        # A pending segment writes its index under a temporary name until
+        # publish(), so a half-written compaction is never loaded
+        self.pending = pending
+        self.entries = {}  # series id -> [(offset, count, tmin, tmax)]
+        self.size = 0
+        self._mmap = None
+        self._mapped_size = 0
+        self._data_file = None
+        self._index_file = None
+
+    @property
+    def data_path(self):
+        return os.path.join(self.root, f"seg-{self.start}.{self.generation}.dat")
+
+    @property
+    def index_path(self):
+        path = os.path.join(self.root, f"seg-{self.start}.{self.generation}.idx")
+        return path + '.tmp' if self.pending else path
+
+    def load(self, ncolumns):
+        """Read the block index from disk
+
+        `ncolumns(series_id)` gives a series' value column count, or None
+        for a series the store does not know. After a crash the index can
+        hold entries whose block never fully reached the data file (the
+        two files are synced separately); the first such entry and all
+        after it are truncated away, so later appends stay aligned and no
+        entry ever points past the data.
+        """
+        self.size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'rb') as f:
+            raw = f.read()
+        usable = len(raw) - len(raw) % INDEX_ENTRY.size
+        for position in range(0, usable, INDEX_ENTRY.size):
+            series_id, offset, count, tmin, tmax = INDEX_ENTRY.unpack_from(raw, position)
+            columns = ncolumns(series_id)
+            if columns is not None and offset + 8 * count * (columns + 1) > self.size:
+                usable = position
+                break
+            if columns is not None:
+                self.entries.setdefault(series_id, []).append((offset, count, tmin, tmax))
+        if usable != len(raw):
+            os.truncate(self.index_path, usable)
+
+    def append_block(self, series_id, timestamps, columns):
+        """Append one block and its index entry"""
+        if self._data_file is None:
+            self._data_file = open(self.data_path, 'ab')
+            self._index_file = open(self.index_path, 'ab')
+            self.size = self._data_file.tell()
+        offset = self.size
+        payload = timestamps.tobytes() + b''.join(column.tobytes() for column in columns)
+        self._data_file.write(payload)
+        self.size += len(payload)
+        entry = (offset, len(timestamps), timestamps[0], timestamps[-1])
+        self._index_file.write(INDEX_ENTRY.pack(series_id, *entry))
+        self.entries.setdefault(series_id, []).append(entry)
+
+    def sync(self):
+        """Make written blocks durable, data first (load() drops index entries that still got ahead)"""
+        if self._data_file is not None:
+            self._data_file.flush()
+            os.fsync(self._data_file.fileno())
+            self._index_file.flush()
+            os.fsync(self._index_file.fileno())
+
+    def publish(self):
+        """Give a pending segment's index its final name"""
+        self.close()
+        tmp_path = self.index_path
+        self.pending = False
+        os.replace(tmp_path, self.index_path)
+
+    def _view(self):
+        if self._data_file is not None:
+            self._data_file.flush()
+        if self._mmap is None or self._mapped_size < self.size:
+            if self._mmap is not None:
+                self._mmap.close()
+            with open(self.data_path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = len(self._mmap)
+        return self._mmap
+
+    def read(self, series_id, ncolumns, start, end):
+        """Rows of a series in [start, end] as (timestamps, [column values])"""
+        timestamps = []
+        columns = [[] for _ in range(ncolumns)]
+        blocks = [e for e in self.entries.get(series_id, ()) if e[3] >= start and e[2] <= end]
+        if not blocks:
+            return timestamps, columns
+        data = self._view()
+        for offset, count, _, _ in sorted(blocks, key=lambda e: e[2]):
+            with memoryview(data)[offset:offset + 8 * count * (ncolumns + 1)] as raw, raw.cast('d') as values:
+                lo = bisect.bisect_left(values, start, 0, count)
+                hi = bisect.bisect_right(values, end, lo, count)
+                if lo >= hi:
+                    continue
+                timestamps.extend(values[lo:hi].tolist())
+                for c in range(ncolumns):
+                    base = count * (c + 1)
+                    columns[c].extend(values[base + lo:base + hi].tolist())
+        return timestamps, columns
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._data_file is not None:
+            self._data_file.close()
+            self._index_file.close()
+            self._data_file = self._index_file = None
+
+    def remove(self):
+        self.close()
+        for path in (self.data_path, self.index_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class TimeSeriesStore:
+    """Append-only, memory-mapped on-disk store for metric series
+
+    A series has a fixed list of value columns, set by its first append.
+    Rows are buffered in memory and written in batches of one block per
+    series by flush(). Data is split into segments of `segment_seconds`.
+    Closed segments are compacted to one block per series, and segments
+    older than `retention` are deleted along with series left without
+    data. start() runs flushes and maintenance on a background thread, so
+    callers appending rows never wait for fsync.
+    """
+
+    def __init__(self, root, segment_seconds=SEGMENT_SECONDS, flush_interval=FLUSH_INTERVAL,
+                 retention=RETENTION_SECONDS):
+        self.root = root
+        self.segment_seconds = segment_seconds
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self._lock = threading.RLock()
+        # Held by whoever writes segment files (flush, maintenance, close);
+        # fsync happens under it but outside _lock
+        self._flush_lock = threading.Lock()
+        self._series = {}    # name -> {'id': int, 'columns': [names]}
+        self._by_id = {}
+        self._next_id = 0
+        self._series_dirty = False  # series.json is saved by the next flush
+        self._segments = {}  # segment start -> Segment
+        self._buffers = {}   # series id -> (array of timestamps, [array per column])
+        self._last_flush = time.time()
+        self._closed = threading.Event()
+        self._thread = None
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    @property
+    def _series_path(self):
+        return os.path.join(self.root, 'series.json')
+
+    def _load(self):
+        if os.path.exists(self._series_path):
+            with open(self._series_path, 'r') as f:
+                self._series = json.load(f)
+            self._by_id = {info['id']: name for name, info in self._series.items()}
+            self._next_id = max(self._by_id, default=-1) + 1
+
+        # Keep the newest complete generation of each segment
+        found = {}
+        for filename in os.listdir(self.root):
+            if filename.endswith('.idx.tmp'):
+                # Left over from an interrupted compaction
+                os.remove(os.path.join(self.root, filename))
+                continue
+            match = SEGMENT_FILE.match(filename)
+            if match:
+                start, generation = int(match.group(1)), int(match.group(2))
+                found.setdefault((start, generation), set()).add(match.group(3))
+        for (start, generation), kinds in sorted(found.items()):
+            segment = Segment(self.root, start, generation)
+            if kinds != {'dat', 'idx'}:
+                segment.remove()
+                continue
+            previous = self._segments.get(start)
+            if previous is not None:
+                # A newer generation was written completely by compaction
+                previous.remove()
+            segment.load(self._ncolumns)
+            self._segments[start] = segment
+
+    def _ncolumns(self, series_id):
+        name = self._by_id.get(series_id)
+        return len(self._series[name]['columns']) if name is not None else None
+
+    def _save_series(self):
+        tmp_path = self._series_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._series, f)
+        os.replace(tmp_path, self._series_path)
+
+    def _series_id(self, name, columns):
+        info = self._series.get(name)
+        if info is None:
+            info = {'id': self._next_id, 'columns': list(columns)}
+            self._next_id += 1
+            self._series[name] = info
+            self._by_id[info['id']] = name
+            self._series_dirty = True
+        return info['id']
+
+    def append(self, series, ts, values):
+        """Buffer one row; `values` maps column name to value"""
+        self.append_many(series, [ts], {column: [value] for column, value in values.items()})
+
+    def append_many(self, series, timestamps, columns):
+        """Buffer several rows; `columns` maps column name to a list of values"""
+        with self._lock:
+            series_id = self._series_id(series, columns)
+            names = self._series[series]['columns']
+            buffer = self._buffers.get(series_id)
+            if buffer is None:
+                buffer = self._buffers[series_id] = (array('d'), [array('d') for _ in names])
+            buffer[0].extend(timestamps)
+            for name, column in zip(names, buffer[1]):
+                values = columns.get(name)
+                if values is None:
+                    column.extend([float('nan')] * len(timestamps))
+                else:
+                    column.extend(values)
+
+    def _segment_for(self, start):
+        segment = self._segments.get(start)
+        if segment is None:
+            segment = self._segments[start] = Segment(self.root, start)
+        return segment
+
+    def flush(self):
+        """Write buffered rows as one block per series per segment"""
+        with self._flush_lock:
+            with self._lock:
+                # New series are named on disk before any block uses their id
+                if self._series_dirty:
+                    self._save_series()
+                    self._series_dirty = False
+                buffers, self._buffers = self._buffers, {}
+                touched = set()
+                for series_id, (timestamps, columns) in buffers.items():
+                    i = 0
+                    while i < len(timestamps):
+                        start = int(timestamps[i] // self.segment_seconds * self.segment_seconds)
+                        j = bisect.bisect_left(timestamps, start + self.segment_seconds, i)
+                        segment = self._segment_for(start)
+                        segment.append_block(series_id, timestamps[i:j], [c[i:j] for c in columns])
+                        touched.add(segment)
+                        i = j
+            # Appends and queries carry on while the disk catches up
+            for segment in touched:
+                segment.sync()
+            self._last_flush = time.time()
+
+    def maybe_flush(self, now=None):
+        """Flush when the flush interval has elapsed"""
+        now = time.time() if now is None else now
+        if now - self._last_flush >= self.flush_interval:
+            self.flush()
+            return True
+        return False
+
+    def query(self, series, start, end):
+        """Rows of a series between start and end, including unflushed rows"""
+        with self._lock:
+            info = self._series.get(series)
+            if info is None:
+                return None
+            series_id, names = info['id'], info['columns']
+            timestamps = []
+            columns = [[] for _ in names]
+            first = start // self.segment_seconds * self.segment_seconds
+            for seg_start in sorted(self._segments):
+                if seg_start < first or seg_start > end:
+                    continue
+                ts, values = self._segments[seg_start].read(series_id, len(names), start, end)
+                timestamps.extend(ts)
+                for column, extra in zip(columns, values):
+                    column.extend(extra)
+
+            buffer = self._buffers.get(series_id)
+            if buffer is not None:
+                lo = bisect.bisect_left(buffer[0], start)
+                hi = bisect.bisect_right(buffer[0], end)
+                timestamps.extend(buffer[0][lo:hi])
+                for column, extra in zip(columns, buffer[1]):
+                    column.extend(extra[lo:hi])
+        return {'series': series, 't': timestamps, 'columns': dict(zip(names, columns))}
+
+    def series(self):
+        with self._lock:
+            return {name: list(info['columns']) for name, info in self._series.items()}
+
+    def compact(self, now=None):
+        """Rewrite closed segments so each series is a single block"""
+        now = time.time() if now is None else now
+        compacted = 0
+        with self._lock:
+            for start, segment in list(self._segments.items()):
+                if start + self.segment_seconds > now:
+                    continue
+                if all(len(blocks) <= 1 for blocks in segment.entries.values()):
+                    continue
+                replacement = Segment(self.root, start, segment.generation + 1, pending=True)
+                for series_id in sorted(segment.entries):
+                    name = self._by_id.get(series_id)
+                    if name is None:
+                        continue
+                    ncolumns = len(self._series[name]['columns'])
+                    ts, values = segment.read(series_id, ncolumns, float('-inf'), float('inf'))
+                    if ts:
+                        replacement.append_block(series_id, array('d', ts), [array('d', v) for v in values])
+                replacement.sync()
+                # The new generation is complete on disk before the old one goes
+                replacement.publish()
+                segment.remove()
+                self._segments[start] = replacement
+                compacted += 1
+        return compacted
+
+    def apply_retention(self, now=None):
+        """Delete segments entirely older than the retention period, and series left without data"""
+        now = time.time() if now is None else now
+        removed = 0
+        with self._lock:
+            for start in list(self._segments):
+                if start + self.segment_seconds < now - self.retention:
+                    self._segments.pop(start).remove()
+                    removed += 1
+            if removed:
+                self._prune_series()
+        return removed
+
+    def _prune_series(self):
+        """Forget series with no rows on disk or in memory (e.g. deleted containers)"""
+        live = set(self._buffers)
+        for segment in self._segments.values():
+            live.update(segment.entries)
+        for series_id in set(self._by_id) - live:
+            del self._series[self._by_id.pop(series_id)]
+            self._series_dirty = True
+        if self._series_dirty:
+            self._save_series()
+            self._series_dirty = False
+
+    def maintenance(self, now=None):
+        """Flush, drop expired segments and compact closed ones"""
+        self.flush()
+        with self._flush_lock:
+            return {'removed': self.apply_retention(now), 'compacted': self.compact(now)}
+
+    def start(self, maintenance_interval=MAINTENANCE_INTERVAL):
+        """Flush every flush_interval and run maintenance() every maintenance_interval, in a thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(maintenance_interval,),
+                                            name='tsdb-flush', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self, maintenance_interval):
+        next_maintenance = time.time() + maintenance_interval
+        while not self._closed.wait(self.flush_interval):
+            try:
+                if time.time() >= next_maintenance:
+                    next_maintenance += maintenance_interval
+                    self.maintenance()
+                else:
+                    self.flush()
+            except OSError as e:
+                print(f"Error writing metrics to {self.root}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'series': len(self._series),
+                'segments': len(self._segments),
+                'bytes': sum(segment.size for segment in self._segments.values()),
+                'blocks': sum(len(b) for segment in self._segments.values() for b in segment.entries.values()),
+                'bufferedRows': sum(len(buffer[0]) for buffer in self._buffers.values()),
+            }
+
+    def close(self):
+        self._closed.set()
+        self.flush()
+        with self._flush_lock, self._lock:
+            for segment in self._segments.values():
+                segment.close()
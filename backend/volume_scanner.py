@@ -0,0 +1,231 @@
+"""Background disk usage scanner for Docker volumes
+
+Used by ContainerManager.list_volumes when VOLUME_SIZE_SOURCE is scan
+(the default). A low-priority thread walks each volume's mountpoint like
+du, reusing per-directory totals for directories whose mtime is
+unchanged, so sizes are served from memory instead of the daemon's slow
+df() endpoint.
+"""
+
+import json
+import os
+import threading
+import time
+
+SCAN_INTERVAL = 300       # seconds between passes
+FULL_SCAN_EVERY = 12      # every Nth pass re-reads unchanged directories too
+YIELD_EVERY = 1000        # entries between short pauses...
+YIELD_PAUSE = 0.002       # ...so the walk never saturates the disk
+SCANNER_NICE = 19
+
+
+class VolumeScanner:
+    """Compute volume disk usage in a low-priority background thread
+
+    Each pass walks every volume mountpoint with os.scandir, counting
+    allocated bytes (st_blocks) like du. Per-directory results are cached
+    with the directory's mtime, and a directory whose mtime is unchanged
+    is not listed again: its cached file totals are reused and only its
+    subdirectories are checked. In-place writes to existing files do not
+    change a directory's mtime, so every FULL_SCAN_EVERY-th pass re-reads
+    everything. A file with several hard links is counted once per
+    volume, by (st_dev, st_ino), like du. Results and the directory cache
+    are persisted to `state_path`.
+    """
+
+    def __init__(self, state_path, interval=SCAN_INTERVAL, full_every=FULL_SCAN_EVERY):
+        self.state_path = state_path
+        self.interval = interval
+        self.full_every = full_every
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._targets = {}   # volume name -> mountpoint
+        self._results = {}   # volume name -> {bytes, files, dirs, scannedAt, durationMs} or {error}
+        # path -> [mtime_ns, own bytes, own files, [subdirectory paths], [[dev, ino, bytes] of hard links]]
+        self._dirs = {}
+        self._closed = False
+        self.passes = 0
+        self.progress = {'running': False, 'volume': None, 'volumesDone': 0, 'volumesTotal': 0}
+        self.last_pass = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._results = state.get('volumes', {})
+        self._dirs = state.get('dirs', {})
+        self.passes = state.get('passes', 0)
+
+    def _save(self):
+        # Entries are replaced, never mutated, so shallow copies are enough
+        # to write the state without holding the lock
+        with self._lock:
+            state = {'volumes': dict(self._results), 'dirs': dict(self._dirs), 'passes': self.passes}
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def start(self):
+        threading.Thread(target=self._run, name='volume-scanner', daemon=True).start()
+        return self
+
+    def set_targets(self, mountpoints):
+        """Set the volumes to scan; new volumes are scanned right away"""
+        with self._lock:
+            added = set(mountpoints) - set(self._targets)
+            self._targets = dict(mountpoints)
+            for name in set(self._results) - set(mountpoints):
+                del self._results[name]
+        if added:
+            self._wake.set()
+
+    def scan_now(self):
+        self._wake.set()
+
+    def sizes(self):
+        """Volume name -> bytes for every successfully scanned volume"""
+        with self._lock:
+            return {name: r['bytes'] for name, r in self._results.items() if 'bytes' in r}
+
+    def unreadable(self):
+        """Names of volumes whose mountpoint could not be read"""
+        with self._lock:
+            return {name for name, r in self._results.items() if 'error' in r}
+
+    def _run(self):
+        try:
+            # Per-thread nice value: Linux schedules threads individually
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), SCANNER_NICE)
+        except (AttributeError, OSError):
+            pass
+        while not self._closed:
+            with self._lock:
+                targets = dict(self._targets)
+            if targets:
+                self.scan(targets)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def scan(self, targets):
+        """Run one pass over `targets` (volume name -> mountpoint)"""
+        full = self.full_every and self.passes % self.full_every == 0
+        started = time.perf_counter()
+        counters = {'dirsListed': 0, 'dirsSkipped': 0, 'files': 0}
+        visited = set()
+        self.progress = {'running': True, 'volume': None, 'volumesDone': 0, 'volumesTotal': len(targets)}
+        for done, (name, mountpoint) in enumerate(sorted(targets.items())):
+            self.progress.update(volume=name, volumesDone=done)
+            volume_started = time.perf_counter()
+            try:
+                os.stat(mountpoint)
+                total_bytes, files, dirs = self._walk(mountpoint, full, counters, visited)
+                result = {
+                    'bytes': total_bytes,
+                    'files': files,
+                    'dirs': dirs,
+                    'scannedAt': time.time(),
+                    'durationMs': round((time.perf_counter() - volume_started) * 1000, 3),
+                }
+            except OSError as e:
+                result = {'error': str(e), 'scannedAt': time.time()}
+            with self._lock:
+                self._results[name] = result
+        with self._lock:
+            # Forget directories that no longer exist
+            for path in set(self._dirs) - visited:
+                del self._dirs[path]
+            self.passes += 1
+        elapsed = time.perf_counter() - started
+        entries = counters['files'] + counters['dirsListed'] + counters['dirsSkipped']
+        self.last_pass = dict(
+            counters,
+            full=bool(full),
+            finishedAt=time.time(),
+            durationMs=round(elapsed * 1000, 3),
+            entriesPerSec=round(entries / elapsed) if elapsed > 0 else 0,
+        )
+        self.progress = {'running': False, 'volume': None, 'volumesDone': len(targets), 'volumesTotal': len(targets)}
+        try:
+            self._save()
+        except OSError as e:
+            print(f"Failed to save volume scan state: {e}")
+
+    def _walk(self, root, full, counters, visited):
+        """Return (bytes, files, directories) below root"""
+        total_bytes = total_files = total_dirs = 0
+        stack = [root]
+        seen = 0
+        inodes = set()  # (st_dev, st_ino) of hard-linked files already counted
+        while stack:
+            path = stack.pop()
+            try:
+                st = os.stat(path, follow_symlinks=False)
+            except OSError:
+                continue
+            mtime = st.st_mtime_ns
+            visited.add(path)
+            total_dirs += 1
+            total_bytes += st.st_blocks * 512
+            cached = self._dirs.get(path)
+            # Entries saved before hard links were tracked have four fields
+            if cached and len(cached) == 5 and cached[0] == mtime and not full:
+                _, own_bytes, own_files, subdirs, links = cached
+                counters['dirsSkipped'] += 1
+            else:
+                own_bytes = own_files = 0
+                subdirs = []
+                links = []
+                try:
+                    with os.scandir(path) as entries:
+                        for entry in entries:
+                            try:
+                                if entry.is_dir(follow_symlinks=False):
+                                    subdirs.append(entry.path)
+                                else:
+                                    entry_st = entry.stat(follow_symlinks=False)
+                                    if entry_st.st_nlink > 1:
+                                        links.append([entry_st.st_dev, entry_st.st_ino, entry_st.st_blocks * 512])
+                                    else:
+                                        own_bytes += entry_st.st_blocks * 512
+                                        own_files += 1
+                            except OSError:
+                                continue
+                            seen += 1
+                            if seen % YIELD_EVERY == 0:
+                                time.sleep(YIELD_PAUSE)
+                except OSError:
+                    continue
+                counters['dirsListed'] += 1
+                counters['files'] += own_files + len(links)
+                with self._lock:
+                    self._dirs[path] = [mtime, own_bytes, own_files, subdirs, links]
+            total_bytes += own_bytes
+            total_files += own_files
+            for dev, ino, size in links:
+                if (dev, ino) not in inodes:
+                    inodes.add((dev, ino))
+                    total_bytes += size
+                    total_files += 1
+            stack.extend(subdirs)
+        return total_bytes, total_files, total_dirs
+
+    def stats(self):
+        with self._lock:
+            return {
+                'volumes': len(self._targets),
+                'scanned': sum(1 for r in self._results.values() if 'bytes' in r),
+                'unreadable': sum(1 for r in self._results.values() if 'error' in r),
+                'cachedDirs': len(self._dirs),
+                'passes': self.passes,
+                'progress': dict(self.progress),
+                'lastPass': dict(self.last_pass),
+                'results': dict(self._results),
+            }
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
@@ -9,6 +9,67 @@ let socket: WebSocket | null = null;
 const listeners = new Map();
 let reconnectTimer: number | null = null;
 
+// Delta push protocol: the server sends a snapshot per topic, then
+// sequence-numbered patches. Topic state is rebuilt here and delivered to
+// subscribers as full payloads, so consumers never see patches.
+const PROTOCOL_VERSION = 1;
+const topicState = new Map<string, { seq: number; data: any }>();
+
+const notify = (eventType: string, payload: any) => {
+  if (listeners.has(eventType)) {
+    const callbacks = listeners.get(eventType);
+    callbacks.forEach((callback: Function) => callback(payload));
+  }
+};
+
+const requestSnapshot = (topic?: string) => {
+  if (socket && socket.readyState === socket.OPEN) {
+    socket.send(JSON.stringify({ type: 'resnapshot', payload: { topic } }));
+  }
+};
+
+const applyFieldPatch = (target: any, patch: any) => {
+  const next = { ...target, ...(patch.changed || {}) };
+  (patch.removed || []).forEach((key: string) => delete next[key]);
+  return next;
+};
+
+const applyPatch = (data: any, patch: any) => {
+  if ('replace' in patch) return patch.replace;
+  if (!Array.isArray(data)) return applyFieldPatch(data, patch);
+
+  const items = new Map<string, any>(data.map((item: any) => [item.id, item]));
+  (patch.removed || []).forEach((id: string) => items.delete(id));
+  Object.entries(patch.changed || {}).forEach(([id, fields]) => {
+    if (items.has(id)) items.set(id, applyFieldPatch(items.get(id), fields));
+  });
+  (patch.added || []).forEach((item: any) => items.set(item.id, item));
+
+  const order: string[] = patch.order || Array.from(items.keys());
+  return order.filter((id) => items.has(id)).map((id) => items.get(id));
+};
+
+const handleSnapshot = (snapshot: any) => {
+  if (snapshot.v !== PROTOCOL_VERSION) {
+    console.warn(`Unsupported push protocol version ${snapshot.v}`);
+    return;
+  }
+  topicState.set(snapshot.topic, { seq: snapshot.seq, data: snapshot.data });
+  if (snapshot.data !== null) notify(snapshot.topic, snapshot.data);
+};
+
+const handlePatch = (patch: any) => {
+  const state = topicState.get(patch.topic);
+  if (!state || patch.seq !== state.seq + 1) {
+    // Missed a message (or no snapshot yet): drop the patch and resync
+    if (!state || patch.seq > state.seq) requestSnapshot(patch.topic);
+    return;
+  }
+  state.seq = patch.seq;
+  state.data = applyPatch(state.data, patch);
+  notify(patch.topic, state.data);
+};
+
 // Initialize WebSocket connection
 export const initializeWebSocket = (onConnect?: () => void) => {
   if (socket) {
@@ -23,6 +84,8 @@ export const initializeWebSocket = (onConnect?: () => void) => {
       clearTimeout(reconnectTimer);
       reconnectTimer = null;
     }
+    // Restore stream subscriptions after a reconnect
+    streamSubscriptions.forEach((subscription) => sendSubscription('subscribe', subscription));
     if (onConnect) onConnect();
   };
   
@@ -31,10 +94,13 @@ export const initializeWebSocket = (onConnect?: () => void) => {
       const data = JSON.parse(event.data);
       const eventType = data.type;
       
-      // Notify subscribers for this event type
-      if (listeners.has(eventType)) {
-        const callbacks = listeners.get(eventType);
-        callbacks.forEach((callback: Function) => callback(data.payload));
+      if (eventType === 'snapshot') {
+        handleSnapshot(data.payload);
+      } else if (eventType === 'patch') {
+        handlePatch(data.payload);
+      } else {
+        // Notify subscribers for this event type
+        notify(eventType, data.payload);
       }
     } catch (error) {
       console.error('Error parsing WebSocket message:', error);
@@ -48,6 +114,7 @@ export const initializeWebSocket = (onConnect?: () => void) => {
   
   socket.onclose = () => {
     console.log('WebSocket connection closed');
+    topicState.clear();
     // Try to reconnect after 5 seconds
     if (!reconnectTimer) {
       reconnectTimer = window.setTimeout(() => {
@@ -60,17 +127,54 @@ export const initializeWebSocket = (onConnect?: () => void) => {
   return socket;
 };
 
+// Streamed topics are only sent by the server to subscribed clients
+const STREAM_TOPICS = ['system_stats', 'docker_containers', 'mini_containers'];
+
+export interface SubscriptionOptions {
+  rate?: 0.2 | 1 | 5; // emits per second
+  container?: string; // only this container (container topics only)
+}
+
+const streamSubscriptions = new Map<string, { topic: string } & SubscriptionOptions>();
+
+const sendSubscription = (type: 'subscribe' | 'unsubscribe', payload: any) => {
+  if (socket && socket.readyState === socket.OPEN) {
+    socket.send(JSON.stringify({ type, payload }));
+  }
+};
+
 // Subscribe to WebSocket events
-export const subscribeToEvent = (eventType: string, callback: Function) => {
-  if (!listeners.has(eventType)) {
-    listeners.set(eventType, new Set());
+export const subscribeToEvent = (eventType: string, callback: Function, options: SubscriptionOptions = {}) => {
+  const isStream = STREAM_TOPICS.includes(eventType);
+  const key = isStream && options.container ? `${eventType}/${options.container}` : eventType;
+
+  if (!listeners.has(key)) {
+    listeners.set(key, new Set());
+  }
+  listeners.get(key).add(callback);
+
+  if (isStream) {
+    const subscription = { topic: eventType, rate: options.rate ?? 1, container: options.container };
+    const current = streamSubscriptions.get(key);
+    // The fastest rate requested by any listener wins
+    if (!current || (current.rate ?? 1) < subscription.rate) {
+      streamSubscriptions.set(key, subscription);
+      sendSubscription('subscribe', subscription);
+    }
   }
-  listeners.get(eventType).add(callback);
   
   return () => {
-    const callbacks = listeners.get(eventType);
+    const callbacks = listeners.get(key);
     if (callbacks) {
       callbacks.delete(callback);
+      if (isStream && callbacks.size === 0) {
+        const subscription = streamSubscriptions.get(key);
+        streamSubscriptions.delete(key);
+        topicState.delete(key);
+        if (subscription) {
+          sendSubscription('unsubscribe', { topic: subscription.topic, container: subscription.container });
+        }
+      }
     }
   };
 };
@@ -124,8 +228,43 @@ export const stopContainer = (id: string, runtime = 'docker') =>
 export const deleteContainer = (id: string, runtime = 'docker') => 
   apiRequest(`/containers/${id}/delete?runtime=${runtime}`, 'DELETE');
 
-export const fetchContainerLogs = (id: string, runtime = 'docker') => 
-  apiRequest(`/containers/${id}/logs?runtime=${runtime}`);
+// Apply one action to many containers by ID and/or label selector ("key=value,key");
+// per-container progress arrives as bulk_progress events
+export const bulkContainerAction = (data: {
+  action: 'start' | 'stop' | 'restart' | 'delete';
+  ids?: string[];
+  labels?: string | Record<string, string>;
+  runtime?: string;
+  concurrency?: number;
+}) => apiRequest('/containers/bulk', 'POST', data);
+
+export const fetchContainerLogs = (
+  id: string,
+  runtime = 'docker',
+  page: { tail?: number; since?: number; until?: number } = {}
+) => {
+  const params = new URLSearchParams({ runtime });
+  Object.entries(page).forEach(([key, value]) => {
+    if (value !== undefined) params.set(key, String(value));
+  });
+  return apiRequest(`/containers/${id}/logs?${params}`);
+};
+
+// Follow a container's logs; callback receives batched frames of new lines
+export const watchContainerLogs = (id: string, callback: (frame: any) => void) => {
+  const unsubscribe = subscribeToEvent('container_logs', (frame: any) => {
+    if (frame.container === id) callback(frame);
+  });
+  if (socket && socket.readyState === socket.OPEN) {
+    socket.send(JSON.stringify({ type: 'watch_logs', payload: { container: id } }));
+  }
+  return () => {
+    unsubscribe();
+    if (socket && socket.readyState === socket.OPEN) {
+      socket.send(JSON.stringify({ type: 'unwatch_logs', payload: { container: id } }));
+    }
+  };
+};
 
 export const createContainer = (data: {
   image: string;
@@ -149,6 +288,7 @@ export const fetchMemoryStats = () => apiRequest('/memory');
 export const fetchDiskStats = () => apiRequest('/disk');
 export const fetchGpuStats = () => apiRequest('/gpu');
 export const fetchHistory = () => apiRequest('/history');
+export const fetchPushStats = () => apiRequest('/push/stats');
 
 // Initialize WebSocket on module load
 initializeWebSocket();